@@ -27,14 +27,24 @@ for pack, (links_file, json_file) in PACKS.items():
     cards = data["cards"]
 
     with open(links_path, "r", encoding="utf-8") as f:
-        links = [line.strip() for line in f if line.strip()]
-
-    if len(cards) != len(links):
-        print(f"❌ {pack}: Number of cards ({len(cards)}) does not match number of links ({len(links)})!")
-        continue
-
-    for card, link in zip(cards, links):
-        card["image_url"] = link
+        lines = [line.split() for line in f if line.strip()]
+
+    if all(len(parts) == 2 for parts in lines):
+        # "<card number> <link>" lines, as written by CardUploader.py
+        links = {number: link for number, link in lines}
+        missing = [card for card in cards if str(card["number"]) not in links]
+        for card in cards:
+            card["image_url"] = links.get(str(card["number"]), card.get("image_url"))
+        if missing:
+            print(f"⚠️ {pack}: no link for {len(missing)} card(s), kept their old image_url")
+    else:
+        # Older links files: one link per line, in card order
+        links = [parts[0] for parts in lines]
+        if len(cards) != len(links):
+            print(f"❌ {pack}: Number of cards ({len(cards)}) does not match number of links ({len(links)})!")
+            continue
+        for card, link in zip(cards, links):
+            card["image_url"] = link
 
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2)
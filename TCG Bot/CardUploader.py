@@ -1,9 +1,31 @@
 import os
+import sys
+import time
+import random
+import hashlib
+import threading
 import requests
 import base64
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from catalog import Card
+from image_resolver import match_image_files, IMAGE_EXTENSIONS
 
-IMGBB_API_KEY = "99278c73dc235c2a284509c289cc45cd"  # <-- Replace with your ImgBB API key
+# Upload every pack's card art to ImgBB and point the pack JSON at it.
+# Uploads run on a pool of worker threads. Every image is identified by the sha256
+# of its bytes, and imgbb_upload_manifest.json remembers hash -> link: art that was
+# uploaded before (by an earlier run, an interrupted one, or another pack with the
+# same picture) is never sent again. Files are matched to cards by name/number
+# (see image_resolver.match_image_files), so a failed upload only leaves that one
+# card on its old link instead of skipping the whole pack.
+#
+# Usage: python CardUploader.py [pack ...]
+
+IMGBB_API_KEY = os.getenv("IMGBB_API_KEY", "99278c73dc235c2a284509c289cc45cd")  # <-- Replace with your ImgBB API key
+UPLOAD_URL = os.getenv("IMGBB_UPLOAD_URL", "https://api.imgbb.com/1/upload")
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "8"))
+UPLOAD_RETRIES = 3
+MANIFEST_PATH = "imgbb_upload_manifest.json"
 
 # Map each pack to its image folder, output txt, and JSON file
 PACKS = {
@@ -15,53 +37,130 @@ PACKS = {
 
 CARDS_DIR = os.path.join(os.getcwd(), "data", "cardpacks")
 
+_local = threading.local()
+
+def http_session():
+    # requests.Session isn't thread-safe, so every worker keeps its own (and its connections)
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+class UploadManifest:
+    """sha256 of an image -> its ImgBB link, saved after every upload so interrupted runs resume."""
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.links = json.load(f)
+        except (OSError, ValueError):
+            self.links = {}
+
+    def get(self, digest):
+        return self.links.get(digest)
+
+    def add(self, digest, link):
+        with self._lock:
+            self.links[digest] = link
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.links, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
 def upload_image_to_imgbb(image_path):
     with open(image_path, "rb") as img_file:
         encoded_string = base64.b64encode(img_file.read()).decode("utf-8")
-    response = requests.post(
-        "https://api.imgbb.com/1/upload",
-        data={
-            "key": IMGBB_API_KEY,
-            "image": encoded_string
-        }
-    )
-    if response.status_code == 200:
-        return response.json()["data"]["url"]
-    else:
+    for attempt in range(UPLOAD_RETRIES):
+        if attempt:
+            time.sleep(2 ** attempt * random.uniform(0.5, 1.5))
+        try:
+            response = http_session().post(
+                UPLOAD_URL,
+                data={
+                    "key": IMGBB_API_KEY,
+                    "image": encoded_string
+                },
+                timeout=60
+            )
+        except requests.RequestException as e:
+            print(f"Failed to upload {image_path}: {e}")
+            continue
+        if response.status_code == 200:
+            return response.json()["data"]["url"]
         print(f"Failed to upload {image_path}: {response.text}")
-        return None
-
-for pack, (folder, out_txt, json_file) in PACKS.items():
-    links = []
-    if not os.path.isdir(folder):
-        print(f"❌ Folder not found: {folder}")
-        continue
-    # Upload images and collect links
-    for filename in sorted(os.listdir(folder)):
-        if filename.lower().endswith((".png", ".jpg", ".jpeg", ".gif")):
-            path = os.path.join(folder, filename)
-            print(f"[{pack}] Uploading {filename}...")
-            link = upload_image_to_imgbb(path)
-            if link:
-                links.append(link)
-    # Save links to .txt
-    with open(out_txt, "w", encoding="utf-8") as f:
-        f.write("\n".join(links))
-    print(f"✅ Saved {len(links)} links to {out_txt}")
-
-    # Update JSON with image links
-    json_path = os.path.join(CARDS_DIR, json_file)
+        if response.status_code < 500 and response.status_code != 429:
+            break
+    return None
+
+def upload_pack(pack, folder, manifest, pool):
+    """Upload a pack's art. Returns ({card number: link}, card JSON data) or (None, None)."""
+    json_path = os.path.join(CARDS_DIR, PACKS[pack][2])
     if not os.path.exists(json_path):
         print(f"❌ JSON file not found: {json_path}")
-        continue
+        return None, None
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
-    cards = data["cards"]
-    if len(cards) != len(links):
-        print(f"❌ {pack}: Number of cards ({len(cards)}) does not match number of links ({len(links)})!")
-        continue
-    for card, link in zip(cards, links):
-        card["image_url"] = link
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-    print(f"✅ {json_file} updated with ImgBB image links!")
\ No newline at end of file
+    cards = [Card.from_dict(pack, card) for card in data["cards"]]
+    files = [f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS)]
+    matched, unmatched = match_image_files(cards, files)
+    for filename in unmatched:
+        print(f"⚠️ [{pack}] {filename} doesn't match any card, not uploading it")
+
+    digests = {number: file_hash(os.path.join(folder, filename)) for number, filename in matched.items()}
+    # One upload per distinct picture that isn't in the manifest yet
+    pending = {}
+    for number, digest in digests.items():
+        if manifest.get(digest) is None and digest not in pending:
+            pending[digest] = os.path.join(folder, matched[number])
+    print(f"[{pack}] {len(matched)} card image(s), {len(pending)} to upload")
+    futures = {pool.submit(upload_image_to_imgbb, path): (digest, path) for digest, path in pending.items()}
+    for future in as_completed(futures):
+        digest, path = futures[future]
+        link = future.result()
+        if link:
+            manifest.add(digest, link)
+            print(f"[{pack}] Uploaded {os.path.basename(path)}")
+    links = {number: manifest.get(digest) for number, digest in digests.items() if manifest.get(digest)}
+    return links, data
+
+def main():
+    packs = sys.argv[1:] or list(PACKS)
+    manifest = UploadManifest()
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        for pack in packs:
+            if pack not in PACKS:
+                print(f"❌ Unknown pack: {pack}")
+                continue
+            folder, out_txt, json_file = PACKS[pack]
+            if not os.path.isdir(folder):
+                print(f"❌ Folder not found: {folder}")
+                continue
+            links, data = upload_pack(pack, folder, manifest, pool)
+            if links is None:
+                continue
+            # Save links to .txt, one "<card number> <link>" per line
+            with open(out_txt, "w", encoding="utf-8") as f:
+                f.write("\n".join(f"{card['number']} {links[str(card['number'])]}"
+                                  for card in data["cards"] if str(card["number"]) in links))
+            print(f"✅ Saved {len(links)} links to {out_txt}")
+
+            # Update JSON with image links, card by card
+            missing = []
+            for card in data["cards"]:
+                link = links.get(str(card["number"]))
+                if link:
+                    card["image_url"] = link
+                else:
+                    missing.append(f"#{card['number']} {card.get('name')}")
+            with open(os.path.join(CARDS_DIR, json_file), "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            print(f"✅ {json_file} updated with ImgBB image links!")
+            if missing:
+                print(f"⚠️ {pack}: kept the old link for {len(missing)} card(s): {', '.join(missing)}")
+
+if __name__ == "__main__":
+    main()
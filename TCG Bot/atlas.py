@@ -0,0 +1,132 @@
+import hashlib
+import mmap
+import os
+import struct
+from PIL import Image
+from catalog import get_catalog
+from image_cache import TILE_SIZE
+
+# Pre-resized binder tiles. For every pack one file holds each card's 180x240
+# RGBA thumbnail plus an index of where each card's tile lives. The file is
+# memory-mapped, so a binder page is just tile copies, badge overlays and the
+# unowned shading: no PNG decode, no resampling.
+#
+# Build (uses the bundled <pack>_images/ art, else what precache_images.py downloaded):
+#     python atlas.py
+#
+# File layout, all little-endian:
+#     header   b"TCGATLS2", tile_width u16, tile_height u16, card_count u32
+#     index    card_count x (number 8s, md5 of image_url 16s, tile u32)
+#     tiles    card_count tiles, raw RGBA
+
+ATLAS_DIR = os.path.join("image_cache", "atlas")
+MAGIC = b"TCGATLS2"  # version 1 also stored pre-shaded tiles; rebuild with python atlas.py
+HEADER = struct.Struct("<8sHHI")
+RECORD = struct.Struct("<8s16sI")
+
+def atlas_path(pack):
+    return os.path.join(ATLAS_DIR, f"{pack}.atlas")
+
+def url_digest(url):
+    return hashlib.md5((url or "").encode()).digest()
+
+def shade(img):
+    """The unowned look the binder has always used: blend 60% towards translucent black."""
+    return Image.blend(img, Image.new("RGBA", img.size, (0, 0, 0, 120)), 0.6)
+
+class Atlas:
+    """Read-only, memory-mapped view of one pack's tiles."""
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Changes with every rebuild; part of the binder page cache key
+            self.version = os.fstat(f.fileno()).st_mtime_ns
+        magic, width, height, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a binder atlas")
+        self.tile_size = (width, height)
+        self.tile_bytes = width * height * 4
+        self.count = count
+        self._data_start = HEADER.size + count * RECORD.size
+        self.index = {}
+        for i in range(count):
+            number, digest, tile = RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+            self.index[number.rstrip(b"\0").decode()] = (digest, tile)
+
+    def has(self, number, image_url=None):
+        """True if the card has a tile, built from the same image_url when one is given."""
+        entry = self.index.get(str(number))
+        return entry is not None and (image_url is None or entry[0] == url_digest(image_url))
+
+    def tile(self, number):
+        """The card's tile as an RGBA image backed by the mapped file, or None."""
+        entry = self.index.get(str(number))
+        if entry is None:
+            return None
+        start = self._data_start + entry[1] * self.tile_bytes
+        view = memoryview(self._map)[start:start + self.tile_bytes]
+        return Image.frombuffer("RGBA", self.tile_size, view, "raw", "RGBA", 0, 1)
+
+    def close(self):
+        self._map.close()
+
+_atlases = {}
+
+def get_atlas(pack):
+    """The pack's atlas, opened once per process, or None if it hasn't been built."""
+    path = atlas_path(pack)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _atlases.get(pack)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        atlas = Atlas(path)
+    except (OSError, ValueError) as e:
+        print(f"[DEBUG] Ignoring atlas for {pack}: {e}")
+        return None
+    # A rebuilt file gets a fresh mapping; the old one is released once its tiles are gone
+    _atlases[pack] = (mtime, atlas)
+    return atlas
+
+def build_pack_atlas(pack, cards, resolver, path=None):
+    """Write the atlas for one pack from the images resolver finds locally. Returns (tiles written, cards skipped)."""
+    path = path or atlas_path(pack)
+    tiles, records, skipped = [], [], []
+    for card in cards:
+        source = resolver.local_path(card)
+        if source is None:
+            skipped.append(card)
+            continue
+        try:
+            img = Image.open(source).convert("RGBA").resize(TILE_SIZE, Image.LANCZOS)
+        except Exception as e:
+            print(f"[DEBUG] Failed to load image for {card.name}: {e}")
+            skipped.append(card)
+            continue
+        records.append(RECORD.pack(card.number.encode()[:8], url_digest(card.image_url), len(tiles)))
+        tiles.append(img.tobytes())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, TILE_SIZE[0], TILE_SIZE[1], len(records)))
+        f.writelines(records)
+        f.writelines(tiles)
+    os.replace(tmp_path, path)
+    return len(records), skipped
+
+def main():
+    from image_resolver import ImageResolver
+    catalog = get_catalog()
+    resolver = ImageResolver(catalog)
+    for pack in catalog.pack_names:
+        written, skipped = build_pack_atlas(pack, catalog.cards(pack), resolver)
+        print(f"✅ {pack}: {written} tile(s) -> {atlas_path(pack)}")
+        for card in skipped:
+            print(f"   ⚠️ no local image for #{card.number} {card.name}, run precache_images.py first")
+
+if __name__ == "__main__":
+    main()
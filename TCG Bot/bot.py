@@ -2,10 +2,18 @@ import os
 import sys
 import asyncio
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from dotenv import load_dotenv
 from typing import cast
 import traceback
+from catalog import get_catalog
+from http_client import HttpClient
+from ledger import CoinLedger, LEDGER_PATH
+from member_index import MemberIndex
+from leaderboard import Leaderboards
+from reaction_router import ReactionRouter
+from sessions import SessionManager, SESSIONS_SNAPSHOT, SESSION_SWEEP_SECONDS
+from utils import flush_user_files, flush_user_files_async, run_blocking, USER_CACHE_FLUSH_SECONDS
 
 # Load .env file
 load_dotenv()
@@ -22,8 +30,22 @@ if not TOKEN:
 intents = discord.Intents.default()
 intents.message_content = True
 intents.reactions = True
+# Member join/update/remove events keep bot.member_index current (privileged: enable it in the developer portal)
+intents.members = True
 
 bot = commands.Bot(command_prefix="!", intents=intents)
+# Shared by the cogs for image downloads (bot.http is discord.py's own client)
+bot.http_client = HttpClient()
+# Dispatches reactions on interactive messages (games, trades, shop, wonderpick) by message id
+bot.reaction_router = ReactionRouter(bot)
+# Wonderpicks and adventures in progress, with TTLs; snapshotted across restarts
+bot.sessions = SessionManager()
+# Coin balances: in memory, backed by an append-only log (data/coins.ledger)
+bot.ledger = CoinLedger()
+# Resolves user arguments (names, nicknames, prefixes) without scanning guild.members
+bot.member_index = MemberIndex(bot)
+# Coin and pack completion rankings for !top, kept current as balances and collections change
+bot.leaderboards = Leaderboards()
 
 COGS = [
     "cogs.binder",
@@ -32,7 +54,8 @@ COGS = [
     "cogs.packs",
     "cogs.shop",
     "cogs.trade",
-    "cogs.adventure"
+    "cogs.adventure",
+    "cogs.leaderboard"
 ]
 
 @bot.event
@@ -42,8 +65,31 @@ async def on_ready():
     else:
         print("✅ Logged in, but bot user is None.")
 
+@tasks.loop(seconds=USER_CACHE_FLUSH_SECONDS)
+async def flush_user_cache():
+    await flush_user_files_async()
+
+@tasks.loop(seconds=SESSION_SWEEP_SECONDS)
+async def expire_sessions():
+    bot.sessions.expire()
+
 async def main():
     async with bot:
+        catalog = get_catalog()
+        print(f"✅ Loaded card catalog: {len(catalog.by_id)} cards in {len(catalog.packs)} packs")
+        await bot.http_client.start()
+        replayed = await bot.ledger.start()
+        if replayed:
+            print(f"✅ Replayed {replayed} coin ledger record(s) from {LEDGER_PATH}")
+        # After the ledger replay (which writes replayed balances to storage), before any command runs
+        ranked = await run_blocking(bot.leaderboards.rebuild)
+        bot.leaderboards.attach(bot.ledger)
+        print(f"✅ Built leaderboards from {ranked} user(s)")
+        restored = bot.sessions.restore()
+        if restored:
+            print(f"✅ Restored {restored} session(s) from {SESSIONS_SNAPSHOT}")
+        flush_user_cache.start()
+        expire_sessions.start()
         for cog in COGS:
             try:
                 await bot.load_extension(cog)
@@ -51,7 +97,18 @@ async def main():
             except Exception as e:
                 print(f"❌ Failed to load {cog}: {e}")
                 traceback.print_exc()
-        await bot.start(TOKEN)
+        try:
+            await bot.start(TOKEN)
+        finally:
+            flush_user_cache.cancel()
+            expire_sessions.cancel()
+            await bot.http_client.close()
+            await bot.ledger.close()
+            print(f"💾 Coin ledger compacted: {bot.ledger.stats()}")
+            saved = bot.sessions.snapshot()
+            print(f"💾 Saved {saved} session(s) {bot.sessions.counts()} to {SESSIONS_SNAPSHOT}.")
+            flushed = flush_user_files()
+            print(f"💾 Flushed {flushed} user file(s) on shutdown.")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
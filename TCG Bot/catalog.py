@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+
+# Immutable, in-memory view of every card pack under data/cardpacks.
+# Loaded once at startup (from the compiled data/catalog.json when it is current);
+# opening packs, wonderpicks and binders only read from it.
+
+CARDPACKS_FOLDER = os.path.join("data", "cardpacks")
+RARITIES = ("common", "uncommon", "rare", "energy")
+NON_POKEMON_TYPES = {"trainer", "energy"}
+
+# Cards pulled from one booster pack, per rarity
+PACK_SLOTS = {"common": 6, "uncommon": 3, "rare": 1, "energy": 1}
+
+# Built by compile_catalog.py; used instead of the JSON while it is up to date
+CATALOG_ARTIFACT = os.path.join("data", "catalog.json")
+ARTIFACT_VERSION = 2
+CARD_FIELDS = ("number", "name", "rarity", "type", "image_url")
+# One per pack next to the bot, checked against the pack JSON by compile_catalog.py
+LINKS_FILE = "imgbb_image_links_{pack}.txt"
+LINKS_FOLDER = "."
+
+def source_hashes(folder=CARDPACKS_FOLDER, links_dir=LINKS_FOLDER):
+    """{filename: sha256} of every file the artifact is compiled from: each pack's JSON and links file."""
+    hashes = {}
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith(".json"):
+            continue
+        links = LINKS_FILE.format(pack=filename[:-5].lower())
+        for path in (os.path.join(folder, filename), os.path.join(links_dir, links)):
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    hashes[os.path.basename(path)] = hashlib.sha256(f.read()).hexdigest()
+    return hashes
+
+def read_artifact(path=CATALOG_ARTIFACT):
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    if payload.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"artifact version {payload.get('version')}, expected {ARTIFACT_VERSION}")
+    return payload
+
+def artifact_is_current(payload, folder=CARDPACKS_FOLDER, links_dir=LINKS_FOLDER):
+    # Content, not mtimes: a checkout or copy can leave an old artifact looking newer.
+    # A pack or links file added or removed changes the set of names too.
+    return payload.get("sources") == source_hashes(folder, links_dir)
+
+class Card:
+    __slots__ = ("pack", "number", "name", "rarity", "type", "image_url")
+
+    def __init__(self, pack, number, name, rarity="common", type=None, image_url=None):
+        self.pack = pack
+        self.number = number
+        self.name = name
+        self.rarity = rarity
+        self.type = type
+        self.image_url = image_url
+
+    @classmethod
+    def from_dict(cls, pack, data):
+        return cls(
+            pack,
+            str(data.get("number", "")),
+            data.get("name", "?"),
+            (data.get("rarity") or "common").lower(),
+            data.get("type"),
+            data.get("image_url"),
+        )
+
+    @property
+    def id(self):
+        return (self.pack, self.number)
+
+    @property
+    def is_pokemon(self):
+        return self.rarity != "energy" and bool(self.type) and self.type.lower() not in NON_POKEMON_TYPES
+
+    def __repr__(self):
+        return f"Card({self.pack!r}, {self.number!r}, {self.name!r})"
+
+def pack_stats(cards):
+    """Per-pack numbers shown at startup and in the catalog compiler's report."""
+    rarities = {rarity: 0 for rarity in RARITIES}
+    for card in cards:
+        rarities[card.rarity] = rarities.get(card.rarity, 0) + 1
+    return {
+        "cards": len(cards),
+        "rarities": rarities,
+        "pokemon": sum(1 for card in cards if card.is_pokemon),
+        "with_image": sum(1 for card in cards if card.image_url),
+    }
+
+class CardCatalog:
+    def __init__(self, packs, bucket_index=None, stats=None):
+        """
+        packs: {pack_name: [Card, ...]} in binder order.
+        bucket_index / stats: precomputed by compile_catalog.py, {pack: {rarity: [card positions]}} and {pack: pack_stats}.
+        """
+        self.packs = {name: tuple(cards) for name, cards in packs.items()}
+        self.by_id = {}
+        self.buckets = {}
+        self.non_energy = {}
+        self.stats = {}
+        pokemon = []
+        for name, cards in self.packs.items():
+            if bucket_index is not None:
+                buckets = {rarity: [cards[i] for i in positions] for rarity, positions in bucket_index[name].items()}
+            else:
+                buckets = {rarity: [] for rarity in RARITIES}
+                for card in cards:
+                    buckets.setdefault(card.rarity, []).append(card)
+            for card in cards:
+                self.by_id[card.id] = card
+                if card.is_pokemon:
+                    pokemon.append(card)
+            self.buckets[name] = {rarity: tuple(bucket) for rarity, bucket in buckets.items()}
+            self.non_energy[name] = tuple(card for card in cards if card.rarity != "energy")
+            self.stats[name] = stats[name] if stats is not None else pack_stats(cards)
+        self.pokemon = tuple(pokemon)
+
+    @classmethod
+    def load(cls, folder=CARDPACKS_FOLDER, artifact=CATALOG_ARTIFACT, links_dir=LINKS_FOLDER):
+        """The compiled artifact when it was built from the current pack and links files, else the pack JSON itself."""
+        if artifact and os.path.exists(artifact):
+            try:
+                payload = read_artifact(artifact)
+                if artifact_is_current(payload, folder, links_dir):
+                    return cls.from_payload(payload)
+                print(f"⚠️ {artifact} is out of date with the pack or links files, run compile_catalog.py")
+            except Exception as e:
+                print(f"⚠️ Could not read {artifact} ({e}), loading the pack JSON instead")
+        return cls.from_json(folder)
+
+    @classmethod
+    def from_artifact(cls, path=CATALOG_ARTIFACT):
+        """Load the catalog compiled by compile_catalog.py in a single read."""
+        return cls.from_payload(read_artifact(path))
+
+    @classmethod
+    def from_payload(cls, payload):
+        strings = payload["strings"]
+        packs = {}
+        for name, pack in payload["packs"].items():
+            columns = [[strings[i] for i in pack["columns"][field]] for field in CARD_FIELDS]
+            packs[name] = [Card(name, *fields) for fields in zip(*columns)]
+        bucket_index = {name: pack["buckets"] for name, pack in payload["packs"].items()}
+        stats = {name: pack["stats"] for name, pack in payload["packs"].items()}
+        return cls(packs, bucket_index, stats)
+
+    @classmethod
+    def from_json(cls, folder=CARDPACKS_FOLDER):
+        packs = {}
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith(".json"):
+                continue
+            name = filename[:-5].lower()
+            with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            cards = data.get("cards", []) if isinstance(data, dict) else data
+            packs[name] = [Card.from_dict(name, card) for card in cards]
+        return cls(packs)
+
+    @property
+    def pack_names(self):
+        return sorted(self.packs)
+
+    def cards(self, pack):
+        return self.packs.get((pack or "").lower(), ())
+
+    def get(self, pack, number):
+        return self.by_id.get(((pack or "").lower(), str(number)))
+
+    def can_open(self, pack):
+        """True if the pack has enough cards of every rarity to fill a booster."""
+        buckets = self.buckets.get((pack or "").lower())
+        return bool(buckets) and all(len(buckets.get(r, ())) >= n for r, n in PACK_SLOTS.items())
+
+_catalog = None
+
+def get_catalog():
+    """The process-wide catalog, loaded on first use (bot.py loads it at startup)."""
+    global _catalog
+    if _catalog is None:
+        _catalog = CardCatalog.load()
+    return _catalog
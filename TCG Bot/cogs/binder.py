@@ -1,230 +1,173 @@
 import discord
 from discord.ext import commands
-import os
-import json
 from typing import Optional
-import aiohttp
-from PIL import Image, ImageOps, UnidentifiedImageError, ImageDraw, ImageFont
 import io
-import re
 import math
 import asyncio
-import hashlib
-from utils import load_user_file
+from catalog import get_catalog
+from atlas import get_atlas
+from page_cache import PageCache, page_key
+from image_cache import DiskImageCache
+from image_resolver import ImageResolver
+from render_service import RenderService, RenderBusy, PageSpec, CardSlot
+from utils import load_collection_async, run_blocking
 
-def load_json(filename, default):
-    if os.path.exists(filename):
-        try:
-            with open(filename, "r", encoding="utf-8") as f:
-                text = f.read().strip()
-                if not text:
-                    return default
-                return json.loads(text)
-        except json.JSONDecodeError:
-            print(f"[load_json] invalid JSON in {filename!r}")
-            return default
-    return default
+PER_PAGE = 12
+
+class BinderPageButton(discord.ui.DynamicItem[discord.ui.Button], template=r"binder:(?P<user>[0-9]+):(?P<pack>[a-z0-9_-]+):(?P<page>[0-9]+)"):
+    """
+    ◀️/▶️ on a binder message. The custom_id carries (owner, pack, target page), so one
+    stateless handler serves every binder ever sent, including ones from before a restart.
+    """
+    def __init__(self, user_id, pack, page, label, disabled=False):
+        super().__init__(discord.ui.Button(
+            label=label,
+            style=discord.ButtonStyle.secondary,
+            custom_id=f"binder:{user_id}:{pack}:{page}",
+            disabled=disabled,
+        ))
+        self.user_id = user_id
+        self.pack = pack
+        self.page = page
 
-def save_json(filename, data):
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["user"]), match["pack"], int(match["page"]), item.label, item.disabled)
 
-def load_pack_cards(pack):
-    # Allow only alphanumeric, dash, and underscore in pack names
-    if not re.fullmatch(r"[a-z0-9_-]+", pack.lower()):
-        return []
-    safe_pack = pack.lower()
-    safe_dir = os.path.abspath("data/cardpacks")
-    path = os.path.abspath(os.path.join(safe_dir, f"{safe_pack}.json"))
-    # Ensure the path is within the intended directory
-    if not os.path.commonpath([path, safe_dir]) == safe_dir:
-        return []
-    if not os.path.exists(path):
-        return []
-    data = load_json(path, {})
-    if isinstance(data, dict) and "cards" in data:
-        return data["cards"]
-    if isinstance(data, list):
-        return data
-    return []
+    async def callback(self, interaction):
+        if interaction.user.id != self.user_id:
+            return await interaction.response.send_message("This isn't your binder. Open your own with `!packbinder`.", ephemeral=True)
+        binder = interaction.client.get_cog("Binder")
+        if binder is None:
+            return await interaction.response.send_message("The binder is unavailable right now.", ephemeral=True)
+        try:
+            # A cached page is answered right away; a render can outlast Discord's 3 seconds,
+            # so the interaction is only acknowledged first when one is needed
+            embed, file, view = await binder.binder_page(interaction.user, self.pack, self.page, before_render=interaction.response.defer)
+        except RenderBusy:
+            message = "The binder is busy right now. Please try again in a moment."
+            if interaction.response.is_done():
+                return await interaction.followup.send(message, ephemeral=True)
+            return await interaction.response.send_message(message, ephemeral=True)
+        # The new image and the re-pointed buttons replace the binder message in one edit
+        if interaction.response.is_done():
+            await interaction.edit_original_response(embed=embed, attachments=[file], view=view)
+        else:
+            await interaction.response.edit_message(embed=embed, attachments=[file], view=view)
+
+def binder_view(user_id, pack, page, total_pages):
+    if total_pages <= 1:
+        return None
+    view = discord.ui.View(timeout=None)
+    # Disabled ends point just outside the binder, which keeps the two custom_ids distinct
+    view.add_item(BinderPageButton(user_id, pack, page - 1, "◀️", disabled=page <= 1))
+    view.add_item(BinderPageButton(user_id, pack, page + 1, "▶️", disabled=page >= total_pages))
+    return view
 
 class Binder(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.renderer = RenderService()
+        self.pages = PageCache()
+        self.images = None
+
+    async def cog_load(self):
+        self.renderer.start()
+        # Matching the bundled art and indexing image_cache/ both scan folders, so they run on a thread
+        self.images = await run_blocking(ImageResolver, get_catalog(), DiskImageCache(), getattr(self.bot, "http_client", None))
+        await run_blocking(self.images.cache.warm)
+        self.bot.add_dynamic_items(BinderPageButton)
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(BinderPageButton)
+        self.renderer.shutdown()
+
+    async def binder_page(self, user, pack, page, before_render=None):
+        """
+        (embed, file, view) for one page of a user's pack binder. Raises RenderBusy if the renderer is saturated.
+        before_render(), if given, is awaited when the page isn't cached and has to be rendered.
+        """
+        all_cards = get_catalog().cards(pack)
+        total_pages = max(1, math.ceil(len(all_cards) / PER_PAGE))
+        page = max(1, min(page, total_pages))
+        start = (page - 1) * PER_PAGE
+        page_cards = all_cards[start:start+PER_PAGE]
+        # Owned count per card number in this pack
+        collection = await load_collection_async(str(user.id))
+        card_counts = collection.counts(pack)
+        counts = [card_counts.get(card.number, 0) for card in page_cards]
+        atlas = get_atlas(pack)
+        key = page_key(
+            pack, page,
+            [(card.number, card.image_url, count) for card, count in zip(page_cards, counts)],
+            atlas.version if atlas else None,
+        )
+        # Memory hits are answered on the loop; the disk tier (file read, first-use scan) runs on a thread
+        png = self.pages.get_memory(key)
+        if png is None:
+            png = await run_blocking(self.pages.get_disk, key)
+        if png is None:
+            if before_render is not None:
+                await before_render()
+            png = await self.render_page(pack, page, page_cards, counts, key, atlas)
+        file = discord.File(io.BytesIO(png), filename="binder.png")
+        embed = discord.Embed(
+            title=f"{user.display_name}'s {pack.title()} Pack Binder (Page {page}/{total_pages})",
+            color=discord.Color.blue()
+        )
+        embed.set_image(url="attachment://binder.png")
+        return embed, file, binder_view(user.id, pack, page, total_pages)
+
+    async def render_page(self, pack, page, page_cards, counts, key, atlas):
+        # Cards with an up-to-date atlas tile need no image file at all
+        tiled = [bool(atlas) and atlas.has(card.number, card.image_url) for card in page_cards]
+        image_paths = [None] * len(page_cards)
+        missing = [i for i, has_tile in enumerate(tiled) if not has_tile]
+        if missing:
+            fetched = await asyncio.gather(*[self.images.resolve(page_cards[i]) for i in missing])
+            for i, path in zip(missing, fetched):
+                image_paths[i] = path
+        spec = PageSpec(pack, page, tuple(
+            CardSlot(card.number, card.name, path, count, has_tile)
+            for card, path, count, has_tile in zip(page_cards, image_paths, counts, tiled)
+        ), PER_PAGE)
+        png = await self.renderer.render(spec)
+        # Pages with placeholders are not kept, so they get another chance once the image is reachable
+        if all(slot.tiled or slot.image_path for slot in spec.cards):
+            await run_blocking(self.pages.put, key, png)
+        return png
 
     @commands.command(name="packbinder")
     async def pack_binder(self, ctx, pack: Optional[str] = None, page: int = 1):
         """Show all cards in a pack as a grid. Owned cards are in color, unowned are shadowed. Shows count for each card."""
         if not pack:
-            packs = [f[:-5] for f in os.listdir("data/cardpacks") if f.endswith(".json")]
-            return await ctx.send(f"Please specify a pack: {', '.join(sorted(packs))}")
+            return await ctx.send(f"Please specify a pack: {', '.join(get_catalog().pack_names)}")
         pack = pack.lower()
-        all_cards = load_pack_cards(pack)
-        print(f"[DEBUG] Loaded {len(all_cards)} cards from pack '{pack}'")
-        if not all_cards:
+        if not get_catalog().cards(pack):
             return await ctx.send(f"No such pack `{pack}` or pack has no cards.")
-        user_id = str(ctx.author.id)
-        # Load user's cards and duplicates from new user file storage
-        user_cards_data = load_user_file(user_id, "cards.json")
-        user_cards = user_cards_data.get("cards", [])
-        user_dupes_data = load_user_file(user_id, "duplicates.json")
-        user_dupes = user_dupes_data.get("duplicates", [])
-
-        # Build a count dict: (name, number, pack) -> count
-        card_counts = {}
-        for c in user_cards:
-            key = (c.get("name","").lower(), str(c.get("number","")), (c.get("pack") or pack).lower())
-            card_counts[key] = 1
-        for d in user_dupes:
-            key = (d.get("name","").lower(), str(d.get("number","")), (d.get("pack") or pack).lower())
-            card_counts[key] = card_counts.get(key, 1) + d.get("count", 1)
-
-        per_page = 12
-        total_pages = max(1, math.ceil(len(all_cards) / per_page))
-        page = max(1, min(page, total_pages))
-
-        async def fetch_image(session, url, cardname):
-            cache_dir = "image_cache"
-            os.makedirs(cache_dir, exist_ok=True)
-            if url and (url.startswith("http://") or url.startswith("https://")):
-                url_hash = hashlib.md5(url.encode()).hexdigest()
-                cache_path = os.path.join(cache_dir, f"{url_hash}.png")
-                if os.path.exists(cache_path):
-                    try:
-                        return Image.open(cache_path).convert("RGBA")
-                    except Exception as e:
-                        print(f"[DEBUG] Failed to load cached image for {cardname}: {e}")
-                        return None
-                # If not cached, download and cache (should be rare if you pre-cache)
-                try:
-                    headers = {"User-Agent": "Mozilla/5.0"}
-                    async with session.get(url, headers=headers) as resp:
-                        if resp.status == 200:
-                            img_bytes = await resp.read()
-                            img = Image.open(io.BytesIO(img_bytes)).convert("RGBA")
-                            img.save(cache_path)
-                            return img
-                except Exception as e:
-                    print(f"[DEBUG] Exception fetching image for {cardname}: {e}")
-                    return None
-            elif url and os.path.isfile(url):
-                try:
-                    return Image.open(url).convert("RGBA")
-                except Exception as e:
-                    print(f"[DEBUG] Failed to load local image for {cardname}: {e}")
-                    return None
-            return None
-
-        async def make_embed(page):
-            start = (page - 1) * per_page
-            page_cards = all_cards[start:start+per_page]
-            imgs = []
-            async with aiohttp.ClientSession() as session:
-                tasks = []
-                for card in page_cards:
-                    url = card.get("image_url")
-                    tasks.append(fetch_image(session, url, card.get("name", "?")) if url else None)
-                results = await asyncio.gather(*[t if t else asyncio.sleep(0, result=None) for t in tasks])
-                for idx, card in enumerate(page_cards):
-                    key = (card.get("name","").lower(), str(card.get("number","")), pack)
-                    img = results[idx]
-                    if img is None:
-                        print(f"[DEBUG] Using placeholder for {card.get('name')}")
-                        img = Image.new("RGBA", (180, 240), (100, 100, 100, 255))
-                    count = card_counts.get(key, 0)
-                    overlay = Image.new("RGBA", img.size, (0,0,0,0))
-                    draw = ImageDraw.Draw(overlay)
-                    # --- Draw card number in top left with hashtag ---
-                    card_number = f"#{card.get('number', '?')}"
-                    try:
-                        font_number = ImageFont.truetype("arial.ttf", 40)
-                    except Exception:
-                        font_number = ImageFont.load_default()
-                    num_bbox = draw.textbbox((0, 0), card_number, font=font_number)
-                    num_w = num_bbox[2] - num_bbox[0]
-                    num_h = num_bbox[3] - num_bbox[1]
-                    num_rect_x0 = 8
-                    num_rect_y0 = 8
-                    num_rect_x1 = num_rect_x0 + num_w + 16
-                    num_rect_y1 = num_rect_y0 + num_h + 8
-                    draw.rectangle([num_rect_x0, num_rect_y0, num_rect_x1, num_rect_y1], fill=(0,0,0,180))
-                    draw.text((num_rect_x0 + 8, num_rect_y0 + 4), card_number, font=font_number, fill=(255,0,0,255))
-                    # --- Draw duplicate count in bottom right if more than 1 ---
-                    if count > 1:
-                        try:
-                            font_dup = ImageFont.truetype("arial.ttf", 40)
-                        except Exception:
-                            font_dup = ImageFont.load_default()
-                        dup_text = f"x{count}"
-                        dup_bbox = draw.textbbox((0, 0), dup_text, font=font_dup)
-                        dup_w = dup_bbox[2] - dup_bbox[0]
-                        dup_h = dup_bbox[3] - dup_bbox[1]
-                        dup_rect_x1 = img.width - 8
-                        dup_rect_y1 = img.height - 8
-                        dup_rect_x0 = dup_rect_x1 - dup_w - 16
-                        dup_rect_y0 = dup_rect_y1 - dup_h - 8
-                        draw.rectangle([dup_rect_x0, dup_rect_y0, dup_rect_x1, dup_rect_y1], fill=(0,0,0,180))
-                        draw.text((dup_rect_x0 + 8, dup_rect_y0 + 4), dup_text, font=font_dup, fill=(255,0,0,255))
-                    img = Image.alpha_composite(img, overlay)
-                    if count == 0:
-                        shadow = Image.new("RGBA", img.size, (0, 0, 0, 120))
-                        img = img.convert("RGBA")
-                        img = Image.blend(img, shadow, 0.6)
-                    imgs.append(img)
-            while len(imgs) < per_page:
-                imgs.append(Image.new("RGBA", (180, 240), (100, 100, 100, 255)))
-            cols, rows = 4, 3
-            cw, ch = 180, 240
-            grid = Image.new("RGBA", (cols * cw, rows * ch), (0, 0, 0, 0))
-            for idx, img in enumerate(imgs):
-                r, c = divmod(idx, cols)
-                x, y = c * cw, r * ch
-                resized = img.resize((cw, ch))
-                grid.paste(resized, (x, y), resized)
-            buf = io.BytesIO()
-            grid.save(buf, "PNG")
-            buf.seek(0)
-            file = discord.File(buf, filename="binder.png")
-            embed = discord.Embed(
-                title=f"{ctx.author.display_name}'s {pack.title()} Pack Binder (Page {page}/{total_pages})",
-                color=discord.Color.blue()
-            )
-            embed.set_image(url="attachment://binder.png")
-            return embed, file
-
-        embed, file = await make_embed(page)
-        message = await ctx.send(embed=embed, file=file)
-        if total_pages > 1:
-            await message.add_reaction("◀️")
-            await message.add_reaction("▶️")
-
-            def check(reaction, user):
-                return (
-                    user == ctx.author
-                    and reaction.message.id == message.id
-                    and str(reaction.emoji) in ["◀️", "▶️"]
-                )
+        try:
+            embed, file, view = await self.binder_page(ctx.author, pack, page)
+        except RenderBusy:
+            return await ctx.send(f"{ctx.author.mention}, the binder is busy right now. Please try again in a moment.")
+        await ctx.send(embed=embed, file=file, view=view)
 
-            current_page = page
-            while True:
-                try:
-                    reaction, user = await ctx.bot.wait_for("reaction_add", timeout=60.0, check=check)
-                    if str(reaction.emoji) == "▶️" and current_page < total_pages:
-                        current_page += 1
-                    elif str(reaction.emoji) == "◀️" and current_page > 1:
-                        current_page -= 1
-                    else:
-                        await message.remove_reaction(reaction, user)
-                        continue
-                    await message.remove_reaction(reaction, user)
-                    new_embed, new_file = await make_embed(current_page)
-                    await message.edit(embed=new_embed, attachments=[new_file])
-                except asyncio.TimeoutError:
-                    try:
-                        await message.clear_reactions()
-                    except Exception:
-                        pass
-                    break
+    @commands.command(name="bindercache", hidden=True)
+    @commands.is_owner()
+    async def binder_cache(self, ctx):
+        """Show binder page cache statistics."""
+        stats = self.pages.stats()
+        disk = self.images.cache.stats()
+        sources = self.images.stats()
+        decoded = self.renderer.image_stats()
+        await ctx.send(
+            f"📊 Binder pages: {stats['hits']} memory hits, {stats['disk_hits']} disk hits, "
+            f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate). "
+            f"{stats['pages']} page(s) / {stats['bytes'] // 1024} KB in memory, {stats['disk_bytes'] // 1024} KB on disk.\n"
+            f"🖼️ Card images: {sources['local']} bundled, {sources['cache']} cached, {sources['downloads']} downloaded; "
+            f"disk cache {disk['hits']} hits / {disk['misses']} misses ({disk['hit_rate']:.0%}), "
+            f"{disk['files']} file(s) / {disk['bytes'] // 1024} KB; decoded {decoded['hits']} hits / "
+            f"{decoded['misses']} misses ({decoded['hit_rate']:.0%}), {decoded['bytes'] // 1024} KB across workers."
+        )
 
 async def setup(bot):
     await bot.add_cog(Binder(bot))
\ No newline at end of file
@@ -1,67 +1,53 @@
 import discord
 from discord.ext import commands
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import random
 import asyncio
-from utils import load_user_file, save_user_file, user_packs, save_user_packs, load_pack
+from member_index import IndexedMember
+
+DAILY_REWARD = 1000
+DAILY_COOLDOWN = timedelta(hours=24)
 
 class Currency(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.ledger = bot.ledger
+
+    # Balances live in bot.ledger (see ledger.py); these stay for the other cogs
 
-    def get_balance(self, user_id):
-        data = load_user_file(user_id, "balances.json")
-        if not data:
-            data = {"balance": 0, "last_daily": None}
-        return data
+    async def get_balance(self, user_id):
+        return await self.ledger.account(user_id)
 
-    def add_balance(self, user_id, amount):
-        user_data = self.get_balance(user_id)
-        user_data["balance"] = user_data.get("balance", 0) + amount
-        save_user_file(user_id, "balances.json", user_data)
+    async def add_balance(self, user_id, amount, reason="credit"):
+        return await self.ledger.credit(user_id, amount, reason)
 
-    def set_last_daily(self, user_id):
-        user_data = self.get_balance(user_id)
-        user_data["last_daily"] = datetime.utcnow().isoformat()
-        save_user_file(user_id, "balances.json", user_data)
+    async def set_last_daily(self, user_id):
+        await self.ledger.set_last_daily(user_id, datetime.now(timezone.utc).isoformat())
 
-    def subtract_balance(self, user_id, amount):
-        user_data = self.get_balance(user_id)
-        user_data["balance"] = max(0, user_data.get("balance", 0) - amount)
-        save_user_file(user_id, "balances.json", user_data)
+    async def subtract_balance(self, user_id, amount, reason="debit"):
+        return await self.ledger.debit(user_id, amount, reason, require_funds=False)
 
     @commands.command(name="bal")
     async def bal(self, ctx):
-        user_data = self.get_balance(str(ctx.author.id))
-        amount = user_data.get("balance", 0)
+        amount = await self.ledger.balance(ctx.author.id)
         await ctx.send(f"{ctx.author.mention}, you have 💰 {amount} coins.")
 
     @commands.command(name="give")
-    async def give(self, ctx, member: discord.Member, amount: int):
+    async def give(self, ctx, member: IndexedMember, amount: int):
         if amount <= 0:
             return await ctx.send("Amount must be greater than zero.")
-        sender_id = str(ctx.author.id)
-        receiver_id = str(member.id)
-        if self.get_balance(sender_id).get("balance", 0) < amount:
+        if member.id == ctx.author.id:
+            return await ctx.send("You can't give coins to yourself.")
+        if not await self.ledger.transfer(ctx.author.id, member.id, amount, "give"):
             return await ctx.send("You don’t have enough coins.")
-        self.subtract_balance(sender_id, amount)
-        self.add_balance(receiver_id, amount)
         await ctx.send(f"{ctx.author.display_name} gave 💰 {amount} coins to {member.display_name}!")
 
     @commands.command(name="daily")
     async def daily(self, ctx):
-        user_id = str(ctx.author.id)
-        user_data = self.get_balance(user_id)
-        now = datetime.utcnow()
-        last_claimed = user_data.get("last_daily")
-        if last_claimed:
-            last_time = datetime.fromisoformat(last_claimed)
-            if now - last_time < timedelta(hours=24):
-                remaining = timedelta(hours=24) - (now - last_time)
-                return await ctx.send(f"You've already claimed your daily reward! Try again in {remaining.seconds // 3600}h {(remaining.seconds % 3600) // 60}m.")
-        self.add_balance(user_id, 1000)  # Daily reward amount
-        self.set_last_daily(user_id)
-        await ctx.send(f"{ctx.author.mention}, you claimed your daily reward of 💰 1000 coins!")
+        claimed, remaining = await self.ledger.claim_daily(ctx.author.id, DAILY_REWARD, DAILY_COOLDOWN)
+        if not claimed:
+            return await ctx.send(f"You've already claimed your daily reward! Try again in {remaining.seconds // 3600}h {(remaining.seconds % 3600) // 60}m.")
+        await ctx.send(f"{ctx.author.mention}, you claimed your daily reward of 💰 {DAILY_REWARD} coins!")
 
     @commands.command(name="flip")
     async def flip_coin(self, ctx, guess: str, amount: int):
@@ -72,17 +58,15 @@ class Currency(commands.Cog):
             return await ctx.send("Bet must be greater than zero.")
         if amount > 3000:
             return await ctx.send("The maximum bet is 3000 coins.")
-        user_id = str(ctx.author.id)
-        balance = self.get_balance(user_id).get("balance", 0)
-        if balance < amount:
+        # The stake is taken up front, so two bets at once can't both spend the same coins
+        if await self.ledger.debit(ctx.author.id, amount, "flip", require_funds=True) is None:
             return await ctx.send("You don't have enough coins to bet that amount.")
 
         result = random.choice(["heads", "tails"])
         if guess == result:
-            self.add_balance(user_id, amount)
+            await self.ledger.credit(ctx.author.id, 2 * amount, "flip")
             await ctx.send(f"🪙 It's **{result}**! You won 💰 {amount} coins!")
         else:
-            self.subtract_balance(user_id, amount)
             await ctx.send(f"🪙 It's **{result}**! You lost 💰 {amount} coins.")
 
     @commands.command(name="fwg")
@@ -94,9 +78,8 @@ class Currency(commands.Cog):
         }
         if amount <= 0:
             return await ctx.send("Bet must be greater than zero.")
-        user_id = str(ctx.author.id)
-        balance = self.get_balance(user_id).get("balance", 0)
-        if balance < amount:
+        # Held while waiting for the reaction: paid back twice on a win, refunded on a tie or timeout
+        if await self.ledger.debit(ctx.author.id, amount, "fwg", require_funds=True) is None:
             return await ctx.send("You don't have enough coins to bet that amount.")
 
         embed = discord.Embed(
@@ -104,23 +87,19 @@ class Currency(commands.Cog):
             description="React with your choice!\n🔥 = Fire\n💧 = Water\n🌿 = Grass",
             color=discord.Color.green()
         )
-        message = await ctx.send(embed=embed)
-        for emoji in choices:
-            await message.add_reaction(emoji)
-
-        def check(reaction, user):
-            return (
-                user == ctx.author and
-                str(reaction.emoji) in choices and
-                reaction.message.id == message.id
-            )
-
         try:
-            reaction, user = await self.bot.wait_for("reaction_add", timeout=20.0, check=check)
+            message = await ctx.send(embed=embed)
+            for emoji in choices:
+                await message.add_reaction(emoji)
+            reaction = await self.bot.reaction_router.wait(message.id, emojis=choices, users={ctx.author.id}, timeout=20.0)
         except asyncio.TimeoutError:
-            await ctx.send("Timed out! No choice made.")
+            await self.ledger.credit(ctx.author.id, amount, "fwg refund")
+            await ctx.send("Timed out! No choice made, your bet was returned.")
             await message.delete()
             return
+        except Exception:
+            await self.ledger.credit(ctx.author.id, amount, "fwg refund")
+            raise
 
         player_choice = choices[str(reaction.emoji)]
         bot_choice = random.choice(list(choices.values()))
@@ -132,12 +111,12 @@ class Currency(commands.Cog):
 
         result_msg = f"You chose **{player_choice}**. I chose **{bot_choice}**.\n"
         if player_choice == bot_choice:
+            await self.ledger.credit(ctx.author.id, amount, "fwg refund")
             result_msg += "It's a tie! No coins won or lost."
         elif win_map[player_choice] == bot_choice:
-            self.add_balance(user_id, amount)
+            await self.ledger.credit(ctx.author.id, 2 * amount, "fwg")
             result_msg += f"You win! 💰 {amount} coins added."
         else:
-            self.subtract_balance(user_id, amount)
             result_msg += f"You lose! 💰 {amount} coins lost."
 
         await ctx.send(result_msg)
@@ -18,8 +18,8 @@ class Help(commands.Cog):
             inline=False
         )
         embed.add_field(
-            name="`!op <pack_name> [amount]`",
-            value="Open 1-5 booster packs to collect cards. Example: `!op base 3`",
+            name="`!op <pack_name> [amount|all]`",
+            value="Open booster packs to collect cards. Example: `!op base 3` or `!op base all`",
             inline=False
         )
         embed.add_field(
@@ -73,8 +73,14 @@ class Help(commands.Cog):
             inline=False
         )
         embed.add_field(
-            name="`!trade @user <your_card> for <their_card>`",
-            value="Trade cards with another user. Example: `!trade @Ash base.001.alakazam for base.004.charizard`",
+            name="`!trade @user <what you give> for <what you want>`",
+            value="Offer a trade: duplicate cards, coins and packs, comma separated. They accept with ✅ within 10 minutes.\n"
+                  "Example: `!trade @Ash base 58 x2, 300 coins for jungle 12, 1 fossil pack`",
+            inline=False
+        )
+        embed.add_field(
+            name="`!top coins`, `!top <pack_name>`",
+            value="Leaderboards: the richest players, or who has collected the most of a pack. Example: `!top base`",
             inline=False
         )
         embed.set_footer(text="Use commands without <> or [] symbols. [] means optional, <> means required.")
@@ -0,0 +1,47 @@
+import discord
+from discord.ext import commands
+from catalog import get_catalog
+
+TOP_COUNT = 10
+MEDALS = ["🥇", "🥈", "🥉"]
+
+class Leaderboard(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="top")
+    async def top(self, ctx, board: str = "coins"):
+        """Show the richest players (`!top coins`) or who has collected the most of a pack (`!top base`)."""
+        board = board.lower()
+        catalog = get_catalog()
+        if board != "coins" and board not in catalog.packs:
+            packs = ", ".join(f"`{pack}`" for pack in catalog.pack_names)
+            return await ctx.send(f"{ctx.author.mention}, use `!top coins` or `!top <pack>` ({packs}).")
+
+        standings = self.bot.leaderboards.standings(board, ctx.author.id, TOP_COUNT)
+        top, (rank, score) = standings or ([], (None, 0))
+        total = len(catalog.cards(board)) if board != "coins" else None
+
+        def describe(value):
+            if total is None:
+                return f"💰 {value} coins"
+            return f"{value}/{total} cards ({value * 100 // total}%)"
+
+        lines = [
+            f"{MEDALS[idx] if idx < len(MEDALS) else f'`{idx + 1}.`'} <@{user_id}> — {describe(value)}"
+            for idx, (user_id, value) in enumerate(top)
+        ]
+        title = "💰 Richest Players" if total is None else f"📚 {board.title()} Collectors"
+        embed = discord.Embed(
+            title=title,
+            description="\n".join(lines) or "Nobody is ranked yet.",
+            color=discord.Color.gold()
+        )
+        if rank:
+            embed.set_footer(text=f"You are #{rank} with {describe(score)}.")
+        else:
+            embed.set_footer(text="You aren't ranked yet.")
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Leaderboard(bot))
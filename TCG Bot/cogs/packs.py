@@ -2,190 +2,122 @@ import random
 import discord
 from discord.ext import commands
 from typing import Optional
-from utils import add_cards_to_collection, user_packs, save_user_packs, load_pack, load_user_file, save_user_file
-import os
-import json
-import time
+from catalog import get_catalog
+from opening import open_packs
+from meters import RegenMeter, format_duration
+from locks import transaction
+from utils import apply_card_counts, load_user_file_async
 
-# --- Pack Energy System ---
+# --- Energy meters ---
 MAX_PACK_ENERGY = 2
 PACK_ENERGY_REGEN_SECONDS = 12 * 60 * 60  # 12 hours
-
-def get_user_pack_energy(user_id):
-    data = load_user_file(user_id, "pack_energy.json")
-    now = int(time.time())
-    if not data:
-        data = {"pack_energy": MAX_PACK_ENERGY, "last_regen": now}
-        save_user_file(user_id, "pack_energy.json", data)
-    else:
-        last_regen = data.get("last_regen", now)
-        pack_energy = data.get("pack_energy", MAX_PACK_ENERGY)
-        elapsed = now - last_regen
-        regen = elapsed // PACK_ENERGY_REGEN_SECONDS
-        if regen > 0:
-            pack_energy = min(MAX_PACK_ENERGY, pack_energy + regen)
-            last_regen = last_regen + regen * PACK_ENERGY_REGEN_SECONDS
-            data = {"pack_energy": pack_energy, "last_regen": last_regen}
-            save_user_file(user_id, "pack_energy.json", data)
-    return data["pack_energy"]
-
-def use_pack_energy(user_id):
-    data = load_user_file(user_id, "pack_energy.json")
-    now = int(time.time())
-    if not data:
-        data = {"pack_energy": MAX_PACK_ENERGY, "last_regen": now}
-    else:
-        last_regen = data.get("last_regen", now)
-        pack_energy = data.get("pack_energy", MAX_PACK_ENERGY)
-        elapsed = now - last_regen
-        regen = elapsed // PACK_ENERGY_REGEN_SECONDS
-        if regen > 0:
-            pack_energy = min(MAX_PACK_ENERGY, pack_energy + regen)
-            last_regen = last_regen + regen * PACK_ENERGY_REGEN_SECONDS
-        data = {"pack_energy": pack_energy, "last_regen": last_regen}
-    if data["pack_energy"] > 0:
-        data["pack_energy"] -= 1
-        save_user_file(user_id, "pack_energy.json", data)
-        return True
-    save_user_file(user_id, "pack_energy.json", data)
-    return False
-# --- End Pack Energy System ---
-
-# --- Wonderpack Energy System ---
 MAX_WONDERPACK_ENERGY = 4  # 4 chances per day
 WONDERPACK_ENERGY_REGEN_SECONDS = 6 * 60 * 60  # 6 hours
 
-def get_user_wonderpack_energy(user_id):
-    data = load_user_file(user_id, "wonderpack_energy.json")
-    now = int(time.time())
-    if not data:
-        data = {"wonderpack_energy": MAX_WONDERPACK_ENERGY, "last_regen": now}
-        save_user_file(user_id, "wonderpack_energy.json", data)
-    else:
-        last_regen = data.get("last_regen", now)
-        wonderpack_energy = data.get("wonderpack_energy", MAX_WONDERPACK_ENERGY)
-        elapsed = now - last_regen
-        regen = elapsed // WONDERPACK_ENERGY_REGEN_SECONDS
-        if regen > 0:
-            wonderpack_energy = min(MAX_WONDERPACK_ENERGY, wonderpack_energy + regen)
-            last_regen = last_regen + regen * WONDERPACK_ENERGY_REGEN_SECONDS
-            data = {"wonderpack_energy": wonderpack_energy, "last_regen": last_regen}
-            save_user_file(user_id, "wonderpack_energy.json", data)
-    return data["wonderpack_energy"]
-
-def use_wonderpack_energy(user_id):
-    data = load_user_file(user_id, "wonderpack_energy.json")
-    now = int(time.time())
-    if not data:
-        data = {"wonderpack_energy": MAX_WONDERPACK_ENERGY, "last_regen": now}
-    else:
-        last_regen = data.get("last_regen", now)
-        wonderpack_energy = data.get("wonderpack_energy", MAX_WONDERPACK_ENERGY)
-        elapsed = now - last_regen
-        regen = elapsed // WONDERPACK_ENERGY_REGEN_SECONDS
-        if regen > 0:
-            wonderpack_energy = min(MAX_WONDERPACK_ENERGY, wonderpack_energy + regen)
-            last_regen = last_regen + regen * WONDERPACK_ENERGY_REGEN_SECONDS
-        data = {"wonderpack_energy": wonderpack_energy, "last_regen": last_regen}
-    if data["wonderpack_energy"] > 0:
-        data["wonderpack_energy"] -= 1
-        save_user_file(user_id, "wonderpack_energy.json", data)
-        return True
-    save_user_file(user_id, "wonderpack_energy.json", data)
-    return False
-# --- End Wonderpack Energy System ---
+PACK_ENERGY = RegenMeter("pack", MAX_PACK_ENERGY, PACK_ENERGY_REGEN_SECONDS)
+WONDERPACK_ENERGY = RegenMeter("wonderpack", MAX_WONDERPACK_ENERGY, WONDERPACK_ENERGY_REGEN_SECONDS)
+WONDERPICK_TTL_SECONDS = 15 * 60  # an unanswered wonderpick is dropped after this
 
 class Packs(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.pending_wonderpack = {}
+        self.sessions = bot.sessions
+        self.sessions.register("wonderpick", WONDERPICK_TTL_SECONDS, on_expire=self.on_wonderpick_expired)
+
+    async def cog_load(self):
+        # Wonderpicks restored from the last run's snapshot need their reactions routed again
+        for user_id, pending in self.sessions.items("wonderpick"):
+            if pending["msg_id"] is None:
+                # Saved while its message was still being posted; nothing to react to
+                self.sessions.pop("wonderpick", user_id)
+                continue
+            self.bot.reaction_router.register(pending["msg_id"], self.on_wonderpick_reaction, users={int(user_id)})
+
+    def on_wonderpick_expired(self, user_id, pending):
+        self.bot.reaction_router.unregister(pending["msg_id"])
 
     @commands.command(name="op")
-    async def open_pack(self, ctx, pack_name: Optional[str] = None, amount: int = 1):
+    async def open_pack(self, ctx, pack_name: Optional[str] = None, amount: str = "1"):
+        """Open unopened packs: `!op base 3`, or `!op base all` to open every one you have."""
         user_id = str(ctx.author.id)
+        # Packs and collection are read and written under the user's lock, so a
+        # purchase or a second !op running meanwhile can't be overwritten
+        async with transaction(user_id) as tx:
+            packs = await tx.packs(user_id)
+            if not packs:
+                return await ctx.send(f"{ctx.author.mention}, you don't have any unopened packs.")
 
-        packs = user_packs(user_id)
-        if not packs:
-            return await ctx.send(f"{ctx.author.mention}, you don't have any unopened packs.")
+            if not pack_name:
+                if isinstance(packs, list):
+                    user_inventory = {p["pack"]: p["count"] for p in packs}
+                else:
+                    user_inventory = packs
+                if not user_inventory:
+                    return await ctx.send(f"{ctx.author.mention}, you don't have any unopened packs.")
+                pack_list = "\n".join(f"`{name}` × {qty}" for name, qty in user_inventory.items())
+                return await ctx.send(
+                    f"{ctx.author.mention}, please specify a pack to open.\nYou own:\n{pack_list}"
+                )
 
-        if not pack_name:
+            pack_name = pack_name.lower()
             if isinstance(packs, list):
-                user_inventory = {p["pack"]: p["count"] for p in packs}
+                user_pack_count = 0
+                for pack in packs:
+                    if pack.get("pack") == pack_name:
+                        user_pack_count = pack.get("count", 0)
+                        break
             else:
-                user_inventory = packs
-            if not user_inventory:
-                return await ctx.send(f"{ctx.author.mention}, you don't have any unopened packs.")
-            pack_list = "\n".join(f"`{name}` × {qty}" for name, qty in user_inventory.items())
-            return await ctx.send(
-                f"{ctx.author.mention}, please specify a pack to open.\nYou own:\n{pack_list}"
-            )
-
-        pack_name = pack_name.lower()
-        if amount < 1 or amount > 5:
-            return await ctx.send(f"{ctx.author.mention}, you can only open between 1 and 5 packs at a time.")
+                user_pack_count = packs.get(pack_name, 0)
 
-        if isinstance(packs, list):
-            user_pack_count = 0
-            for pack in packs:
-                if pack.get("pack") == pack_name:
-                    user_pack_count = pack.get("count", 0)
-                    break
-        else:
-            user_pack_count = packs.get(pack_name, 0)
+            if amount.lower() == "all":
+                amount = max(1, user_pack_count)
+            elif amount.isdigit() and int(amount) >= 1:
+                amount = int(amount)
+            else:
+                return await ctx.send(f"{ctx.author.mention}, amount must be a positive number or `all`.")
 
-        if user_pack_count < amount:
-            return await ctx.send(f"{ctx.author.mention}, you only have {user_pack_count} `{pack_name}` pack(s).")
+            if user_pack_count < amount:
+                return await ctx.send(f"{ctx.author.mention}, you only have {user_pack_count} `{pack_name}` pack(s).")
 
-        try:
-            pack_data = load_pack(pack_name)
-        except FileNotFoundError:
-            return await ctx.send(f"{ctx.author.mention}, pack `{pack_name}` not found.")
-
-        cards = pack_data.get("cards", []) if isinstance(pack_data, dict) else pack_data
-        if not cards:
-            return await ctx.send(f"{ctx.author.mention}, no cards found in `{pack_name}` pack.")
-
-        commons = [c for c in cards if c.get("rarity", "common") == "common"]
-        uncommons = [c for c in cards if c.get("rarity") == "uncommon"]
-        rares = [c for c in cards if c.get("rarity") == "rare"]
-        energies = [c for c in cards if c.get("rarity") == "energy"]
-
-        opened_cards = []
-        for _ in range(amount):
-            if len(commons) < 6 or len(uncommons) < 3 or len(rares) < 1 or len(energies) < 1:
+            catalog = get_catalog()
+            if not catalog.cards(pack_name):
+                return await ctx.send(f"{ctx.author.mention}, pack `{pack_name}` not found.")
+            if not catalog.can_open(pack_name):
                 return await ctx.send(f"{ctx.author.mention}, not enough cards of each rarity in `{pack_name}` pack.")
 
-            selected = []
-            selected += random.sample(commons, 6)
-            selected += random.sample(uncommons, 3)
-            selected += random.sample(rares, 1)
-            selected += random.sample(energies, 1)
-            opened_cards.extend(selected)
-
-        # Update packs
-        if isinstance(packs, list):
-            for pack in packs:
-                if pack.get("pack") == pack_name:
-                    pack["count"] -= amount
-                    if pack["count"] <= 0:
-                        packs.remove(pack)
-                    break
-        else:
-            packs[pack_name] -= amount
-            if packs[pack_name] <= 0:
-                del packs[pack_name]
+            # Draw every pack in one batch: {card: copies}
+            pulls = open_packs(catalog, pack_name, amount)
 
-        save_user_packs(user_id, packs)
+            # Update packs
+            if isinstance(packs, list):
+                for pack in packs:
+                    if pack.get("pack") == pack_name:
+                        pack["count"] -= amount
+                        if pack["count"] <= 0:
+                            packs.remove(pack)
+                        break
+            else:
+                packs[pack_name] -= amount
+                if packs[pack_name] <= 0:
+                    del packs[pack_name]
 
-        # Add opened cards to user's binder collection
-        add_cards_to_collection(user_id, opened_cards, pack_name)
+            tx.save_packs(user_id, packs)
 
-        # ✨ Group opened cards by rarity
+            # Add opened cards to user's binder collection in a single update
+            collection = await tx.collection(user_id)
+            result = apply_card_counts(collection, pulls, pack_name)
+            tx.save_collection(user_id, collection)
+
+        new_cards = set(result["new"])
+
+        # ✨ Group opened cards by rarity, one line per card
         grouped = {"common": [], "uncommon": [], "rare": [], "energy": []}
-        for card in opened_cards:
-            rarity = card.get("rarity", "common")
-            name = card.get("name", str(card))
-            grouped[rarity].append(name)
+        for card in sorted(pulls, key=lambda c: int(c.number) if c.number.isdigit() else 0):
+            copies = pulls[card]
+            line = card.name if copies == 1 else f"{card.name} ×{copies}"
+            if card in new_cards:
+                line += " 🆕"
+            grouped[card.rarity].append(line)
 
         # 🖼️ Format output
         rarity_order = ["common", "uncommon", "rare", "energy"]
@@ -202,9 +134,16 @@ class Packs(commands.Cog):
                 names = "\n".join(f"• {n}" for n in grouped[rarity])
                 result_lines.append(f"{rarity_labels[rarity]}:\n{names}")
 
-        result_message = "\n\n".join(result_lines)
-
-        await ctx.send(f"{ctx.author.mention}, you opened {amount} `{pack_name}` pack(s) and got:\n\n{result_message}")
+        header = f"{ctx.author.mention}, you opened {amount} `{pack_name}` pack(s) and got:"
+        # Big openings can exceed Discord's 2000 character limit, so split on section/line boundaries
+        chunk = header
+        for line in "\n\n".join(result_lines).split("\n"):
+            if len(chunk) + len(line) + 1 > 1900:
+                await ctx.send(chunk)
+                chunk = ""
+            chunk = f"{chunk}\n{line}" if chunk else line
+        if chunk:
+            await ctx.send(chunk)
 
     @commands.command(aliases=["fp"])
     async def freepack(self, ctx, *, pack_name: str):
@@ -215,92 +154,52 @@ class Packs(commands.Cog):
             return
 
         user_id = str(ctx.author.id)
-        if use_pack_energy(user_id):
-            # Give the user a free pack (add 1 to their unopened packs)
-            packs = user_packs(user_id)
-            if isinstance(packs, list):
-                found = False
-                for pack in packs:
-                    if pack.get("pack") == pack_name:
-                        pack["count"] += 1
-                        found = True
-                        break
-                if not found:
-                    packs.append({"pack": pack_name, "count": 1})
-            else:
-                packs[pack_name] = packs.get(pack_name, 0) + 1
-            save_user_packs(user_id, packs)
+        async with transaction(user_id) as tx:
+            energy = PACK_ENERGY.spend(await tx.load(user_id, PACK_ENERGY.filename))
+            if energy is not None:
+                tx.save(user_id, PACK_ENERGY.filename, energy)
+                # Give the user a free pack (add 1 to their unopened packs)
+                packs = await tx.packs(user_id)
+                if isinstance(packs, list):
+                    found = False
+                    for pack in packs:
+                        if pack.get("pack") == pack_name:
+                            pack["count"] += 1
+                            found = True
+                            break
+                    if not found:
+                        packs.append({"pack": pack_name, "count": 1})
+                else:
+                    packs[pack_name] = packs.get(pack_name, 0) + 1
+                tx.save_packs(user_id, packs)
+        if energy is not None:
             await ctx.send(f"{ctx.author.mention} used 1 Pack Energy and received a free '{pack_name}' pack!")
         else:
             await ctx.send(f"{ctx.author.mention}, you don't have enough Pack Energy! Wait for it to recharge.")
 
-    @commands.command(aliases=["pe"])
-    async def packenergy(self, ctx):
-        """Check your current Pack Energy and time until next recharge."""
-        user_id = str(ctx.author.id)
-        data = load_user_file(user_id, "pack_energy.json")
-        now = int(time.time())
-        if not data:
-            pack_energy = MAX_PACK_ENERGY
-            time_left = 0
-        else:
-            pack_energy = get_user_pack_energy(user_id)
-            last_regen = data.get("last_regen", now)
-            current_energy = data.get("pack_energy", MAX_PACK_ENERGY)
-            if current_energy < MAX_PACK_ENERGY:
-                next_regen = last_regen + PACK_ENERGY_REGEN_SECONDS
-                time_left = max(0, next_regen - now)
-            else:
-                time_left = 0
-
+    async def send_energy(self, ctx, meter, label):
+        data = await load_user_file_async(str(ctx.author.id), meter.filename)
+        energy, _, time_left = meter.state(data)
         if time_left > 0:
-            hours = time_left // 3600
-            minutes = (time_left % 3600) // 60
-            seconds = time_left % 60
-            time_str = f"{hours}h {minutes}m {seconds}s"
             await ctx.send(
-                f"{ctx.author.mention}, you have {pack_energy}/{MAX_PACK_ENERGY} Pack Energy.\n"
-                f"Next energy in: **{time_str}**"
+                f"{ctx.author.mention}, you have {energy}/{meter.maximum} {label}.\n"
+                f"Next energy in: **{format_duration(time_left)}**"
             )
         else:
             await ctx.send(
-                f"{ctx.author.mention}, you have {pack_energy}/{MAX_PACK_ENERGY} Pack Energy.\n"
+                f"{ctx.author.mention}, you have {energy}/{meter.maximum} {label}.\n"
                 f"Your energy is full!"
             )
 
+    @commands.command(aliases=["pe"])
+    async def packenergy(self, ctx):
+        """Check your current Pack Energy and time until next recharge."""
+        await self.send_energy(ctx, PACK_ENERGY, "Pack Energy")
+
     @commands.command(aliases=["we"])
     async def wonderenergy(self, ctx):
         """Check your current Wonderpack Energy and time until next recharge."""
-        user_id = str(ctx.author.id)
-        data = load_user_file(user_id, "wonderpack_energy.json")
-        now = int(time.time())
-        if not data:
-            wonderpack_energy = MAX_WONDERPACK_ENERGY
-            time_left = 0
-        else:
-            wonderpack_energy = get_user_wonderpack_energy(user_id)
-            last_regen = data.get("last_regen", now)
-            current_energy = data.get("wonderpack_energy", MAX_WONDERPACK_ENERGY)
-            if current_energy < MAX_WONDERPACK_ENERGY:
-                next_regen = last_regen + WONDERPACK_ENERGY_REGEN_SECONDS
-                time_left = max(0, next_regen - now)
-            else:
-                time_left = 0
-
-        if time_left > 0:
-            hours = time_left // 3600
-            minutes = (time_left % 3600) // 60
-            seconds = time_left % 60
-            time_str = f"{hours}h {minutes}m {seconds}s"
-            await ctx.send(
-                f"{ctx.author.mention}, you have {wonderpack_energy}/{MAX_WONDERPACK_ENERGY} Wonderpack Energy.\n"
-                f"Next energy in: **{time_str}**"
-            )
-        else:
-            await ctx.send(
-                f"{ctx.author.mention}, you have {wonderpack_energy}/{MAX_WONDERPACK_ENERGY} Wonderpack Energy.\n"
-                f"Your energy is full!"
-            )
+        await self.send_energy(ctx, WONDERPACK_ENERGY, "Wonderpack Energy")
 
     @commands.command(name="wonderpick", aliases=["wp"])
     async def wonderpick(self, ctx):
@@ -310,35 +209,42 @@ class Packs(commands.Cog):
         Shows images of the cards if available.
         """
         user_id = str(ctx.author.id)
-        if user_id in self.pending_wonderpack:
+        if ("wonderpick", user_id) in self.sessions:
             await ctx.send(f"{ctx.author.mention}, you already have a Wonderpick in progress!")
             return
-
-        if not use_wonderpack_energy(user_id):
+        # Hold the slot before the first await, so a second !wp sent meanwhile sees it
+        self.sessions.set("wonderpick", user_id, {"msg_id": None, "stage": "starting"})
+        started = False
+        try:
+            started = await self.start_wonderpick(ctx, user_id)
+        finally:
+            if not started:
+                self.sessions.pop("wonderpick", user_id)
+
+    async def start_wonderpick(self, ctx, user_id):
+        """Spend the energy and post the five cards. Returns True once the session is live."""
+        async with transaction(user_id) as tx:
+            energy = WONDERPACK_ENERGY.spend(await tx.load(user_id, WONDERPACK_ENERGY.filename))
+            if energy is not None:
+                tx.save(user_id, WONDERPACK_ENERGY.filename, energy)
+        if energy is None:
             await ctx.send(f"{ctx.author.mention}, you don't have enough Wonderpack Energy! Wait for it to recharge.")
-            return
+            return False
 
         # --- Get shop packs ---
-        shop_packs = ["base", "fossil", "rocket", "jungle"]  # Replace with your actual shop pack names or function
+        shop_packs = [p for p in ["base", "fossil", "rocket", "jungle"] if p in get_catalog().packs]
 
         if not shop_packs:
             await ctx.send("No shop packs available.")
-            return
+            return False
 
         # Pick a random shop pack
+        catalog = get_catalog()
         pack_name = random.choice(shop_packs)
-        try:
-            pack_data = load_pack(pack_name)
-        except Exception:
-            await ctx.send("Failed to load a random shop pack.")
-            return
-
-        cards = pack_data.get("cards", []) if isinstance(pack_data, dict) else pack_data
-        # Exclude energy cards
-        non_energy_cards = [card for card in cards if card.get("rarity", "common").lower() != "energy"]
+        non_energy_cards = catalog.non_energy.get(pack_name, ())
         if len(non_energy_cards) < 5:
             await ctx.send("Not enough non-energy cards in the selected pack.")
-            return
+            return False
 
         # Randomly pick 5 non-energy cards
         chosen_cards = random.sample(non_energy_cards, 5)
@@ -347,14 +253,12 @@ class Packs(commands.Cog):
         emoji_list = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣"]
         embeds = []
         for i, card in enumerate(chosen_cards):
-            name = card.get("name", f"Card {i+1}")
-            image_url = card.get("image_url")
             embed = discord.Embed(
-                title=f"{emoji_list[i]} {name}",
+                title=f"{emoji_list[i]} {card.name}",
                 description=""
             )
-            if image_url:
-                embed.set_image(url=image_url)
+            if card.image_url:
+                embed.set_image(url=card.image_url)
             else:
                 embed.description = "*(No image available)*"
             embeds.append(embed)
@@ -367,38 +271,38 @@ class Packs(commands.Cog):
         )
         await msg.add_reaction("✅")
 
-        # Store the options for the user
-        self.pending_wonderpack[user_id] = {
+        # Replace the placeholder with the options for the user
+        self.sessions.set("wonderpick", user_id, {
             "pack": pack_name,
             "cards": chosen_cards,
             "msg_id": msg.id,
             "stage": "awaiting_shuffle"
-        }
-
-    @commands.Cog.listener()
-    async def on_reaction_add(self, reaction, user):
-        if user.bot:
-            return
+        })
+        self.bot.reaction_router.register(msg.id, self.on_wonderpick_reaction, users={ctx.author.id})
+        return True
 
+    async def on_wonderpick_reaction(self, payload):
         emoji_list = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣"]
-        user_id = str(user.id)
-        pending = self.pending_wonderpack.get(user_id)
-        if not pending:
+        user_id = str(payload.user_id)
+        mention = f"<@{payload.user_id}>"
+        pending = self.sessions.get("wonderpick", user_id)
+        if not pending or payload.message_id != pending["msg_id"]:
             return
-        if reaction.message.id != pending["msg_id"]:
+        channel = self.bot.get_channel(payload.channel_id)
+        if channel is None:
             return
+        message = channel.get_partial_message(payload.message_id)
 
         # Stage 1: Awaiting shuffle (✅)
-        if pending.get("stage") == "awaiting_shuffle" and str(reaction.emoji) == "✅":
+        if pending.get("stage") == "awaiting_shuffle" and str(payload.emoji) == "✅":
             random.shuffle(pending["cards"])
             pending["stage"] = "awaiting_pick"
-            self.pending_wonderpack[user_id] = pending
 
             # Edit the message to hide the cards and prompt for pick
             try:
-                await reaction.message.edit(
+                await message.edit(
                     content=(
-                        f"{user.mention}, the cards have been shuffled and hidden!\n"
+                        f"{mention}, the cards have been shuffled and hidden!\n"
                         f"React with 1️⃣, 2️⃣, 3️⃣, 4️⃣, or 5️⃣ to pick your card!"
                     ),
                     embeds=[]
@@ -406,30 +310,37 @@ class Packs(commands.Cog):
             except Exception:
                 pass
             for emoji in emoji_list:
-                await reaction.message.add_reaction(emoji)
+                await message.add_reaction(emoji)
             return
 
         # Stage 2: Awaiting pick (1️⃣-5️⃣)
-        if pending.get("stage") == "awaiting_pick" and str(reaction.emoji) in emoji_list:
-            idx = emoji_list.index(str(reaction.emoji))
+        if pending.get("stage") == "awaiting_pick" and str(payload.emoji) in emoji_list:
+            idx = emoji_list.index(str(payload.emoji))
             selected_card = pending["cards"][idx]
-
-            # Check if the card is a duplicate before adding
-            result = add_cards_to_collection(user_id, [selected_card], pending["pack"])
-            card_name = selected_card.get('name', str(selected_card))
-
-            # Compose the response message
-            if isinstance(result, dict) and result.get("duplicates"):
-                await reaction.message.channel.send(
-                    f"{user.mention}, you picked **{card_name}** from **{pending['pack']}**!\n"
-                    f"That card was already in your binder, so it was added to your **duplicate binder**."
-                )
-            else:
-                await reaction.message.channel.send(
-                    f"{user.mention}, you picked **{card_name}** from **{pending['pack']}**!\n"
-                    f"That card has been added to your **binder**."
-                )
-            del self.pending_wonderpack[user_id]
+            pending["stage"] = "picked"  # a second quick click must not pick again
+            try:
+                # Check if the card is a duplicate before adding
+                async with transaction(user_id) as tx:
+                    collection = await tx.collection(user_id)
+                    result = apply_card_counts(collection, {selected_card: 1}, pending["pack"])
+                    tx.save_collection(user_id, collection)
+                card_name = selected_card.name
+
+                # Compose the response message
+                if isinstance(result, dict) and result.get("duplicates"):
+                    await channel.send(
+                        f"{mention}, you picked **{card_name}** from **{pending['pack']}**!\n"
+                        f"That card was already in your binder, so it was added to your **duplicate binder**."
+                    )
+                else:
+                    await channel.send(
+                        f"{mention}, you picked **{card_name}** from **{pending['pack']}**!\n"
+                        f"That card has been added to your **binder**."
+                    )
+            finally:
+                # Even if saving or sending fails, the session must not stay stuck at "picked"
+                self.sessions.pop("wonderpick", user_id)
+                self.bot.reaction_router.unregister(payload.message_id)
 
 async def setup(bot):
     await bot.add_cog(Packs(bot))
\ No newline at end of file
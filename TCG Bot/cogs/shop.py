@@ -3,7 +3,7 @@ from discord.ext import commands
 import os
 import json
 import asyncio
-from utils import user_packs, save_user_packs, load_pack
+from locks import transaction
 
 SHOP_ITEMS_FILE = "data/shop_items.json"
 
@@ -55,15 +55,8 @@ class Shop(commands.Cog):
             for emoji in emoji_list:
                 await message.add_reaction(emoji)
 
-            def check(reaction, user):
-                return (
-                    user == ctx.author and
-                    (str(reaction.emoji) in self.reverse_emoji_map or str(reaction.emoji) == "❌")
-                    and reaction.message.id == message.id
-                )
-
             try:
-                reaction, user = await self.bot.wait_for("reaction_add", timeout=30.0, check=check)
+                reaction = await self.bot.reaction_router.wait(message.id, emojis=emoji_list, users={ctx.author.id}, timeout=30.0)
                 emoji = str(reaction.emoji)
                 if emoji == "❌":
                     await message.delete()
@@ -82,43 +75,37 @@ class Shop(commands.Cog):
                     await message.delete()
                     break
 
-                user_data = currency_cog.get_balance(user_id)
-                balance = user_data["balance"]
-                if balance < price:
+                # Coins and packs change together under the user's lock, so an !op
+                # running at the same time can't overwrite the new packs
+                if "box_of" in item:
+                    pack_to_add, packs_to_add = item["box_of"], 36
+                else:
+                    pack_to_add, packs_to_add = pack_name, 1
+                async with transaction(user_id) as tx:
+                    packs = await tx.packs(user_id)
+                    # Ensure packs is always a list of dicts
+                    if not isinstance(packs, list):
+                        packs = []
+                    paid = await currency_cog.ledger.debit(user_id, price, f"shop:{pack_name}") is not None
+                    if paid:
+                        found = False
+                        for pack in packs:
+                            if pack.get("pack") == pack_to_add:
+                                pack["count"] += packs_to_add
+                                found = True
+                                break
+                        if not found:
+                            packs.append({"pack": pack_to_add, "count": packs_to_add})
+                        tx.save_packs(user_id, packs)
+
+                if not paid:
                     await ctx.send(f"{ctx.author.mention}, you don't have enough coins for {pack_name.title()}!", delete_after=3)
                     await message.delete()
                     continue
-
-                currency_cog.add_balance(user_id, -price)
-                packs = user_packs(user_id) or []
-                # Ensure packs is always a list of dicts
-                if not isinstance(packs, list):
-                    packs = []
-
                 if "box_of" in item:
-                    pack_to_add = item["box_of"]
-                    packs_to_add = 36
-                    found = False
-                    for pack in packs:
-                        if pack.get("pack") == pack_to_add:
-                            pack["count"] += packs_to_add
-                            found = True
-                            break
-                    if not found:
-                        packs.append({"pack": pack_to_add, "count": packs_to_add})
-                    save_user_packs(user_id, packs)
                     await ctx.send(f"{ctx.author.mention}, you bought 1 **{pack_name.title()}**! "
                                    f"That's {packs_to_add} {pack_to_add.title()} packs. Use `!op {pack_to_add}` to open them.", delete_after=5)
                 else:
-                    found = False
-                    for pack in packs:
-                        if pack.get("pack") == pack_name:
-                            pack["count"] += 1
-                            found = True
-                            break
-                    if not found:
-                        packs.append({"pack": pack_name, "count": 1})
-                    save_user_packs(user_id, packs)
                     await ctx.send(f"{ctx.author.mention}, you bought 1 **{pack_name.title()}** pack! "
                                    f"Use `!op {pack_name}` to open it later.", delete_after=5)
 
@@ -1,163 +1,257 @@
-import discord
+import re
+from collections import Counter
 from discord.ext import commands
-import asyncio
-from utils import load_user_file, save_user_file
+from catalog import get_catalog
+from locks import transaction
+from utils import load_collection_async, user_packs_async
+
+# Trade offers: each side puts a basket on the table (duplicate cards, coins,
+# unopened packs), the other user accepts with ✅, and the whole exchange is
+# committed at once: a single coin ledger record carries the net coins and both
+# users' new collections and packs, so one fsync commits all of it (see
+# CoinLedger.trade). Offers are sessions ("trade", keyed by the offer
+# message id), so they expire after TRADE_OFFER_TTL_SECONDS and survive restarts.
+
+TRADE_OFFER_TTL_SECONDS = 10 * 60
+ACCEPT, DECLINE = "✅", "❌"
+
+USAGE = (
+    "Usage: `!trade @user <what you give> for <what you want>`, items separated by commas.\n"
+    "Cards: `base 58`, `base 58 x2` or `base.058.pikachu` · Coins: `500 coins` · Packs: `2 fossil packs` · `nothing`\n"
+    "Example: `!trade @Ash base 58 x2, 300 coins for jungle 12, 1 fossil pack`"
+)
+
+COINS_RE = re.compile(r"^(\d+)\s*(?:c|coins?)$")
+PACKS_RE = re.compile(r"^(?:(\d+)\s*(?:x\s*)?)?([a-z0-9_-]+)\s+packs?$")
+CARD_RE = re.compile(r"^([a-z0-9_-]+)(?:\s+#?|\.)(\w+?)(?:\.[\w-]+)?(?:\s*[x×]\s*(\d+))?$")
+
+def empty_basket():
+    # JSON-friendly so it can be saved with the session: cards is [[pack, number, copies], ...]
+    return {"cards": [], "coins": 0, "packs": {}}
+
+def parse_basket(text, catalog):
+    """Parse one side of an offer. Returns (basket, [problems])."""
+    cards = Counter()
+    basket = empty_basket()
+    problems = []
+    for item in (part.strip().lower() for part in text.split(",")):
+        if not item or item == "nothing":
+            continue
+        match = COINS_RE.match(item)
+        if match:
+            basket["coins"] += int(match.group(1))
+            continue
+        match = PACKS_RE.match(item)
+        if match and match.group(2) in catalog.packs:
+            pack = match.group(2)
+            basket["packs"][pack] = basket["packs"].get(pack, 0) + int(match.group(1) or 1)
+            continue
+        match = CARD_RE.match(item)
+        card = catalog.get(match.group(1), match.group(2).lstrip("0") or "0") if match else None
+        if card is None:
+            problems.append(f"don't know `{item}`")
+            continue
+        cards[card.id] += int(match.group(3) or 1)
+    basket["cards"] = [[pack, number, copies] for (pack, number), copies in cards.items() if copies > 0]
+    return basket, problems
+
+def basket_is_empty(basket):
+    return not basket["cards"] and not basket["coins"] and not any(basket["packs"].values())
+
+def format_basket(basket, catalog):
+    lines = []
+    for pack, number, copies in basket["cards"]:
+        card = catalog.get(pack, number)
+        name = card.name if card else "?"
+        lines.append(f"• {name} #{number} ({pack})" + (f" ×{copies}" if copies > 1 else ""))
+    if basket["coins"]:
+        lines.append(f"• 💰 {basket['coins']} coins")
+    for pack, count in basket["packs"].items():
+        lines.append(f"• {count} × `{pack}` pack" + ("s" if count > 1 else ""))
+    return "\n".join(lines) or "• nothing"
+
+def pack_count(packs, pack):
+    if isinstance(packs, dict):
+        return packs.get(pack, 0)
+    return sum(p.get("count", 0) for p in packs if p.get("pack") == pack)
+
+def adjust_packs(packs, pack, delta):
+    """Add (or with a negative delta, remove) unopened packs in either stored shape."""
+    if isinstance(packs, dict):
+        packs[pack] = packs.get(pack, 0) + delta
+        if packs[pack] <= 0:
+            del packs[pack]
+        return
+    for entry in packs:
+        if entry.get("pack") == pack:
+            entry["count"] = entry.get("count", 0) + delta
+            if entry["count"] <= 0:
+                packs.remove(entry)
+            return
+    if delta > 0:
+        packs.append({"pack": pack, "count": delta})
+
+def basket_problems(basket, collection, packs, balance):
+    """What the owner is missing to hand over the basket. Cards must be duplicates: the binder copy stays."""
+    problems = []
+    for pack, number, copies in basket["cards"]:
+        spare = collection.count(pack, number) - 1
+        if spare < copies:
+            problems.append(f"only {max(0, spare)} spare {pack} #{number}")
+    for pack, count in basket["packs"].items():
+        owned = pack_count(packs, pack)
+        if owned < count:
+            problems.append(f"only {owned} `{pack}` pack(s)")
+    if balance < basket["coins"]:
+        problems.append(f"only 💰 {balance} coins")
+    return problems
+
+def move_basket(basket, giver_collection, giver_packs, taker_collection, taker_packs):
+    for pack, number, copies in basket["cards"]:
+        giver_collection.remove(pack, number, copies)
+        taker_collection.add(pack, number, copies)
+    for pack, count in basket["packs"].items():
+        adjust_packs(giver_packs, pack, -count)
+        adjust_packs(taker_packs, pack, count)
 
 class Trade(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.sessions = bot.sessions
+        self.sessions.register("trade", TRADE_OFFER_TTL_SECONDS, on_expire=self.on_offer_expired)
+
+    async def cog_load(self):
+        # Offers restored from the last run's snapshot need their reactions routed again
+        for message_id, offer in self.sessions.items("trade"):
+            self.bot.reaction_router.register(int(message_id), self.on_offer_reaction,
+                                              emojis={ACCEPT, DECLINE}, users={offer["from"], offer["to"]})
+
+    def on_offer_expired(self, message_id, offer):
+        self.bot.reaction_router.unregister(int(message_id))
+
+    async def user_state(self, user_id):
+        return (
+            await load_collection_async(user_id),
+            await user_packs_async(user_id),
+            await self.bot.ledger.balance(user_id),
+        )
 
     @commands.command(name="trade")
-    async def trade(self, ctx, user: str, 
-                    my_card_name: str, my_card_number: str, my_card_pack: str,
-                    their_card_name: str, their_card_number: str, their_card_pack: str):
+    async def trade(self, ctx, user: str = None, *, terms: str = ""):
         """
-        Trade a card with another user.
-        Usage: !trade @user my_card_name my_card_number my_card_pack their_card_name their_card_number their_card_pack
-        Example: !trade @Bob Pikachu 58 base Bulbasaur 44 base
+        Offer a trade to another user: cards, coins and packs on either side.
+        Usage: !trade @user <what you give> for <what you want>
+        Example: !trade @Bob base 58 x2, 300 coins for jungle 12, 1 fossil pack
         """
-        # Try to resolve user as mention or username
-        member = None
-        if user.startswith("<@") and user.endswith(">"):
-            user_id = user.replace("<@", "").replace("!", "").replace(">", "")
-            member = ctx.guild.get_member(int(user_id))
-        if not member:
-            user_lower = user.lower()
-            for m in ctx.guild.members:
-                if (m.name.lower() == user_lower or
-                    m.display_name.lower() == user_lower or
-                    f"{m.name}#{m.discriminator}".lower() == user_lower):
-                    member = m
-                    break
+        if not user or " for " not in f" {terms} ":
+            return await ctx.send(USAGE)
+        # Mention, id, name, nickname or the start of one (see member_index.py)
+        member = await self.bot.member_index.resolve(ctx.guild, user)
         if not member:
-            await ctx.send(f"Could not find user `{user}` in this server.")
-            return
-
-        user1_id = str(ctx.author.id)
-        user2_id = str(member.id)
-
-        # Load user1's and user2's cards and duplicates
-        user1_cards = load_user_file(user1_id, "cards.json").get("cards", [])
-        user2_cards = load_user_file(user2_id, "cards.json").get("cards", [])
-        user1_dupes = load_user_file(user1_id, "duplicates.json").get("duplicates", [])
-        user2_dupes = load_user_file(user2_id, "duplicates.json").get("duplicates", [])
-
-        # Helper to find a card in a list
-        def find_card(card_list, name, number, pack):
-            for card in card_list:
-                if (card.get("name", "").lower() == name.lower() and
-                    str(card.get("number", "")) == str(number) and
-                    card.get("pack", "").lower() == pack.lower()):
-                    return card
-            return None
-
-        # Helper to remove a card from a list (by name, number, pack)
-        def remove_card(card_list, name, number, pack):
-            for i, card in enumerate(card_list):
-                if (card.get("name", "").lower() == name.lower() and
-                    str(card.get("number", "")) == str(number) and
-                    card.get("pack", "").lower() == pack.lower()):
-                    del card_list[i]
-                    return
-
-        # Find the cards in dupes (must have count > 0)
-        my_card = find_card(user1_dupes, my_card_name, my_card_number, my_card_pack)
-        their_card = find_card(user2_dupes, their_card_name, their_card_number, their_card_pack)
-
-        if not my_card or my_card.get("count", 0) < 1:
-            await ctx.send(f"{ctx.author.mention}, you do not have that card as a duplicate.")
+            await ctx.send(f"Could not find exactly one user matching `{user}` in this server.")
             return
-        if not their_card or their_card.get("count", 0) < 1:
-            await ctx.send(f"{member.mention} does not have that card as a duplicate.")
-            return
-
-        # Ask for confirmation from both users
-        await ctx.send(
-            f"{ctx.author.mention} wants to trade their duplicate **{my_card_name} #{my_card_number} ({my_card_pack})** "
-            f"for {member.mention}'s duplicate **{their_card_name} #{their_card_number} ({their_card_pack})**.\n"
-            f"Both users, please confirm by reacting with ✅."
-        )
-        confirm_msg = await ctx.send("Waiting for both users to confirm...")
+        if member.id == ctx.author.id or member.bot:
+            return await ctx.send("You can't trade with yourself or a bot.")
 
-        await confirm_msg.add_reaction("✅")
+        catalog = get_catalog()
+        give_text, _, get_text = f" {terms} ".partition(" for ")
+        give, problems = parse_basket(give_text, catalog)
+        get, more_problems = parse_basket(get_text, catalog)
+        problems += more_problems
+        if problems:
+            return await ctx.send(f"{ctx.author.mention}, I {'; '.join(problems)}.\n{USAGE}")
+        if basket_is_empty(give) and basket_is_empty(get):
+            return await ctx.send(USAGE)
 
-        def check(reaction, reactor):
-            return (
-                reaction.message.id == confirm_msg.id and
-                str(reaction.emoji) == "✅" and
-                reactor.id in [ctx.author.id, member.id]
-            )
+        # Check both sides now so an impossible offer is never posted; accepting checks again under lock
+        mine = basket_problems(give, *await self.user_state(str(ctx.author.id)))
+        theirs = basket_problems(get, *await self.user_state(str(member.id)))
+        if mine:
+            return await ctx.send(f"{ctx.author.mention}, you have {', '.join(mine)}.")
+        if theirs:
+            return await ctx.send(f"{ctx.author.mention}, {member.display_name} has {', '.join(theirs)}.")
 
-        confirmed = set()
-        while len(confirmed) < 2:
-            try:
-                reaction, reactor = await ctx.bot.wait_for("reaction_add", timeout=60.0, check=check)
-                confirmed.add(reactor.id)
-            except asyncio.TimeoutError:
-                await ctx.send("Trade cancelled due to timeout.")
-                return
-
-        # Remove one from each user's dupes
-        my_card["count"] -= 1
-        their_card["count"] -= 1
-
-        # Remove from dupes if count is now 0
-        if my_card["count"] <= 0:
-            remove_card(user1_dupes, my_card_name, my_card_number, my_card_pack)
-        if their_card["count"] <= 0:
-            remove_card(user2_dupes, their_card_name, their_card_number, their_card_pack)
-
-        # Helper: check if user has card in main binder
-        def has_in_main_binder(user_cards, card):
-            for c in user_cards:
-                if (c.get("name", "").lower() == card["name"].lower() and
-                    str(c.get("number", "")) == str(card["number"]) and
-                    c.get("pack", "").lower() == card["pack"].lower()):
-                    return True
-            return False
-
-        # Helper: add card to dupes (increment if exists, else add)
-        def add_to_dupes(dupes, card):
-            for c in dupes:
-                if (c.get("name", "").lower() == card["name"].lower() and
-                    str(c.get("number", "")) == str(card["number"]) and
-                    c.get("pack", "").lower() == card["pack"].lower()):
-                    c["count"] += 1
-                    return
-            new_card = dict(card)
-            new_card["count"] = 1
-            dupes.append(new_card)
-
-        # Helper: add card to main binder if not present
-        def add_to_main_binder(user_cards, card):
-            user_cards.append({
-                "name": card["name"],
-                "number": card["number"],
-                "pack": card["pack"]
-            })
-
-        # Give each user the other's card
-        # For user1 (initiator), receiving their_card
-        if has_in_main_binder(user1_cards, their_card):
-            add_to_dupes(user1_dupes, their_card)
-        else:
-            add_to_main_binder(user1_cards, their_card)
+        message = await ctx.send(
+            f"{member.mention}, {ctx.author.mention} offers you a trade "
+            f"(expires in {TRADE_OFFER_TTL_SECONDS // 60} minutes):\n"
+            f"**{ctx.author.display_name} gives:**\n{format_basket(give, catalog)}\n"
+            f"**{member.display_name} gives:**\n{format_basket(get, catalog)}\n"
+            f"{member.display_name}, react {ACCEPT} to accept. Either of you can react {DECLINE} to cancel."
+        )
+        self.sessions.set("trade", str(message.id), {
+            "from": ctx.author.id,
+            "to": member.id,
+            "give": give,
+            "get": get,
+        })
+        self.bot.reaction_router.register(message.id, self.on_offer_reaction,
+                                          emojis={ACCEPT, DECLINE}, users={ctx.author.id, member.id})
+        await message.add_reaction(ACCEPT)
+        await message.add_reaction(DECLINE)
 
-        # For user2 (target), receiving my_card
-        if has_in_main_binder(user2_cards, my_card):
-            add_to_dupes(user2_dupes, my_card)
+    async def on_offer_reaction(self, payload):
+        emoji = str(payload.emoji)
+        offer = self.sessions.get("trade", str(payload.message_id))
+        if not offer or (emoji == ACCEPT and payload.user_id != offer["to"]):
+            return
+        # Taking the offer out first means a second click can't run the trade twice
+        self.sessions.pop("trade", str(payload.message_id))
+        self.bot.reaction_router.unregister(payload.message_id)
+        channel = self.bot.get_channel(payload.channel_id)
+        if emoji == DECLINE:
+            if channel:
+                await channel.send(f"<@{payload.user_id}> cancelled the trade between <@{offer['from']}> and <@{offer['to']}>.")
+            return
+        problem = await self.commit_offer(offer)
+        if channel is None:
+            return
+        if problem:
+            await channel.send(f"Trade between <@{offer['from']}> and <@{offer['to']}> cancelled: {problem}.")
         else:
-            add_to_main_binder(user2_cards, my_card)
-
-        # Save updated files
-        save_user_file(user1_id, "cards.json", {"cards": user1_cards})
-        save_user_file(user2_id, "cards.json", {"cards": user2_cards})
-        save_user_file(user1_id, "duplicates.json", {"duplicates": user1_dupes})
-        save_user_file(user2_id, "duplicates.json", {"duplicates": user2_dupes})
+            await channel.send(f"Trade complete! <@{offer['from']}> and <@{offer['to']}> have swapped everything in the offer.")
 
-        await ctx.send(
-            f"Trade complete! {ctx.author.mention} and {member.mention} have swapped their duplicate cards."
-        )
+    async def commit_offer(self, offer):
+        """Run the whole exchange at once. Returns why it couldn't happen, or None."""
+        from_id, to_id = str(offer["from"]), str(offer["to"])
+        give, get = offer["give"], offer["get"]
+        ledger = self.bot.ledger
+        net = give["coins"] - get["coins"]
+        payer, payee = (from_id, to_id) if net >= 0 else (to_id, from_id)
+        async with transaction(from_id, to_id) as tx:
+            # What both users own now, not when the offer was made
+            from_collection, to_collection = await tx.collection(from_id), await tx.collection(to_id)
+            from_packs, to_packs = await tx.packs(from_id), await tx.packs(to_id)
+            mine = basket_problems(give, from_collection, from_packs, await ledger.balance(from_id))
+            theirs = basket_problems(get, to_collection, to_packs, await ledger.balance(to_id))
+            if mine or theirs:
+                return f"<@{offer['from'] if mine else offer['to']}> now has {', '.join(mine or theirs)}"
+            move_basket(give, from_collection, from_packs, to_collection, to_packs)
+            move_basket(get, to_collection, to_packs, from_collection, from_packs)
+            tx.save_collection(from_id, from_collection)
+            tx.save_collection(to_id, to_collection)
+            if give["packs"] or get["packs"]:
+                tx.save_packs(from_id, from_packs)
+                tx.save_packs(to_id, to_packs)
+            # The commit point: one ledger record holds the net coins and every changed file.
+            # It re-checks the payer's balance, so coins spent elsewhere meanwhile cancel it cleanly
+            seq = await ledger.trade(payer, payee, abs(net), tx.changes())
+            if seq is None:
+                tx.rollback()
+                return "not enough coins anymore"
+            written = False
+            try:
+                await tx.commit_durable()
+                written = True
+            except Exception as e:
+                print(f"[DEBUG] Writing trade #{seq} to storage failed, the flush will retry: {e!r}")
+            finally:
+                if not written:
+                    # Already committed in the ledger: keep the files in the cache for the next flush
+                    tx.commit()
+                    ledger.abandon(seq)
+            if written:
+                await ledger.settle(seq)
+        return None
 
 async def setup(bot):
-    await bot.add_cog(Trade(bot))
\ No newline at end of file
+    await bot.add_cog(Trade(bot))
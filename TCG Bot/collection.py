@@ -0,0 +1,89 @@
+# A user's card collection, stored as references into the card catalog:
+# {pack: {number: owned_count}}. Card details (name, rarity, image) are looked
+# up in catalog.CardCatalog when needed, so user files never carry them.
+# The "binder" (first copy of every card) and "duplicates" (the extra copies)
+# are derived views.
+
+def card_key(pack, number):
+    return ((pack or "").lower(), str(number))
+
+class Collection:
+    def __init__(self, data=None):
+        # Wraps the stored dict directly, so updates are O(1) and saving is just marking it dirty
+        self.data = data if data is not None else {}
+
+    @classmethod
+    def from_legacy_files(cls, cards_data, dupes_data, catalog=None):
+        """
+        Convert the old cards.json / duplicates.json pair (full card dicts,
+        binder copy + duplicate count) into a reference collection.
+        """
+        collection = cls()
+        legacy = list((cards_data or {}).get("cards", [])) + list((dupes_data or {}).get("duplicates", []))
+        in_dupes = len((cards_data or {}).get("cards", []))
+        for idx, card in enumerate(legacy):
+            pack = card.get("pack")
+            number = str(card.get("number", ""))
+            if not pack and catalog is not None:
+                # Very old entries were saved without their pack: find it by name + number
+                for candidate_pack in catalog.pack_names:
+                    match = catalog.get(candidate_pack, number)
+                    if match and match.name.lower() == card.get("name", "").lower():
+                        pack = candidate_pack
+                        break
+            if not pack:
+                print(f"[collection] dropping legacy card without a pack: {card.get('name')} #{number}")
+                continue
+            amount = card.get("count", 1) if idx >= in_dupes else 1
+            collection.add(pack, number, amount)
+        return collection
+
+    def count(self, pack, number):
+        pack, number = card_key(pack, number)
+        return self.data.get(pack, {}).get(number, 0)
+
+    def add(self, pack, number, amount=1):
+        """Add copies of a card. Returns True if the user didn't own it before."""
+        pack, number = card_key(pack, number)
+        cards = self.data.setdefault(pack, {})
+        owned = cards.get(number, 0)
+        cards[number] = owned + amount
+        return owned == 0
+
+    def remove(self, pack, number, amount=1):
+        """Remove copies of a card. Returns False (and changes nothing) if there aren't enough."""
+        pack, number = card_key(pack, number)
+        cards = self.data.get(pack, {})
+        owned = cards.get(number, 0)
+        if owned < amount:
+            return False
+        if owned == amount:
+            del cards[number]
+            if not cards:
+                del self.data[pack]
+        else:
+            cards[number] = owned - amount
+        return True
+
+    def counts(self, pack):
+        """{number: owned} for every card the user has from one pack."""
+        return self.data.get((pack or "").lower(), {})
+
+    def items(self):
+        """Yield ((pack, number), owned) for every owned card."""
+        for pack, cards in self.data.items():
+            for number, owned in cards.items():
+                yield (pack, number), owned
+
+    def binder(self, catalog):
+        """The catalog cards the user owns at least one of."""
+        return [card for card in (catalog.get(*key) for key, _ in self.items()) if card]
+
+    def duplicates(self, catalog):
+        """[(card, extra copies)] for every card owned more than once."""
+        dupes = []
+        for key, owned in self.items():
+            card = catalog.get(*key)
+            if card and owned > 1:
+                dupes.append((card, owned - 1))
+        return dupes
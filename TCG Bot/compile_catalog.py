@@ -0,0 +1,143 @@
+import json
+import os
+import sys
+from catalog import (
+    Card, CardCatalog, CARDPACKS_FOLDER, CATALOG_ARTIFACT, ARTIFACT_VERSION, CARD_FIELDS,
+    LINKS_FILE, LINKS_FOLDER, RARITIES, PACK_SLOTS, pack_stats, source_hashes,
+)
+
+# Validates data/cardpacks/*.json against the imgbb_image_links_<pack>.txt files and
+# compiles them into data/catalog.json, which the bot loads in one read at startup:
+#   version   ARTIFACT_VERSION; the bot ignores an artifact with any other
+#   sources   sha256 of every pack JSON and links file it was built from; the bot
+#             ignores the artifact once any of them differs
+#   strings   every distinct string once (names, numbers, rarities, types, URLs)
+#   columns   per pack, one list of string ids per card field, in binder order
+#   buckets   per pack and rarity, a list of card positions (what open_packs draws from)
+#   stats     per pack card/rarity/pokemon counts
+# Plain JSON, so loading it never runs code.
+# Any problem is reported and the script exits non-zero before writing anything, so
+# a broken pack stops a deploy instead of surfacing as a failed !op later.
+#
+# Usage: python compile_catalog.py
+
+def read_links(path):
+    """{card number: link} for "<number> <link>" lines, or [link, ...] for the older one-per-line files."""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.split() for line in f if line.strip()]
+    if lines and all(len(parts) == 2 for parts in lines):
+        return {number: link for number, link in lines}
+    return [parts[0] for parts in lines]
+
+def validate_pack(pack, raw_cards, links, errors, warnings):
+    cards = []
+    numbers = set()
+    for idx, raw in enumerate(raw_cards):
+        where = f"{pack} card {idx + 1}"
+        if not isinstance(raw, dict):
+            errors.append(f"{where}: not an object")
+            continue
+        for field in ("number", "name", "rarity"):
+            if not raw.get(field):
+                errors.append(f"{where}: missing {field}")
+        card = Card.from_dict(pack, raw)
+        if card.rarity not in RARITIES:
+            errors.append(f"{where} ({card.name}): unknown rarity {raw.get('rarity')!r}")
+        if card.number in numbers:
+            errors.append(f"{where} ({card.name}): duplicate number #{card.number}")
+        numbers.add(card.number)
+        if not card.image_url:
+            warnings.append(f"{where} ({card.name}): no image_url")
+        cards.append(card)
+    if not cards:
+        errors.append(f"{pack}: no cards")
+    stats = pack_stats(cards)
+    for rarity, needed in PACK_SLOTS.items():
+        if stats["rarities"].get(rarity, 0) < needed:
+            errors.append(f"{pack}: {stats['rarities'].get(rarity, 0)} {rarity} card(s), a booster needs {needed}")
+    if links is None:
+        warnings.append(f"{pack}: no {LINKS_FILE.format(pack=pack)}")
+    elif isinstance(links, dict):
+        unknown = sorted(set(links) - numbers)
+        if unknown:
+            errors.append(f"{pack}: links for unknown card number(s) {', '.join(unknown)}")
+        stale = [card for card in cards if card.number in links and links[card.number] != card.image_url]
+        if stale:
+            warnings.append(f"{pack}: {len(stale)} image_url(s) differ from the links file, run 'Binder Img update.py'")
+    elif len(links) != len(cards):
+        errors.append(f"{pack}: {len(cards)} cards but {len(links)} links")
+    return cards
+
+def compile_catalog(folder=CARDPACKS_FOLDER, links_dir=LINKS_FOLDER):
+    """Returns (payload, errors, warnings); payload is None when there are errors."""
+    errors, warnings = [], []
+    packs = {}
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith(".json"):
+            continue
+        pack = filename[:-5].lower()
+        try:
+            with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            errors.append(f"{filename}: {e}")
+            continue
+        raw_cards = data.get("cards", []) if isinstance(data, dict) else data
+        links_path = os.path.join(links_dir, LINKS_FILE.format(pack=pack))
+        links = read_links(links_path) if os.path.exists(links_path) else None
+        packs[pack] = validate_pack(pack, raw_cards, links, errors, warnings)
+    if not packs:
+        errors.append(f"no pack files in {folder}")
+    if errors:
+        return None, errors, warnings
+
+    strings = [None]  # id 0 is "no value" (cards without a type or image)
+    ids = {None: 0}
+    def intern(value):
+        if value not in ids:
+            ids[value] = len(strings)
+            strings.append(value)
+        return ids[value]
+
+    compiled = {}
+    for pack, cards in packs.items():
+        buckets = {rarity: [] for rarity in RARITIES}
+        for pos, card in enumerate(cards):
+            buckets[card.rarity].append(pos)
+        compiled[pack] = {
+            "columns": {field: [intern(getattr(card, field)) for card in cards] for field in CARD_FIELDS},
+            "buckets": buckets,
+            "stats": pack_stats(cards),
+        }
+    payload = {
+        "version": ARTIFACT_VERSION,
+        "sources": source_hashes(folder, links_dir),
+        "strings": strings,
+        "packs": compiled,
+    }
+    return payload, errors, warnings
+
+def write_artifact(payload, path=CATALOG_ARTIFACT):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def main():
+    payload, errors, warnings = compile_catalog()
+    for warning in warnings:
+        print(f"⚠️ {warning}")
+    if errors:
+        for error in errors:
+            print(f"❌ {error}")
+        print(f"Catalog not compiled: {len(errors)} error(s).")
+        sys.exit(1)
+    write_artifact(payload)
+    catalog = CardCatalog.from_artifact()
+    for pack, stats in catalog.stats.items():
+        rarities = ", ".join(f"{count} {rarity}" for rarity, count in stats["rarities"].items())
+        print(f"✅ {pack}: {stats['cards']} cards ({rarities}; {stats['pokemon']} pokemon)")
+    print(f"✅ Wrote {CATALOG_ARTIFACT} ({os.path.getsize(CATALOG_ARTIFACT) // 1024} KB, {len(payload['strings'])} strings)")
+
+if __name__ == "__main__":
+    main()
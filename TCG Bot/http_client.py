@@ -0,0 +1,96 @@
+import asyncio
+import os
+import random
+import aiohttp
+
+# One HTTP client for the whole bot. bot.py creates it at startup and attaches it
+# as bot.http_client (bot.http is discord.py's own). It keeps connections to the
+# image hosts alive between renders, caps how many requests we make at once,
+# retries transient failures with jittered backoff, and coalesces concurrent
+# requests for the same URL into a single download.
+
+HTTP_CONCURRENCY = int(os.getenv("HTTP_CONCURRENCY", "16"))  # requests in flight, all hosts
+HTTP_PER_HOST = int(os.getenv("HTTP_PER_HOST", "6"))  # open connections per host
+HTTP_RETRIES = 3
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=20, connect=5, sock_read=10)
+USER_AGENT = "Mozilla/5.0"
+
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+class HttpClient:
+    def __init__(self, concurrency=HTTP_CONCURRENCY, per_host=HTTP_PER_HOST, retries=HTTP_RETRIES, timeout=HTTP_TIMEOUT):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.retries = retries
+        self.timeout = timeout
+        self._session = None
+        self._slots = None
+        self._inflight = {}  # url -> Task downloading it
+        self.requests = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.failures = 0
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout, headers={"User-Agent": USER_AGENT}
+            )
+            self._slots = asyncio.Semaphore(self.concurrency)
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch(self, url):
+        """Download url and return the body, or None if it couldn't be fetched. Concurrent calls for one URL share a download."""
+        task = self._inflight.get(url)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            await self.start()
+            task = asyncio.ensure_future(self._download(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # shield: one caller timing out or being cancelled must not cancel the others' download
+        status, body, _ = await asyncio.shield(task)
+        return body
+
+    async def revalidate(self, url, etag=None):
+        """Conditional GET: (status, body, etag). status 304 means the copy tagged `etag` is still current, None means it failed."""
+        await self.start()
+        return await self._download(url, {"If-None-Match": etag} if etag else None)
+
+    async def _download(self, url, headers=None):
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                await asyncio.sleep(min(8, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5))
+            try:
+                async with self._slots:
+                    self.requests += 1
+                    async with self._session.get(url, headers=headers) as resp:
+                        if resp.status == 200:
+                            return resp.status, await resp.read(), resp.headers.get("ETag")
+                        if resp.status == 304:
+                            return resp.status, None, resp.headers.get("ETag")
+                        if resp.status not in RETRY_STATUSES:
+                            print(f"[DEBUG] GET {url} -> HTTP {resp.status}")
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"[DEBUG] GET {url} failed (attempt {attempt + 1}): {e!r}")
+        self.failures += 1
+        return None, None, None
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+            "failures": self.failures,
+            "in_flight": len(self._inflight),
+        }
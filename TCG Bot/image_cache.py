@@ -0,0 +1,162 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+# Card images in two bounded tiers.
+# DiskImageCache keeps the bytes exactly as the image host served them (JPEG/PNG,
+# not re-encoded), named by md5 of the URL, and evicts least recently used files
+# past its byte budget. MemoryImageCache lives in each render worker and keeps
+# decoded, binder-sized RGBA tiles, so hot cards are never decoded twice.
+
+CACHE_DIR = "image_cache"
+IMAGE_DISK_BYTES = int(os.getenv("IMAGE_DISK_BYTES", str(256 * 1024 * 1024)))
+IMAGE_MEMORY_BYTES = int(os.getenv("IMAGE_MEMORY_BYTES", str(64 * 1024 * 1024)))  # per render worker
+TILE_SIZE = (180, 240)
+
+def url_key(url):
+    return hashlib.md5(url.encode()).hexdigest()
+
+class DiskImageCache:
+    # "<md5>.img" holds original bytes; "<md5>.png" files written by older versions are still served
+    SUFFIXES = (".img", ".png")
+
+    def __init__(self, folder=CACHE_DIR, max_bytes=IMAGE_DISK_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._files = None  # md5 -> (filename, size), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _index(self):
+        if self._files is None:
+            # Scanned without the lock; the binder builds it at startup with warm() on a thread
+            os.makedirs(self.folder, exist_ok=True)
+            entries = []
+            for entry in os.scandir(self.folder):
+                key, ext = os.path.splitext(entry.name)
+                if ext in self.SUFFIXES and entry.is_file():
+                    st = entry.stat()
+                    entries.append((st.st_mtime, key, entry.name, st.st_size))
+            with self._lock:
+                if self._files is None:
+                    self._files = OrderedDict((key, (name, size)) for _, key, name, size in sorted(entries))
+                    self._bytes = sum(size for _, size in self._files.values())
+        return self._files
+
+    def warm(self):
+        """Build the index now (a directory scan) instead of on the first get(). Returns the number of files."""
+        return len(self._index())
+
+    def get(self, url):
+        """Local path of the cached image for url, or None. Touches the disk: keep it off the event loop."""
+        key = url_key(url)
+        files = self._index()
+        with self._lock:
+            entry = files.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+        path = os.path.join(self.folder, entry[0])
+        try:
+            os.utime(path)
+        except OSError:
+            # Removed behind our back
+            with self._lock:
+                if files.get(key) == entry:
+                    self._bytes -= files.pop(key)[1]
+                self.misses += 1
+            return None
+        with self._lock:
+            if key in files:
+                files.move_to_end(key)
+            self.hits += 1
+        return path
+
+    def put(self, url, data):
+        """Store downloaded bytes for url and return the path. Raises if data isn't an image."""
+        Image.open(io.BytesIO(data)).verify()
+        key = url_key(url)
+        name = f"{key}.img"
+        path = os.path.join(self.folder, name)
+        files = self._index()
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        removed = []
+        with self._lock:
+            old = files.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+                if old[0] != name:
+                    removed.append(old[0])
+            files[key] = (name, len(data))
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes and len(files) > 1:
+                _, (old_name, size) = files.popitem(last=False)
+                self._bytes -= size
+                removed.append(old_name)
+        for old_name in removed:
+            self._remove(old_name)
+        return path
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.folder, name))
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "files": len(self._files or ()),
+                "bytes": self._bytes,
+            }
+
+class MemoryImageCache:
+    """Decoded RGBA tiles, LRU within a byte budget. One per process, not shared between threads."""
+    def __init__(self, max_bytes=IMAGE_MEMORY_BYTES, size=TILE_SIZE):
+        self.max_bytes = max_bytes
+        self.size = size
+        self._images = OrderedDict()  # (path, mtime) -> Image
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """The image at path as a tile-sized RGBA image. Callers must not draw on it."""
+        key = (path, os.path.getmtime(path))
+        img = self._images.get(key)
+        if img is not None:
+            self._images.move_to_end(key)
+            self.hits += 1
+            return img
+        self.misses += 1
+        with Image.open(path) as source:
+            source.draft("RGB", self.size)  # JPEGs decode straight at a reduced scale
+            img = source.convert("RGBA").resize(self.size, Image.LANCZOS)
+        self._images[key] = img
+        self._bytes += self.size[0] * self.size[1] * 4
+        while self._bytes > self.max_bytes and len(self._images) > 1:
+            self._images.popitem(last=False)
+            self._bytes -= self.size[0] * self.size[1] * 4
+        return img
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "images": len(self._images),
+            "bytes": self._bytes,
+        }
@@ -0,0 +1,115 @@
+import os
+import re
+from image_cache import DiskImageCache
+from utils import run_blocking
+
+# Where a card's picture comes from, cheapest first:
+#   1. the art bundled with the repo (<pack>_images/), the same files CardUploader.py uploaded
+#   2. the on-disk download cache
+#   3. the network, through the shared HTTP client, stored in the cache for next time
+#
+# Bundled files are named like "fo.065.fighting_energy.jpg". They are matched to
+# catalog cards by name first and by number second, because neither is reliable on
+# its own: the energies are numbered by position in the folder (65, not 97) and a
+# few catalog names are misspelled ("Sandlash"). Sorted-filename order, which the
+# links files were once built from, puts the wrong art on most energies.
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+
+def pack_image_folder(pack):
+    return f"{pack}_images"
+
+def compact_name(text):
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+def parse_image_filename(filename):
+    """("fo.065.fighting_energy.jpg") -> ("65", "fightingenergy"); number is None if there isn't one."""
+    parts = os.path.splitext(filename)[0].split(".", 2)
+    number = str(int(parts[1])) if len(parts) == 3 and parts[1].isdigit() else None
+    return number, compact_name(parts[-1])
+
+def match_image_files(cards, filenames):
+    """Pair image files with cards. Returns ({card number: filename}, [filenames that matched nothing])."""
+    matched = {}
+    left = []
+    parsed = [(filename, *parse_image_filename(filename)) for filename in sorted(filenames)]
+    rules = (
+        lambda card, name, number: compact_name(card.name) == name,
+        lambda card, name, number: compact_name(card.name).endswith(name) or name.endswith(compact_name(card.name)),
+        lambda card, name, number: card.number == number,
+    )
+    for rule in rules:
+        left = []
+        for filename, number, name in parsed:
+            candidates = [card for card in cards if card.number not in matched and rule(card, name, number)]
+            if len(candidates) == 1:
+                matched[candidates[0].number] = filename
+            else:
+                left.append((filename, number, name))
+        parsed = left
+    return matched, [filename for filename, _, _ in left]
+
+def local_image_files(catalog, pack):
+    """{card number: path} for a pack's bundled art."""
+    folder = pack_image_folder(pack)
+    if not os.path.isdir(folder):
+        return {}
+    files = [f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS)]
+    matched, unmatched = match_image_files(catalog.cards(pack), files)
+    for filename in unmatched:
+        print(f"⚠️ {folder}/{filename} doesn't match any {pack} card")
+    return {number: os.path.join(folder, filename) for number, filename in matched.items()}
+
+class ImageResolver:
+    def __init__(self, catalog, cache=None, http_client=None):
+        self.cache = cache or DiskImageCache()
+        self.http_client = http_client
+        self.local = {}
+        for pack in catalog.pack_names:
+            for number, path in local_image_files(catalog, pack).items():
+                self.local[(pack, number)] = path
+        self.local_hits = 0
+        self.cache_hits = 0
+        self.downloads = 0
+
+    def local_path(self, card):
+        """A file for the card without touching the network, or None."""
+        path = self.local.get(card.id)
+        if path:
+            self.local_hits += 1
+            return path
+        url = card.image_url
+        if url and (url.startswith("http://") or url.startswith("https://")):
+            path = self.cache.get(url)
+            if path:
+                self.cache_hits += 1
+            return path
+        if url and os.path.isfile(url):
+            return url
+        return None
+
+    async def resolve(self, card):
+        """A local file for the card, downloading it only as a last resort. None if that fails too."""
+        # Bundled art is a dict lookup; anything else checks the disk, so it goes to a thread
+        path = self.local.get(card.id)
+        if path:
+            self.local_hits += 1
+            return path
+        path = await run_blocking(self.local_path, card)
+        url = card.image_url
+        if path or self.http_client is None or not (url and url.startswith(("http://", "https://"))):
+            return path
+        img_bytes = await self.http_client.fetch(url)
+        if img_bytes is None:
+            print(f"[DEBUG] Could not fetch image for {card.name}")
+            return None
+        try:
+            path = await run_blocking(self.cache.put, url, img_bytes)
+        except Exception as e:
+            print(f"[DEBUG] Exception caching image for {card.name}: {e}")
+            return None
+        self.downloads += 1
+        return path
+
+    def stats(self):
+        return {"local": self.local_hits, "cache": self.cache_hits, "downloads": self.downloads}
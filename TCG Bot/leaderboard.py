@@ -0,0 +1,201 @@
+import random
+import threading
+from catalog import get_catalog
+from collection import Collection
+from utils import get_storage, user_cache
+
+# Rankings for !top: coins, and per pack the number of different cards owned.
+# bot.py attaches one Leaderboards as bot.leaderboards, fills it from storage once
+# at startup (rebuild) and then keeps it current from the places values change:
+# every coin ledger record, and every collection.json handed to the user cache
+# (pack openings, wonderpicks, trades, adventure catches, legacy migrations).
+# A query never reads user files.
+#
+# Each board keeps its (-score, user_id) keys in a RankedList, an indexable skip
+# list: moving a user, and finding their rank, are O(log n) however many users are
+# ranked, and top N walks the first N keys. Users with a score of 0 aren't ranked.
+
+RANKED_LIST_LEVELS = 24  # plenty for 2**24 ranked users
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        # width[level]: how many keys next[level] skips ahead, counting itself
+        self.width = [1] * levels
+
+class RankedList:
+    """Sorted, distinct keys with O(log n) add, remove and index."""
+
+    def __init__(self):
+        self._head = _Node(None, RANKED_LIST_LEVELS)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def _chain(self, key):
+        """The last node before key on every level, and its index (0 = head)."""
+        chain = [None] * RANKED_LIST_LEVELS
+        indexes = [0] * RANKED_LIST_LEVELS
+        node, index = self._head, 0
+        for level in reversed(range(RANKED_LIST_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                index += node.width[level]
+                node = node.next[level]
+            chain[level], indexes[level] = node, index
+        return chain, indexes
+
+    def add(self, key):
+        chain, indexes = self._chain(key)
+        levels = 1
+        while levels < RANKED_LIST_LEVELS and random.random() < 0.5:
+            levels += 1
+        node = _Node(key, levels)
+        for level in range(levels):
+            before = chain[level]
+            skipped = indexes[0] - indexes[level]  # between before and the new node
+            node.next[level] = before.next[level]
+            node.width[level] = before.width[level] - skipped
+            before.next[level] = node
+            before.width[level] = skipped + 1
+        for level in range(levels, RANKED_LIST_LEVELS):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        chain, _ = self._chain(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for level in range(len(node.next)):
+            before = chain[level]
+            before.width[level] += node.width[level] - 1
+            before.next[level] = node.next[level]
+        for level in range(len(node.next), RANKED_LIST_LEVELS):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def index(self, key):
+        """How many keys sort before key (bisect_left)."""
+        _, indexes = self._chain(key)
+        return indexes[0]
+
+    def first(self, count):
+        keys = []
+        node = self._head.next[0]
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+class Leaderboard:
+    def __init__(self, name):
+        self.name = name
+        self.scores = {}  # user_id -> score
+        self._ranked = RankedList()  # (-score, user_id): best first
+
+    def __len__(self):
+        return len(self._ranked)
+
+    def update(self, user_id, score):
+        old = self.scores.get(user_id, 0)
+        if old == score:
+            return
+        if old:
+            self._ranked.remove((-old, user_id))
+        if score:
+            self.scores[user_id] = score
+            self._ranked.add((-score, user_id))
+        else:
+            self.scores.pop(user_id, None)
+
+    def load(self, scores):
+        """Replace the whole board at once ({user_id: score})."""
+        self.scores = {user_id: score for user_id, score in scores.items() if score}
+        self._ranked = RankedList()
+        for user_id, score in self.scores.items():
+            self._ranked.add((-score, user_id))
+
+    def top(self, count=10):
+        """[(user_id, score)], best first."""
+        return [(user_id, -neg_score) for neg_score, user_id in self._ranked.first(count)]
+
+    def rank(self, user_id):
+        """(1-based rank, score), or (None, 0) if the user isn't on the board."""
+        score = self.scores.get(user_id)
+        if not score:
+            return None, 0
+        return self._ranked.index((-score, user_id)) + 1, score
+
+def collection_scores(data):
+    """{pack: different cards owned} for a stored collection."""
+    return {pack: sum(1 for count in cards.values() if count > 0) for pack, cards in (data or {}).items()}
+
+class Leaderboards:
+    def __init__(self):
+        self.coins = Leaderboard("coins")
+        self.packs = {}  # pack -> Leaderboard
+        # rebuild() runs on a worker thread
+        self._lock = threading.Lock()
+
+    def pack(self, pack):
+        board = self.packs.get(pack)
+        if board is None:
+            board = self.packs[pack] = Leaderboard(pack)
+        return board
+
+    def rebuild(self, storage=None):
+        """Rank every stored user. Reads all balances and collections once; returns how many users were seen."""
+        storage = storage or get_storage()
+        coins, packs = {}, {}
+        user_ids = storage.user_ids()
+        for user_id in user_ids:
+            balance = storage.load(user_id, "balances.json")
+            if balance:
+                coins[user_id] = balance.get("balance", 0)
+            data = storage.load(user_id, "collection.json")
+            if data is None:
+                cards_data = storage.load(user_id, "cards.json")
+                dupes_data = storage.load(user_id, "duplicates.json")
+                if cards_data or dupes_data:
+                    data = Collection.from_legacy_files(cards_data, dupes_data, get_catalog()).data
+            for pack, score in collection_scores(data).items():
+                packs.setdefault(pack, {})[user_id] = score
+        with self._lock:
+            self.coins.load(coins)
+            for pack, scores in packs.items():
+                self.pack(pack).load(scores)
+        return len(user_ids)
+
+    def attach(self, ledger):
+        """Follow coin changes in the ledger and collection changes in the user cache from now on."""
+        ledger.watchers.append(self.update_coins)
+        user_cache.watch("collection.json", self.update_collection)
+
+    def standings(self, board, user_id, count=10):
+        """(top [(user_id, score)], (rank, score) of user_id) for "coins" or a pack. None if there's no such board."""
+        with self._lock:
+            board = self.coins if board == "coins" else self.packs.get(board)
+            if board is None:
+                return None
+            return board.top(count), board.rank(str(user_id))
+
+    def update_coins(self, user_id, balance):
+        with self._lock:
+            self.coins.update(str(user_id), balance)
+
+    def update_collection(self, user_id, data):
+        user_id = str(user_id)
+        scores = collection_scores(data)
+        with self._lock:
+            for pack in set(scores) | set(self.packs):
+                self.pack(pack).update(user_id, scores.get(pack, 0))
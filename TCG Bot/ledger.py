@@ -0,0 +1,358 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from functools import partial
+from datetime import datetime, timezone
+from utils import load_user_file_async, save_user_file, flush_user_files_async, run_blocking, write_user_files
+
+# Coin balances. bot.py attaches one ledger as bot.ledger; the Currency cog (and
+# through it the shop) goes through it instead of reading and rewriting
+# balances.json on every operation.
+#
+# Accounts ({"balance", "last_daily"}) live in memory, loaded from storage the
+# first time a user is seen. Every change is one record appended to
+# data/coins.ledger (a JSON line), written out in batches: a writer task waits
+# LEDGER_COMMIT_SECONDS after the first pending record and then writes and
+# fsyncs everything queued by then in one go (group commit). A record carries
+# the *resulting* account of every user it touched, so a transfer debits and
+# credits in a single record and replaying the log twice gives the same result.
+# Every mutation returns only once the batch holding its record is on disk, so
+# whatever the caller then tells the user survives a crash.
+#
+# Compaction writes the accounts changed since the last one back to storage
+# (balances.json) and drops the records that covers from the log. It runs when
+# the log passes LEDGER_COMPACT_BYTES, at startup after replaying, and on shutdown.
+# Between compactions the log is the audit trail: every coin movement with its reason.
+#
+# A trade also carries the user files it changes ("files": [[user_id, filename, data]]),
+# so its coins and cards are committed by the same fsync. The files are then written
+# to storage and a "settled" record follows; a trade the log has but never settled
+# (the bot died in between) has its files written again when the log is replayed.
+# Compaction never drops an unsettled trade.
+
+LEDGER_PATH = os.path.join("data", "coins.ledger")
+LEDGER_COMMIT_SECONDS = 0.2
+LEDGER_COMPACT_BYTES = 1024 * 1024
+
+def parse_time(text):
+    """An ISO timestamp as an aware UTC datetime (older records were written without an offset)."""
+    when = datetime.fromisoformat(text)
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+class CoinLedger:
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        self.accounts = {}  # user_id -> {"balance": int, "last_daily": iso str or None}
+        self._dirty = set()  # users changed since the last compaction
+        self._buffer = []  # (seq, json line) not written yet
+        self._waiters = []  # (seq, future) of mutations waiting for their record to be written
+        self._unsettled = set()  # seqs of trades whose files may not be in storage yet
+        self._seq = 0
+        self._written_seq = 0
+        self._log_bytes = 0
+        self._file_lock = threading.Lock()
+        self._commit_lock = None
+        self._wakeup = None
+        self._writer = None
+        self.records = 0
+        self.commits = 0
+        self.compactions = 0
+        self.watchers = []  # callback(user_id, balance) after every change, e.g. the leaderboards
+
+    # --- lifecycle ---
+
+    async def start(self):
+        """Replay whatever the last run left in the log, compact it and start the writer. Returns records replayed."""
+        self._commit_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        replayed = await run_blocking(self._replay)
+        if replayed:
+            await self.compact()
+        self._writer = asyncio.create_task(self._write_loop())
+        return replayed
+
+    async def close(self):
+        if self._writer:
+            self._writer.cancel()
+            self._writer = None
+        await self.compact()
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return 0
+        count = 0
+        trades = {}  # seq -> files of trades not settled (yet)
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write; that batch was never acknowledged
+                    print(f"[DEBUG] Skipping unreadable ledger line: {line[:80]!r}")
+                    continue
+                for user_id, account in record["accounts"].items():
+                    self.accounts[user_id] = account
+                    self._dirty.add(user_id)
+                if record.get("files"):
+                    trades[record["seq"]] = record["files"]
+                if record["op"] == "settled":
+                    trades.pop(record["settles"], None)
+                self._seq = max(self._seq, record["seq"])
+                count += 1
+        for seq, files in sorted(trades.items()):
+            print(f"[DEBUG] Finishing trade #{seq} from the ledger: writing {len(files)} user file(s)")
+            write_user_files([tuple(item) for item in files])
+        self._written_seq = self._seq
+        self._log_bytes = os.path.getsize(self.path)
+        return count
+
+    # --- accounts ---
+
+    async def _load(self, *user_ids):
+        for user_id in user_ids:
+            if user_id not in self.accounts:
+                data = await load_user_file_async(user_id, "balances.json")
+                # Another command may have loaded (and changed) the account meanwhile
+                self.accounts.setdefault(user_id, {
+                    "balance": data.get("balance", 0) if data else 0,
+                    "last_daily": data.get("last_daily") if data else None,
+                })
+
+    async def account(self, user_id):
+        """A copy of the user's account: {"balance": int, "last_daily": iso str or None}."""
+        user_id = str(user_id)
+        await self._load(user_id)
+        return dict(self.accounts[user_id])
+
+    async def balance(self, user_id):
+        user_id = str(user_id)
+        await self._load(user_id)
+        return self.accounts[user_id]["balance"]
+
+    def _record(self, op, accounts, **details):
+        """Queue a record. Returns a future that resolves once it's on disk (None while no writer runs)."""
+        self._seq += 1
+        record = {"seq": self._seq, "ts": round(time.time(), 3), "op": op, **details, "accounts": accounts}
+        self._buffer.append((self._seq, json.dumps(record, separators=(",", ":")) + "\n"))
+        self._dirty.update(accounts)
+        self.records += 1
+        for user_id, account in accounts.items():
+            for watcher in self.watchers:
+                watcher(user_id, account["balance"])
+        if self._writer is None:
+            # Not started, or closed: the next commit()/compact() writes it
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((self._seq, future))
+        self._wakeup.set()
+        return future
+
+    async def _durable(self, written):
+        if written is not None:
+            await written
+
+    # Each mutation loads the accounts it needs first and then checks and changes them
+    # without awaiting, so two commands can't interleave between the check and the change.
+
+    async def credit(self, user_id, amount, reason="credit"):
+        """Add amount (negative takes coins away, unchecked). Returns the new balance."""
+        user_id = str(user_id)
+        await self._load(user_id)
+        account = self.accounts[user_id]
+        account["balance"] += amount
+        balance = account["balance"]
+        await self._durable(self._record(reason, {user_id: dict(account)}, amount=amount))
+        return balance
+
+    async def debit(self, user_id, amount, reason="debit", require_funds=True):
+        """
+        Take amount away. Returns the new balance, or None (and changes nothing) if
+        require_funds and the user can't cover it; otherwise the balance stops at 0.
+        """
+        user_id = str(user_id)
+        await self._load(user_id)
+        account = self.accounts[user_id]
+        if require_funds and account["balance"] < amount:
+            return None
+        account["balance"] = max(0, account["balance"] - amount)
+        balance = account["balance"]
+        await self._durable(self._record(reason, {user_id: dict(account)}, amount=-amount))
+        return balance
+
+    async def transfer(self, sender_id, receiver_id, amount, reason="transfer"):
+        """Move coins between two users in one record. False (and nothing moved) if the sender can't cover it."""
+        sender_id, receiver_id = str(sender_id), str(receiver_id)
+        await self._load(sender_id, receiver_id)
+        sender, receiver = self.accounts[sender_id], self.accounts[receiver_id]
+        if amount <= 0 or sender_id == receiver_id or sender["balance"] < amount:
+            return False
+        sender["balance"] -= amount
+        receiver["balance"] += amount
+        await self._durable(self._record(reason, {sender_id: dict(sender), receiver_id: dict(receiver)},
+                                         amount=amount, sender=sender_id, receiver=receiver_id))
+        return True
+
+    async def trade(self, payer_id, payee_id, amount, files, reason="trade"):
+        """
+        Move amount (0 is fine) from payer to payee and commit the trade's user files,
+        [(user_id, filename, data)], in the same record. Returns the record's seq once it
+        is on disk, or None (and nothing changed) if the payer can't cover the amount.
+        Write the files to storage afterwards and then call settle(seq).
+        """
+        payer_id, payee_id = str(payer_id), str(payee_id)
+        await self._load(payer_id, payee_id)
+        payer, payee = self.accounts[payer_id], self.accounts[payee_id]
+        if amount < 0 or payer_id == payee_id or payer["balance"] < amount:
+            return None
+        payer["balance"] -= amount
+        payee["balance"] += amount
+        written = self._record(reason, {payer_id: dict(payer), payee_id: dict(payee)},
+                               amount=amount, sender=payer_id, receiver=payee_id,
+                               files=[list(item) for item in files])
+        seq = self._seq
+        self._unsettled.add(seq)
+        await self._durable(written)
+        return seq
+
+    async def settle(self, seq):
+        """The files of trade `seq` are in storage: it no longer needs replaying."""
+        self._unsettled.discard(seq)
+        await self._durable(self._record("settled", {}, settles=seq))
+
+    def abandon(self, seq):
+        """
+        The files of trade `seq` couldn't be written and went to the user cache instead.
+        Compaction may drop the record again once its flush has written them.
+        """
+        self._unsettled.discard(seq)
+
+    async def claim_daily(self, user_id, amount, cooldown, now=None):
+        """
+        Pay the daily reward if the cooldown (a timedelta) has passed.
+        Returns (True, new balance) or (False, time left).
+        """
+        user_id = str(user_id)
+        now = now or datetime.now(timezone.utc)
+        await self._load(user_id)
+        account = self.accounts[user_id]
+        if account["last_daily"]:
+            waited = now - parse_time(account["last_daily"])
+            if waited < cooldown:
+                return False, cooldown - waited
+        account["balance"] += amount
+        account["last_daily"] = now.isoformat()
+        balance = account["balance"]
+        await self._durable(self._record("daily", {user_id: dict(account)}, amount=amount))
+        return True, balance
+
+    async def set_last_daily(self, user_id, when):
+        user_id = str(user_id)
+        await self._load(user_id)
+        account = self.accounts[user_id]
+        account["last_daily"] = when
+        await self._durable(self._record("set_last_daily", {user_id: dict(account)}))
+
+    # --- log ---
+
+    async def _write_loop(self):
+        while True:
+            await self._wakeup.wait()
+            # Let the records of anything else running right now join this batch
+            await asyncio.sleep(LEDGER_COMMIT_SECONDS)
+            try:
+                await self.commit()
+                if self._log_bytes > LEDGER_COMPACT_BYTES:
+                    await self.compact()
+            except Exception as e:
+                # The batch is queued again and its callers keep waiting; try again shortly
+                print(f"[DEBUG] Ledger commit failed: {e!r}")
+                await asyncio.sleep(1)
+                self._wakeup.set()
+
+    async def commit(self):
+        """Write and fsync every queued record. Returns how many were written."""
+        async with self._commit_lock:
+            self._wakeup.clear()
+            batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+            try:
+                await run_blocking(self._append, "".join(line for _, line in batch))
+            except Exception:
+                self._buffer[:0] = batch
+                raise
+            self._written_seq = batch[-1][0]
+            self.commits += 1
+            waiting = []
+            for seq, future in self._waiters:
+                if seq > self._written_seq:
+                    waiting.append((seq, future))
+                elif not future.done():
+                    future.set_result(seq)
+            self._waiters = waiting
+            return len(batch)
+
+    def _append(self, text):
+        with self._file_lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            self._log_bytes += len(text.encode("utf-8"))
+
+    async def compact(self):
+        """Write changed accounts to storage and drop the log records they cover."""
+        await self.commit()
+        async with self._commit_lock:
+            if not self._dirty:
+                return 0
+            covered = self._written_seq
+            if self._unsettled:
+                # Everything from the oldest unsettled trade on stays in the log
+                covered = min(covered, min(self._unsettled) - 1)
+            accounts = {user_id: dict(self.accounts[user_id]) for user_id in self._dirty}
+            self._dirty.clear()
+            # The accounts go into the user cache here on the loop; the flush writes them
+            # (and anything else unsaved) on a thread and only then trims the log
+            for user_id, account in accounts.items():
+                save_user_file(user_id, "balances.json", account)
+            try:
+                await flush_user_files_async(then=partial(self._truncate, covered))
+            except Exception:
+                self._dirty.update(accounts)
+                raise
+            self.compactions += 1
+            return len(accounts)
+
+    def _truncate(self, covered):
+        with self._file_lock:
+            # Keep records written after the accounts were captured (none unless a
+            # commit slipped in between); everything up to `covered` is in storage now
+            kept = []
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            if json.loads(line)["seq"] > covered:
+                                kept.append(line)
+                        except ValueError:
+                            continue
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(kept)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._log_bytes = sum(len(line.encode("utf-8")) for line in kept)
+
+    def stats(self):
+        return {
+            "accounts": len(self.accounts),
+            "records": self.records,
+            "commits": self.commits,
+            "compactions": self.compactions,
+            "pending": len(self._buffer),
+            "log_bytes": self._log_bytes,
+        }
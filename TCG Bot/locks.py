@@ -0,0 +1,130 @@
+import asyncio
+import copy
+from contextlib import asynccontextmanager
+from collection import Collection
+from utils import load_user_file_async, load_collection_async, save_user_files_now, user_cache
+
+# Serializes read-modify-write of user files. Without it two commands of the same
+# user (!op while the !shop menu is open) each load user_packs.json and the second
+# save drops the first one's change.
+#
+#     async with transaction(user_id) as tx:
+#         packs = await tx.packs(user_id)      # fresh copy, read inside the lock
+#         ...
+#         tx.save_packs(user_id, packs)        # applied when the block exits
+#
+# transaction(a, b) locks both users, always in user id order so two trades between
+# the same pair can't deadlock. Everything saved in the block is handed to the user
+# cache in one step when the block exits normally, and nothing is if it raises.
+# A block that must be on disk before it answers (a trade) can call
+# tx.commit_durable() itself: one storage batch, then the cache.
+# Locks are not re-entrant: don't open a transaction for a user inside another one
+# that already holds them. Coins are in the ledger, whose operations are atomic on
+# their own; call them inside the block when they go together with a file change.
+
+class UserLocks:
+    def __init__(self):
+        self._locks = {}  # user_id -> [asyncio.Lock, commands holding or waiting for it]
+
+    def __len__(self):
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, *user_ids):
+        entries = []
+        for user_id in sorted({str(user_id) for user_id in user_ids}):
+            entry = self._locks.setdefault(user_id, [asyncio.Lock(), 0])
+            entry[1] += 1
+            entries.append((user_id, entry))
+        acquired = []
+        try:
+            for _, entry in entries:
+                await entry[0].acquire()
+                acquired.append(entry[0])
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            for user_id, entry in entries:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[user_id]
+
+user_locks = UserLocks()
+
+class Transaction:
+    def __init__(self, user_ids):
+        self.user_ids = {str(user_id) for user_id in user_ids}
+        self._files = {}  # (user_id, filename) -> private copy
+        self._changed = set()
+
+    def _check(self, user_id):
+        user_id = str(user_id)
+        if user_id not in self.user_ids:
+            raise KeyError(f"user {user_id} is not part of this transaction")
+        return user_id
+
+    async def load(self, user_id, filename):
+        """A private copy of the file ({} if missing); changes only count once passed to save()."""
+        key = (self._check(user_id), filename)
+        if key not in self._files:
+            data = await load_user_file_async(key[0], filename)
+            self._files[key] = copy.deepcopy(data)
+        return self._files[key]
+
+    def save(self, user_id, filename, data):
+        key = (self._check(user_id), filename)
+        self._files[key] = data
+        self._changed.add(key)
+
+    async def collection(self, user_id):
+        user_id = self._check(user_id)
+        key = (user_id, "collection.json")
+        if key not in self._files:
+            # load_collection migrates the legacy cards.json/duplicates.json pair on first access
+            collection = await load_collection_async(user_id)
+            self._files[key] = copy.deepcopy(collection.data)
+        return Collection(self._files[key])
+
+    def save_collection(self, user_id, collection):
+        self.save(user_id, "collection.json", collection.data)
+
+    async def packs(self, user_id):
+        packs = await self.load(user_id, "user_packs.json")
+        return packs if packs else []
+
+    def save_packs(self, user_id, packs):
+        self.save(user_id, "user_packs.json", packs)
+
+    def changes(self):
+        """[(user_id, filename, data)] saved in this transaction and not committed yet."""
+        return [(user_id, filename, self._files[(user_id, filename)]) for user_id, filename in self._changed]
+
+    def rollback(self):
+        """Forget every save() so far: the block then commits nothing."""
+        for key in self._changed:
+            del self._files[key]
+        self._changed.clear()
+
+    def commit(self):
+        items = self.changes()
+        if items:
+            user_cache.save_many(items)
+        self._changed.clear()
+        return len(items)
+
+    async def commit_durable(self):
+        # The copies are still private to this transaction, so they can be written on a thread
+        items = self.changes()
+        if items:
+            await save_user_files_now(items)
+        self._changed.clear()
+        return len(items)
+
+@asynccontextmanager
+async def transaction(*user_ids):
+    tx = Transaction(user_ids)
+    async with user_locks.hold(*user_ids):
+        yield tx
+        # Only memory: the next flush writes the files together
+        tx.commit()
@@ -0,0 +1,141 @@
+import bisect
+import re
+from discord.ext import commands
+
+# Finds guild members by what people type: a mention, an id, a username, a
+# nickname/display name or name#discriminator, or the start of any of those.
+# bot.py attaches one index as bot.member_index. Per guild it keeps a dict of
+# lower-cased names -> member ids and the same names in a sorted list, so an
+# exact name is one lookup and a prefix is a bisect, instead of scanning
+# guild.members on every command. A guild is indexed the first time someone
+# is looked up in it (after chunking, so the member cache is complete) and kept
+# current from member join/update/remove events, which need the members intent.
+#
+#     member = await bot.member_index.resolve(ctx.guild, "ash")
+#     async def give(self, ctx, member: IndexedMember, amount: int)  # as a converter
+
+MENTION_RE = re.compile(r"^<@!?([0-9]{15,20})>$|^([0-9]{15,20})$")
+
+def member_keys(member):
+    keys = {member.name, member.display_name, member.global_name, member.nick}
+    if member.discriminator and member.discriminator != "0":
+        keys.add(f"{member.name}#{member.discriminator}")
+    return {key.lower() for key in keys if key}
+
+class GuildMemberIndex:
+    def __init__(self, members=()):
+        self.names = {}  # lower-cased name -> {member ids}
+        self.keys = {}  # member id -> the names it's indexed under
+        for member in members:
+            keys = self.keys[member.id] = member_keys(member)
+            for key in keys:
+                self.names.setdefault(key, set()).add(member.id)
+        self.sorted_names = sorted(self.names)  # for prefix matches
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, member):
+        """Index a member, or re-index one whose names changed."""
+        keys = member_keys(member)
+        if self.keys.get(member.id) == keys:
+            return
+        self.remove(member.id)
+        self.keys[member.id] = keys
+        for key in keys:
+            ids = self.names.get(key)
+            if ids is None:
+                ids = self.names[key] = set()
+                bisect.insort(self.sorted_names, key)
+            ids.add(member.id)
+
+    def remove(self, member_id):
+        for key in self.keys.pop(member_id, ()):
+            ids = self.names[key]
+            ids.discard(member_id)
+            if not ids:
+                del self.names[key]
+                del self.sorted_names[bisect.bisect_left(self.sorted_names, key)]
+
+    def exact(self, text):
+        return self.names.get(text.lower(), set())
+
+    def prefix(self, text, limit=2):
+        """Ids of members with a name starting with text; stops once `limit` are found."""
+        text = text.lower()
+        ids = set()
+        idx = bisect.bisect_left(self.sorted_names, text)
+        while idx < len(self.sorted_names) and self.sorted_names[idx].startswith(text):
+            ids |= self.names[self.sorted_names[idx]]
+            if len(ids) >= limit:
+                break
+            idx += 1
+        return ids
+
+class MemberIndex:
+    def __init__(self, bot):
+        self.bot = bot
+        self._guilds = {}  # guild id -> GuildMemberIndex
+        bot.add_listener(self.on_member_join, "on_member_join")
+        bot.add_listener(self.on_member_update, "on_member_update")
+        bot.add_listener(self.on_member_remove, "on_member_remove")
+        bot.add_listener(self.on_user_update, "on_user_update")
+        bot.add_listener(self.on_guild_remove, "on_guild_remove")
+
+    async def guild_index(self, guild):
+        index = self._guilds.get(guild.id)
+        if index is None:
+            if not guild.chunked and self.bot.intents.members:
+                await guild.chunk()
+            index = self._guilds[guild.id] = GuildMemberIndex(guild.members)
+            print(f"[DEBUG] Indexed {len(index)} members of {guild.name}")
+        return index
+
+    async def resolve(self, guild, text):
+        """The one member `text` refers to, or None if nobody (or more than one member) matches."""
+        text = text.strip()
+        match = MENTION_RE.match(text)
+        if match:
+            return guild.get_member(int(match.group(1) or match.group(2)))
+        index = await self.guild_index(guild)
+        text = text.lstrip("@")
+        ids = index.exact(text) or index.prefix(text)
+        return guild.get_member(next(iter(ids))) if len(ids) == 1 else None
+
+    # Guilds that haven't been indexed yet are skipped: they're built from the
+    # (by then current) member cache on first use.
+
+    async def on_member_join(self, member):
+        index = self._guilds.get(member.guild.id)
+        if index is not None:
+            index.add(member)
+
+    async def on_member_update(self, before, after):
+        index = self._guilds.get(after.guild.id)
+        if index is not None:
+            index.add(after)
+
+    async def on_member_remove(self, member):
+        index = self._guilds.get(member.guild.id)
+        if index is not None:
+            index.remove(member.id)
+
+    async def on_user_update(self, before, after):
+        # Username and global name changes arrive once per user, not per guild
+        for guild_id, index in self._guilds.items():
+            if after.id in index.keys:
+                guild = self.bot.get_guild(guild_id)
+                member = guild.get_member(after.id) if guild else None
+                if member is not None:
+                    index.add(member)
+
+    async def on_guild_remove(self, guild):
+        self._guilds.pop(guild.id, None)
+
+class IndexedMember(commands.Converter):
+    """Like discord.Member as a command argument, but resolved through bot.member_index."""
+    async def convert(self, ctx, argument):
+        member = await ctx.bot.member_index.resolve(ctx.guild, argument) if ctx.guild else None
+        if member is None:
+            raise commands.MemberNotFound(argument)
+        return member
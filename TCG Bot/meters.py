@@ -0,0 +1,41 @@
+import time
+
+# Energy that refills by one every `period` seconds up to `maximum`.
+# Only (value, last_regen) is stored; the current value is computed on read,
+# so checking energy never writes. The meter only computes: callers load and save
+# the file themselves (inside a transaction when energy is spent).
+
+class RegenMeter:
+    def __init__(self, name, maximum, period):
+        self.name = name
+        self.filename = f"{name}_energy.json"
+        self.key = f"{name}_energy"
+        self.maximum = maximum
+        self.period = period
+
+    def state(self, data, now=None):
+        """Pure computation: (current value, last_regen, seconds until the next point) from stored data."""
+        now = int(time.time()) if now is None else now
+        if not data:
+            return self.maximum, now, 0
+        last_regen = data.get("last_regen", now)
+        value = data.get(self.key, self.maximum)
+        regen = (now - last_regen) // self.period
+        if regen > 0:
+            value = min(self.maximum, value + regen)
+            last_regen += regen * self.period
+        if value >= self.maximum:
+            return value, last_regen, 0
+        return value, last_regen, max(0, last_regen + self.period - now)
+
+    def spend(self, data, amount=1, now=None):
+        """Pure computation: the stored data after spending `amount` points, or None if there aren't enough."""
+        value, last_regen, _ = self.state(data, now)
+        if value < amount:
+            return None
+        return {self.key: value - amount, "last_regen": last_regen}
+
+def format_duration(seconds):
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    return f"{hours}h {minutes}m {seconds % 60}s"
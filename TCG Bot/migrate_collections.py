@@ -0,0 +1,19 @@
+from utils import get_storage, load_collection, flush_user_files
+
+# In-place migration of every user's cards.json + duplicates.json (full card
+# dicts with image URLs) to collection.json ({pack: {number: count}}).
+# The bot also migrates users lazily on first access; this just does everyone at once.
+#
+# Usage: python migrate_collections.py
+
+def main():
+    migrated = 0
+    for user_id in get_storage().user_ids():
+        load_collection(user_id)
+        migrated += 1
+        # Keep the write-back cache from holding everyone at once
+        flush_user_files()
+    print(f"Done. Checked {migrated} user(s); collections are stored as collection.json.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import os
+import sys
+from storage import JsonStorage, SqliteStorage, DEFAULT_SQLITE_PATH
+from collection import Collection
+from catalog import get_catalog
+
+# One-shot import of the data/user/<id>/*.json tree into the SQLite backend.
+# Users are streamed one at a time (one transaction each), so memory stays flat
+# however many users there are. Safe to re-run: every row is an upsert.
+#
+# Usage: python migrate_to_sqlite.py [path/to/tcg.db]
+# Then set TCG_STORAGE=sqlite in .env to switch the bot over.
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SQLITE_PATH
+    source = JsonStorage()
+    target = SqliteStorage(db_path)
+    migrated = 0
+    files = 0
+    for user_id in source.user_ids():
+        folder = os.path.join(source.root, user_id)
+        batch = []
+        legacy = {}
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith(".json"):
+                continue
+            data = source.load(user_id, filename)
+            if data is None:
+                continue
+            if filename in ("cards.json", "duplicates.json"):
+                legacy[filename] = data
+            else:
+                batch.append((user_id, filename, data))
+        if legacy and not any(name == "collection.json" for _, name, _ in batch):
+            # Not migrated yet: store the compact (pack, number) -> count form directly
+            collection = Collection.from_legacy_files(
+                legacy.get("cards.json"), legacy.get("duplicates.json"), get_catalog()
+            )
+            batch.append((user_id, "collection.json", collection.data))
+        if batch:
+            target.save_many(batch)
+            migrated += 1
+            files += len(batch)
+            print(f"✅ {user_id}: {len(batch)} file(s)")
+    target.close()
+    print(f"Done. Imported {files} file(s) for {migrated} user(s) into {db_path}.")
+
+if __name__ == "__main__":
+    main()
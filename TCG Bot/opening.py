@@ -0,0 +1,56 @@
+import random
+import time
+from collections import Counter
+from catalog import PACK_SLOTS
+
+try:
+    import numpy as np
+except ImportError:  # optional: falls back to random.sample per pack
+    np = None
+
+# Bulk booster opening: draws every slot of N packs in one batch and returns the
+# pulls aggregated as {Card: copies}, ready to apply to a collection in one update.
+
+def open_packs(catalog, pack, count, rng=None):
+    """Open `count` boosters of `pack`. Every booster is drawn without replacement within each rarity."""
+    buckets = catalog.buckets[pack]
+    if np is not None:
+        return _open_packs_numpy(buckets, count, rng or np.random.default_rng())
+    return _open_packs_python(buckets, count, rng or random)
+
+def _open_packs_numpy(buckets, count, rng):
+    pulls = Counter()
+    for rarity, slots in PACK_SLOTS.items():
+        bucket = buckets[rarity]
+        if slots == 1:
+            picks = rng.integers(0, len(bucket), size=count)
+        else:
+            # `slots` distinct indices per pack: the positions of the smallest random keys in each row
+            keys = rng.random((count, len(bucket)))
+            picks = np.argpartition(keys, slots - 1, axis=1)[:, :slots]
+        copies = np.bincount(picks.ravel(), minlength=len(bucket))
+        for idx in np.flatnonzero(copies):
+            pulls[bucket[idx]] = int(copies[idx])
+    return pulls
+
+def _open_packs_python(buckets, count, rng):
+    pulls = Counter()
+    for _ in range(count):
+        for rarity, slots in PACK_SLOTS.items():
+            pulls.update(rng.sample(buckets[rarity], slots))
+    return pulls
+
+def benchmark(pack="base", count=36, rounds=200):
+    """Print how many packs per second open_packs sustains."""
+    from catalog import get_catalog
+    catalog = get_catalog()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        open_packs(catalog, pack, count)
+    elapsed = time.perf_counter() - start
+    engine = "numpy" if np is not None else "python"
+    print(f"[{engine}] {rounds} x {count} {pack} packs in {elapsed:.3f}s -> {rounds * count / elapsed:,.0f} packs/s")
+
+if __name__ == "__main__":
+    benchmark()
+    benchmark(count=1000, rounds=20)
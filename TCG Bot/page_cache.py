@@ -0,0 +1,150 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Finished binder pages (PNG bytes), cached in memory and on disk. A page only
+# depends on which cards are on it, their art and how many of each the viewer
+# owns, so the key is (pack, page, fingerprint of those counts, image URLs and the
+# atlas the tiles came from). When a pull or a trade changes a count, a card gets
+# a new image_url or the atlas is rebuilt, the fingerprint changes with it and the
+# old entry simply stops being asked for. Users with identical pages (e.g. nothing
+# owned yet) share one render.
+
+PAGE_CACHE_DIR = os.path.join("image_cache", "pages")
+PAGE_CACHE_BYTES = int(os.getenv("PAGE_CACHE_BYTES", str(64 * 1024 * 1024)))  # in memory
+PAGE_CACHE_DISK_BYTES = int(os.getenv("PAGE_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+
+def page_key(pack, page, cards, atlas_version=None):
+    """
+    cards: [(card number, image_url, owned)] for the cards on the page, in page order.
+    atlas_version: Atlas.version of the pack's atlas, or None when there is none.
+    """
+    digest = hashlib.blake2b(repr((tuple(cards), atlas_version)).encode(), digest_size=12).hexdigest()
+    return (pack, page, digest)
+
+class PageCache:
+    def __init__(self, max_bytes=PAGE_CACHE_BYTES, folder=PAGE_CACHE_DIR, max_disk_bytes=PAGE_CACHE_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.folder = folder
+        self.max_disk_bytes = max_disk_bytes
+        self._pages = OrderedDict()  # key -> png bytes
+        self._bytes = 0
+        self._disk = None  # filename -> size, oldest first; scanned on first use
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _filename(self, key):
+        pack, page, digest = key
+        return f"{pack}-{page}-{digest}.png"
+
+    def _disk_index(self):
+        if self._disk is None:
+            # Scanned without the lock, so memory lookups on the loop never wait for it
+            os.makedirs(self.folder, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.folder):
+                if name.endswith(".png"):
+                    st = os.stat(os.path.join(self.folder, name))
+                    entries.append((st.st_mtime, name, st.st_size))
+            with self._lock:
+                if self._disk is None:
+                    self._disk = OrderedDict((name, size) for _, name, size in sorted(entries))
+                    self._disk_bytes = sum(self._disk.values())
+        return self._disk
+
+    def _remember(self, key, png):
+        old = self._pages.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._pages[key] = png
+        self._bytes += len(png)
+        while self._bytes > self.max_bytes and self._pages:
+            _, evicted = self._pages.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def get(self, key):
+        """The cached PNG for a page, or None. Memory first, then disk."""
+        png = self.get_memory(key)
+        return png if png is not None else self.get_disk(key)
+
+    def get_memory(self, key):
+        """The page from the memory tier, or None. Never touches the disk, so it's fine on the event loop."""
+        with self._lock:
+            png = self._pages.get(key)
+            if png is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+            return png
+
+    def get_disk(self, key):
+        """The page from the disk tier (kept in memory from then on), or None. Blocking: run it off the loop."""
+        disk = self._disk_index()
+        name = self._filename(key)
+        # File I/O happens outside the lock; the lock only guards the indexes and counters
+        with self._lock:
+            if name not in disk:
+                self.misses += 1
+                return None
+        path = os.path.join(self.folder, name)
+        try:
+            with open(path, "rb") as f:
+                png = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                if name in disk:
+                    self._disk_bytes -= disk.pop(name)
+                self.misses += 1
+            return None
+        with self._lock:
+            if name in disk:
+                disk.move_to_end(name)
+            self._remember(key, png)
+            self.disk_hits += 1
+        return png
+
+    def put(self, key, png):
+        """Store a freshly rendered page in both tiers (the disk write is the slow part, run it off the loop)."""
+        with self._lock:
+            self._remember(key, png)
+        disk = self._disk_index()
+        name = self._filename(key)
+        path = os.path.join(self.folder, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[DEBUG] Could not store binder page {name}: {e}")
+            return
+        evicted = []
+        with self._lock:
+            self._disk_bytes += len(png) - disk.pop(name, 0)
+            disk[name] = len(png)
+            while self._disk_bytes > self.max_disk_bytes and len(disk) > 1:
+                old_name, size = disk.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.folder, old_name))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "pages": len(self._pages),
+                "bytes": self._bytes,
+                "disk_bytes": self._disk_bytes,
+            }
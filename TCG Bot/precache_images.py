@@ -1,31 +1,136 @@
-import os, json, hashlib, requests
-from PIL import Image
-from io import BytesIO
-
-def cache_image(url):
-    cache_dir = "image_cache"
-    os.makedirs(cache_dir, exist_ok=True)
-    url_hash = hashlib.md5(url.encode()).hexdigest()
-    cache_path = os.path.join(cache_dir, f"{url_hash}.png")
-    if os.path.exists(cache_path):
-        return
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from catalog import get_catalog
+from http_client import HttpClient
+from image_cache import DiskImageCache, CACHE_DIR
+from image_resolver import ImageResolver
+from utils import run_blocking
+
+# Warm image_cache/ with every card's image_url, so the bot never downloads at render time.
+# Downloads run in parallel (bounded by --workers and the HTTP client's per-host limit).
+# image_cache/manifest.json records url -> content hash, ETag and size: a rerun skips
+# everything already fetched (revalidating with If-None-Match where the host gave an
+# ETag), and an interrupted run resumes where it stopped.
+#
+# Usage: python precache_images.py [--workers 8] [--include-local] [--thumbnails]
+
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest.json")
+MANIFEST_SAVE_EVERY = 25  # completed downloads between manifest checkpoints
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def card_urls(catalog, resolver=None):
+    """Unique http(s) image URLs in the catalog, leaving out cards the resolver has bundled art for."""
+    urls = []
+    seen = set()
+    for pack in catalog.pack_names:
+        for card in catalog.cards(pack):
+            url = card.image_url
+            if not url or not url.startswith(("http://", "https://")) or url in seen:
+                continue
+            if resolver is not None and card.id in resolver.local:
+                continue
+            seen.add(url)
+            urls.append(url)
+    return urls
+
+async def precache_one(url, client, cache, manifest):
+    """Make sure one URL is cached and its manifest entry is current. Returns what happened."""
+    entry = manifest.get(url)
+    cached = await run_blocking(cache.get, url) if entry else None
+    if cached and not entry.get("etag"):
+        return "skipped"
+    status, body, etag = await client.revalidate(url, entry.get("etag") if cached else None)
+    if status == 304:
+        return "unchanged"
+    if body is None:
+        return "failed"
+    digest = hashlib.sha256(body).hexdigest()
+    if cached and entry.get("sha256") == digest:
+        entry["etag"] = etag
+        return "unchanged"
     try:
-        resp = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
-        if resp.status_code == 200:
-            img = Image.open(BytesIO(resp.content)).convert("RGBA")
-            img.save(cache_path)
-            print(f"Cached: {url}")
+        await run_blocking(cache.put, url, body)
     except Exception as e:
         print(f"Failed: {url} ({e})")
+        return "failed"
+    manifest[url] = {"sha256": digest, "etag": etag, "size": len(body)}
+    print(f"Cached: {url}")
+    return "changed" if entry else "downloaded"
+
+async def precache(urls, client, cache=None, manifest=None, workers=8, manifest_path=MANIFEST_PATH):
+    """Fetch every URL with `workers` parallel downloads. Returns a Counter of outcomes."""
+    cache = cache or DiskImageCache()
+    manifest = load_manifest(manifest_path) if manifest is None else manifest
+    queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+    outcomes = Counter()
+
+    async def worker():
+        while True:
+            try:
+                url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            outcome = await precache_one(url, client, cache, manifest)
+            outcomes[outcome] += 1
+            if outcome in ("downloaded", "changed") and (outcomes["downloaded"] + outcomes["changed"]) % MANIFEST_SAVE_EVERY == 0:
+                await run_blocking(save_manifest, dict(manifest), manifest_path)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    finally:
+        # Also reached on Ctrl+C, so the next run resumes from here
+        save_manifest(manifest, manifest_path)
+    return outcomes
+
+async def main():
+    parser = argparse.ArgumentParser(description="Download every card image into image_cache/.")
+    parser.add_argument("--workers", type=int, default=8, help="parallel downloads")
+    parser.add_argument("--include-local", action="store_true", help="also fetch cards that have bundled art")
+    parser.add_argument("--thumbnails", action="store_true", help="rebuild the binder atlases afterwards")
+    args = parser.parse_args()
+
+    catalog = get_catalog()
+    resolver = ImageResolver(catalog)
+    urls = card_urls(catalog, None if args.include_local else resolver)
+    skipped = 0 if args.include_local else len(card_urls(catalog)) - len(urls)
+    if not urls and skipped:
+        # Today every card ships with art in <pack>_images/, so a plain run has nothing to do
+        print(f"Skipped all {skipped} image URL(s): their cards use bundled art. "
+              f"Run with --include-local to download them anyway.")
+    else:
+        print(f"{len(urls)} image(s) to check, {skipped} skipped because their cards use bundled art"
+              f"{' (--include-local fetches those too)' if skipped else ''}.")
+        client = HttpClient(concurrency=args.workers)
+        start = time.perf_counter()
+        try:
+            outcomes = await precache(urls, client, resolver.cache, workers=args.workers)
+        finally:
+            await client.close()
+        summary = ", ".join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items())) or "nothing to do"
+        print(f"Done pre-caching in {time.perf_counter() - start:.1f}s: {summary}.")
+    if args.thumbnails:
+        import atlas
+        atlas.main()
 
-packs_dir = "data/cardpacks"
-for fname in os.listdir(packs_dir):
-    if fname.endswith(".json"):
-        with open(os.path.join(packs_dir, fname), encoding="utf-8") as f:
-            data = json.load(f)
-        cards = data["cards"] if isinstance(data, dict) else data
-        for card in cards:
-            url = card.get("image_url")
-            if url and (url.startswith("http://") or url.startswith("https://")):
-                cache_image(url)
-print("Done pre-caching.")
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
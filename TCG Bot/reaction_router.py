@@ -0,0 +1,68 @@
+import asyncio
+
+# Routes reaction events to whatever is waiting on that message. bot.py attaches one
+# router as bot.reaction_router; it listens on on_raw_reaction_add (so the message
+# doesn't have to be in discord.py's cache) and finds the route with one dict lookup
+# by message id, instead of every bot.wait_for check and global on_reaction_add
+# listener looking at every reaction in every guild.
+#
+# Two ways to use it:
+#     payload = await router.wait(message.id, emojis={"✅"}, users={ctx.author.id}, timeout=60)
+#     router.register(message.id, handler, users={ctx.author.id})  # handler(payload) for every match
+#                                                                    # until router.unregister(message.id)
+# Binder page buttons don't go through here: discord.py already dispatches
+# component interactions by custom_id (see BinderPageButton).
+
+class Route:
+    __slots__ = ("emojis", "users", "handler", "future")
+
+    def __init__(self, emojis=None, users=None, handler=None, future=None):
+        self.emojis = set(emojis) if emojis is not None else None
+        self.users = set(users) if users is not None else None
+        self.handler = handler
+        self.future = future
+
+    def matches(self, payload):
+        return (
+            (self.emojis is None or str(payload.emoji) in self.emojis)
+            and (self.users is None or payload.user_id in self.users)
+        )
+
+class ReactionRouter:
+    def __init__(self, bot):
+        self.bot = bot
+        self._routes = {}  # message_id -> Route
+        bot.add_listener(self.on_raw_reaction_add, "on_raw_reaction_add")
+
+    def __len__(self):
+        return len(self._routes)
+
+    def register(self, message_id, handler, emojis=None, users=None):
+        """Call `await handler(payload)` for every matching reaction on the message until unregistered."""
+        self._routes[message_id] = Route(emojis, users, handler=handler)
+
+    def unregister(self, message_id):
+        self._routes.pop(message_id, None)
+
+    async def wait(self, message_id, emojis=None, users=None, timeout=None):
+        """The next matching reaction's RawReactionActionEvent. Raises asyncio.TimeoutError like bot.wait_for."""
+        future = asyncio.get_running_loop().create_future()
+        route = self._routes[message_id] = Route(emojis, users, future=future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if self._routes.get(message_id) is route:
+                del self._routes[message_id]
+
+    async def on_raw_reaction_add(self, payload):
+        route = self._routes.get(payload.message_id)
+        if route is None or payload.user_id == getattr(self.bot.user, "id", None) or not route.matches(payload):
+            return
+        if route.future is not None:
+            if not route.future.done():
+                route.future.set_result(payload)
+            return
+        try:
+            await route.handler(payload)
+        except Exception as e:
+            print(f"[DEBUG] Reaction handler for message {payload.message_id} failed: {e!r}")
@@ -0,0 +1,187 @@
+import asyncio
+import functools
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple, Optional, Tuple
+from PIL import Image, ImageDraw, ImageFont
+from atlas import get_atlas, shade
+from image_cache import MemoryImageCache
+
+# Binder page rendering in a pool of worker processes. The cog describes a page
+# as plain data (PageSpec) and the PIL work runs off the bot's process, so several
+# users paging binders at once use several cores instead of sharing the GIL.
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+RENDER_QUEUE_LIMIT = int(os.getenv("RENDER_QUEUE_LIMIT", "32"))  # pages waiting or rendering
+# Workers must not be forked from the running bot: by then it has threads (aiohttp,
+# storage flushes) whose locks a fork would copy mid-use
+RENDER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+SOURCE_WIDTH = 600  # width of the full-size card scans; badges are drawn at tile scale to match
+
+class CardSlot(NamedTuple):
+    number: str
+    name: str
+    image_path: Optional[str]  # local file, None for the placeholder
+    count: int  # copies owned, 0 = shaded as unowned
+    tiled: bool = False  # draw from the pack's thumbnail atlas instead of image_path
+
+class PageSpec(NamedTuple):
+    pack: str
+    page: int
+    cards: Tuple[CardSlot, ...]
+    per_page: int = 12
+
+class RenderBusy(Exception):
+    """Raised when too many pages are already queued; the caller should ask the user to retry."""
+
+@functools.lru_cache(maxsize=None)
+def load_font(size):
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except Exception:
+        return ImageFont.load_default()
+
+# Decoded card tiles, per worker process
+decoded_images = MemoryImageCache()
+
+def open_card_image(path, cardname):
+    if not path:
+        return None
+    try:
+        return decoded_images.get(path)
+    except Exception as e:
+        print(f"[DEBUG] Failed to load image for {cardname}: {e}")
+        return None
+
+def draw_badge(draw, text, corner, font, pad):
+    """Red text on a translucent black box, anchored at corner=(x, y) going right/down (or left/up for negative pads)."""
+    bbox = draw.textbbox((0, 0), text, font=font)
+    w = bbox[2] - bbox[0]
+    h = bbox[3] - bbox[1]
+    x0, y0 = corner
+    x1 = x0 + (w + 2 * abs(pad)) * (1 if pad > 0 else -1)
+    y1 = y0 + (h + abs(pad)) * (1 if pad > 0 else -1)
+    x0, x1 = sorted((x0, x1))
+    y0, y1 = sorted((y0, y1))
+    draw.rectangle([x0, y0, x1, y1], fill=(0,0,0,180))
+    draw.text((x0 + abs(pad), y0 + abs(pad) // 2), text, font=font, fill=(255,0,0,255))
+
+def draw_badges(draw, box, number, count, scale=1.0):
+    """Card number top left and, for duplicates, the count bottom right of box=(x0, y0, x1, y1)."""
+    font = load_font(max(1, round(40 * scale)))
+    pad = max(1, round(8 * scale))
+    draw_badge(draw, f"#{number}", (box[0] + pad, box[1] + pad), font, pad)
+    if count > 1:
+        draw_badge(draw, f"x{count}", (box[2] - pad, box[3] - pad), font, -pad)
+
+def card_image(slot):
+    """Tile for a card without an atlas entry: the cached decode, or a grey placeholder."""
+    img = open_card_image(slot.image_path, slot.name)
+    if img is None:
+        print(f"[DEBUG] Using placeholder for {slot.name}")
+        img = Image.new("RGBA", (180, 240), (100, 100, 100, 255))
+    return img
+
+def render_page(spec):
+    """Compose one binder page from a PageSpec and return it as PNG bytes. Runs in a worker process."""
+    cols, rows = 4, 3
+    cw, ch = 180, 240
+    grid = Image.new("RGBA", (cols * cw, rows * ch), (0, 0, 0, 0))
+    atlas = get_atlas(spec.pack) if any(slot.tiled for slot in spec.cards) else None
+    for idx in range(spec.per_page):
+        r, c = divmod(idx, cols)
+        x, y = c * cw, r * ch
+        if idx >= len(spec.cards):
+            grid.paste((100, 100, 100, 255), (x, y, x + cw, y + ch))
+            continue
+        slot = spec.cards[idx]
+        tile = atlas.tile(slot.number) if atlas and slot.tiled else None
+        # Atlas tiles are views of the mapped file and decoded ones are shared, so draw on a copy
+        tile = (tile if tile is not None else card_image(slot)).copy()
+        # Badges first, then the shading, so an unowned card's badges are dimmed with it
+        draw_badges(ImageDraw.Draw(tile, "RGBA"), (0, 0, cw, ch), slot.number, slot.count, cw / SOURCE_WIDTH)
+        if slot.count == 0:
+            tile = shade(tile)
+        grid.paste(tile, (x, y), tile)
+    buf = io.BytesIO()
+    grid.save(buf, "PNG")
+    return buf.getvalue()
+
+def render_page_in_worker(spec):
+    """render_page plus this worker's decode cache counters, which only the worker can see."""
+    return render_page(spec), os.getpid(), decoded_images.stats()
+
+class RenderService:
+    """
+    Bounded front end to the process pool: at most `workers` pages render at once,
+    further requests wait their turn, and beyond `queue_limit` they are refused with RenderBusy.
+    If a worker dies (out of memory, a crash inside PIL) the pool is replaced and the page retried once.
+    """
+    def __init__(self, workers=RENDER_WORKERS, queue_limit=RENDER_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._slots = asyncio.Semaphore(workers)
+        self._pending = 0
+        self.restarts = 0
+        self.worker_stats = {}  # pid -> that worker's decoded image cache stats
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def start(self):
+        """Create the worker pool. The Binder cog calls this when it loads."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(RENDER_START_METHOD),
+            )
+        return self._executor
+
+    def _discard(self, executor):
+        # Every render that was running on the broken pool lands here; only the first replaces it
+        if self._executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self.restarts += 1
+
+    async def render(self, spec):
+        if self._pending >= self.queue_limit:
+            raise RenderBusy(f"{self._pending} binder pages already queued")
+        self._pending += 1
+        try:
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                for attempt in range(2):
+                    executor = self.start()
+                    try:
+                        png, pid, stats = await loop.run_in_executor(executor, render_page_in_worker, spec)
+                    except BrokenProcessPool as e:
+                        print(f"[DEBUG] Binder render pool broke ({e!r}), starting a new one")
+                        self._discard(executor)
+                        continue
+                    self.worker_stats[pid] = stats
+                    return png
+                raise RenderBusy("the binder renderer keeps crashing")
+        finally:
+            self._pending -= 1
+
+    def image_stats(self):
+        """Decoded image cache counters summed over the workers that have rendered."""
+        hits = sum(stats["hits"] for stats in self.worker_stats.values())
+        misses = sum(stats["misses"] for stats in self.worker_stats.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "bytes": sum(stats["bytes"] for stats in self.worker_stats.values()),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,180 @@
+import heapq
+import itertools
+import json
+import os
+import time
+from catalog import Card, get_catalog
+
+# Interactive per-user state (a wonderpick waiting for its pick, an adventure in
+# progress) with a time to live. bot.py attaches one manager as bot.sessions.
+# Each cog registers a kind with its TTL; sessions are keyed by (kind, key).
+# Expiry runs off a min-heap of deadlines, so a sweep only looks at sessions
+# that are actually due. On shutdown live sessions are written to
+# data/sessions.json and handed back to their kind when it registers after
+# the restart, so a wonderpick in progress survives a deploy.
+#
+# State is a plain dict; Card objects in it are stored as {"card": [pack, number]}.
+# A restored session naming a card the catalog no longer has is dropped (and logged).
+
+SESSIONS_SNAPSHOT = os.path.join("data", "sessions.json")
+SESSION_SWEEP_SECONDS = 30
+
+class UnknownCard(LookupError):
+    """A snapshot refers to a card that isn't in the catalog anymore."""
+
+class SessionKind:
+    __slots__ = ("name", "ttl", "on_expire")
+
+    def __init__(self, name, ttl, on_expire=None):
+        self.name = name
+        self.ttl = ttl
+        self.on_expire = on_expire
+
+class SessionManager:
+    def __init__(self):
+        self.kinds = {}
+        self._sessions = {}  # (kind, key) -> [state, expires_at, seq]
+        self._deadlines = []  # heap of (expires_at, seq, (kind, key)); stale entries are skipped
+        self._seq = itertools.count()
+        self._restored = {}  # kind -> [(key, state, expires_at)] waiting for the kind to register
+        self.expired = 0
+
+    def register(self, kind, ttl, on_expire=None):
+        """Declare a session kind. on_expire(key, state) runs when one of its sessions times out."""
+        self.kinds[kind] = SessionKind(kind, ttl, on_expire)
+        now = time.time()
+        for key, state, expires_at in self._restored.pop(kind, []):
+            if expires_at > now:
+                self._put(kind, key, state, expires_at)
+
+    def _put(self, kind, key, state, expires_at):
+        seq = next(self._seq)
+        self._sessions[(kind, key)] = [state, expires_at, seq]
+        heapq.heappush(self._deadlines, (expires_at, seq, (kind, key)))
+        # Re-armed sessions leave dead heap entries behind; rebuild once they dominate
+        if len(self._deadlines) > 2 * len(self._sessions) + 64:
+            self._deadlines = [(entry[1], entry[2], k) for k, entry in self._sessions.items()]
+            heapq.heapify(self._deadlines)
+
+    def set(self, kind, key, state, ttl=None):
+        ttl = self.kinds[kind].ttl if ttl is None else ttl
+        self._put(kind, key, state, time.time() + ttl)
+        return state
+
+    def get(self, kind, key, refresh=False):
+        """The live session state, or None. refresh=True restarts its TTL (activity keeps it alive)."""
+        entry = self._sessions.get((kind, key))
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            self._expire_one((kind, key))
+            return None
+        if refresh:
+            self._put(kind, key, entry[0], time.time() + self.kinds[kind].ttl)
+        return entry[0]
+
+    def pop(self, kind, key):
+        entry = self._sessions.pop((kind, key), None)
+        return entry[0] if entry else None
+
+    def __contains__(self, kind_key):
+        return self.get(*kind_key) is not None
+
+    def items(self, kind):
+        """[(key, state)] for every live session of a kind."""
+        now = time.time()
+        return [(k[1], entry[0]) for k, entry in self._sessions.items() if k[0] == kind and entry[1] > now]
+
+    def _expire_one(self, kind_key):
+        entry = self._sessions.pop(kind_key, None)
+        if entry is None:
+            return
+        self.expired += 1
+        kind = self.kinds.get(kind_key[0])
+        if kind and kind.on_expire:
+            try:
+                kind.on_expire(kind_key[1], entry[0])
+            except Exception as e:
+                print(f"[DEBUG] on_expire for {kind_key} failed: {e!r}")
+
+    def expire(self, now=None):
+        """Drop every session past its deadline. Returns how many expired."""
+        now = time.time() if now is None else now
+        count = 0
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, seq, kind_key = heapq.heappop(self._deadlines)
+            entry = self._sessions.get(kind_key)
+            if entry is not None and entry[2] == seq:
+                self._expire_one(kind_key)
+                count += 1
+        return count
+
+    def counts(self):
+        counts = {kind: 0 for kind in self.kinds}
+        for kind, _ in self._sessions:
+            counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def snapshot(self, path=SESSIONS_SNAPSHOT):
+        """Write live sessions to disk. Returns how many were saved."""
+        now = time.time()
+        data = {}
+        for (kind, key), (state, expires_at, _) in self._sessions.items():
+            if expires_at > now:
+                data.setdefault(kind, []).append({"key": key, "expires_at": expires_at, "state": encode_state(state)})
+        for kind, entries in self._restored.items():
+            # Kinds whose cog didn't load this run keep their sessions for the next one
+            data.setdefault(kind, []).extend(
+                {"key": key, "expires_at": expires_at, "state": encode_state(state)}
+                for key, state, expires_at in entries if expires_at > now
+            )
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        return sum(len(entries) for entries in data.values())
+
+    def restore(self, path=SESSIONS_SNAPSHOT):
+        """Load a snapshot; each kind gets its sessions back when it registers. Returns how many were kept."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        count = 0
+        for kind, entries in data.items():
+            for entry in entries:
+                try:
+                    state = decode_state(entry["state"])
+                except UnknownCard as e:
+                    print(f"[DEBUG] Dropping restored {kind} session {entry['key']}: {e}")
+                    continue
+                self._restored.setdefault(kind, []).append((entry["key"], state, entry["expires_at"]))
+                count += 1
+            if kind in self.kinds:
+                self.register(kind, self.kinds[kind].ttl, self.kinds[kind].on_expire)
+        return count
+
+def encode_state(value):
+    if isinstance(value, Card):
+        return {"card": [value.pack, value.number]}
+    if isinstance(value, dict):
+        return {key: encode_state(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_state(item) for item in value]
+    return value
+
+def decode_state(value):
+    if isinstance(value, dict):
+        if set(value) == {"card"}:
+            card = get_catalog().get(*value["card"])
+            if card is None:
+                raise UnknownCard(f"card {value['card'][0]} #{value['card'][1]} is not in the catalog")
+            return card
+        return {key: decode_state(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_state(item) for item in value]
+    return value
@@ -0,0 +1,237 @@
+import json
+import os
+import sqlite3
+import threading
+
+# Storage backends behind utils.load_user_file / save_user_file.
+# Both speak the same per-user "file" vocabulary (balances.json, cards.json, ...)
+# so the cogs don't care where the data actually lives.
+
+DEFAULT_SQLITE_PATH = os.path.join("data", "tcg.db")
+
+class JsonStorage:
+    """One directory per user under data/user/<id>/ holding one JSON file per kind of data."""
+    def __init__(self, root=os.path.join("data", "user")):
+        self.root = root
+
+    def _path(self, user_id, filename):
+        folder = os.path.join(self.root, str(user_id))
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, filename)
+
+    def load(self, user_id, filename):
+        """Return the parsed file, or None if the user has no such file."""
+        path = os.path.join(self.root, str(user_id), filename)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_many(self, items):
+        """Write a batch of (user_id, filename, data) tuples. data=None deletes the file."""
+        for user_id, filename, data in items:
+            path = self._path(user_id, filename)
+            if data is None:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4)
+            os.replace(tmp_path, path)
+
+    def user_ids(self):
+        if not os.path.isdir(self.root):
+            return []
+        return [name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name))]
+
+    def close(self):
+        pass
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS balances (
+    user_id TEXT PRIMARY KEY,
+    balance INTEGER NOT NULL DEFAULT 0,
+    last_daily TEXT
+);
+CREATE TABLE IF NOT EXISTS cards (
+    user_id TEXT NOT NULL,
+    pack TEXT NOT NULL,
+    number TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, pack, number)
+);
+CREATE TABLE IF NOT EXISTS packs (
+    user_id TEXT NOT NULL,
+    pack TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, pack)
+);
+CREATE TABLE IF NOT EXISTS energy (
+    user_id TEXT NOT NULL,
+    meter TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    last_regen INTEGER NOT NULL,
+    PRIMARY KEY (user_id, meter)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    user_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, filename)
+);
+"""
+
+# pack_energy.json -> meter "pack", wonderpack_energy.json -> meter "wonderpack"
+ENERGY_FILES = {
+    "pack_energy.json": "pack",
+    "wonderpack_energy.json": "wonderpack",
+}
+
+class SqliteStorage:
+    """
+    Single SQLite database (WAL mode) with a table per kind of user data.
+    Files without a dedicated table (including the legacy cards.json /
+    duplicates.json pair) are kept as JSON blobs in `documents`.
+    """
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # --- reads ---
+
+    def load(self, user_id, filename):
+        """Return the data in the shape the matching JSON file would have, or None if absent."""
+        user_id = str(user_id)
+        with self._lock:
+            if filename == "balances.json":
+                row = self._conn.execute(
+                    "SELECT balance, last_daily FROM balances WHERE user_id = ?", (user_id,)
+                ).fetchone()
+                return {"balance": row[0], "last_daily": row[1]} if row else None
+            if filename == "collection.json":
+                rows = self._conn.execute(
+                    "SELECT pack, number, count FROM cards WHERE user_id = ? ORDER BY rowid", (user_id,)
+                ).fetchall()
+                if not rows:
+                    return None
+                collection = {}
+                for pack, number, count in rows:
+                    collection.setdefault(pack, {})[number] = count
+                return collection
+            if filename == "user_packs.json":
+                rows = self._conn.execute(
+                    "SELECT pack, count FROM packs WHERE user_id = ? ORDER BY rowid", (user_id,)
+                ).fetchall()
+                return [{"pack": pack, "count": count} for pack, count in rows] or None
+            if filename in ENERGY_FILES:
+                meter = ENERGY_FILES[filename]
+                row = self._conn.execute(
+                    "SELECT value, last_regen FROM energy WHERE user_id = ? AND meter = ?", (user_id, meter)
+                ).fetchone()
+                return {f"{meter}_energy": row[0], "last_regen": row[1]} if row else None
+            row = self._conn.execute(
+                "SELECT data FROM documents WHERE user_id = ? AND filename = ?", (user_id, filename)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+
+    def user_ids(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id FROM balances UNION SELECT user_id FROM cards "
+                "UNION SELECT user_id FROM packs UNION SELECT user_id FROM energy "
+                "UNION SELECT user_id FROM documents"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # --- writes ---
+
+    def save_many(self, items):
+        """Write a batch of (user_id, filename, data) tuples in a single transaction. data=None deletes."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for user_id, filename, data in items:
+                    self._save(str(user_id), filename, data)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _save(self, user_id, filename, data):
+        conn = self._conn
+        if data is None:
+            self._delete(user_id, filename)
+        elif filename == "balances.json":
+            conn.execute(
+                "INSERT INTO balances (user_id, balance, last_daily) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET balance = excluded.balance, last_daily = excluded.last_daily",
+                (user_id, data.get("balance", 0), data.get("last_daily")),
+            )
+        elif filename == "collection.json":
+            conn.execute("DELETE FROM cards WHERE user_id = ?", (user_id,))
+            conn.executemany(
+                "INSERT INTO cards (user_id, pack, number, count) VALUES (?, ?, ?, ?)",
+                [
+                    (user_id, pack, str(number), count)
+                    for pack, cards in data.items()
+                    for number, count in cards.items()
+                    if count > 0
+                ],
+            )
+        elif filename == "user_packs.json":
+            if isinstance(data, dict):
+                data = [{"pack": pack, "count": count} for pack, count in data.items()]
+            conn.execute("DELETE FROM packs WHERE user_id = ?", (user_id,))
+            conn.executemany(
+                "INSERT INTO packs (user_id, pack, count) VALUES (?, ?, ?)",
+                [(user_id, p["pack"], p["count"]) for p in data if p.get("count", 0) > 0],
+            )
+        elif filename in ENERGY_FILES:
+            meter = ENERGY_FILES[filename]
+            conn.execute(
+                "INSERT INTO energy (user_id, meter, value, last_regen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id, meter) DO UPDATE SET value = excluded.value, last_regen = excluded.last_regen",
+                (user_id, meter, data[f"{meter}_energy"], data["last_regen"]),
+            )
+        else:
+            conn.execute(
+                "INSERT INTO documents (user_id, filename, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id, filename) DO UPDATE SET data = excluded.data",
+                (user_id, filename, json.dumps(data)),
+            )
+
+    def _delete(self, user_id, filename):
+        if filename == "balances.json":
+            self._conn.execute("DELETE FROM balances WHERE user_id = ?", (user_id,))
+        elif filename == "collection.json":
+            self._conn.execute("DELETE FROM cards WHERE user_id = ?", (user_id,))
+        elif filename == "user_packs.json":
+            self._conn.execute("DELETE FROM packs WHERE user_id = ?", (user_id,))
+        elif filename in ENERGY_FILES:
+            self._conn.execute("DELETE FROM energy WHERE user_id = ? AND meter = ?", (user_id, ENERGY_FILES[filename]))
+        else:
+            self._conn.execute("DELETE FROM documents WHERE user_id = ? AND filename = ?", (user_id, filename))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def open_storage(backend=None):
+    """Open the backend named by TCG_STORAGE ("json" by default, or "sqlite")."""
+    backend = (backend or os.getenv("TCG_STORAGE", "json")).lower()
+    if backend == "sqlite":
+        return SqliteStorage(os.getenv("TCG_SQLITE_PATH", DEFAULT_SQLITE_PATH))
+    if backend == "json":
+        return JsonStorage()
+    raise ValueError(f"Unknown storage backend {backend!r} (expected 'json' or 'sqlite')")
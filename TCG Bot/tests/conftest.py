@@ -0,0 +1,21 @@
+import os
+import sys
+import pytest
+
+# The bot's modules are flat files next to bot.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """A JsonStorage in tmp_path behind a fresh user cache, as utils sees them."""
+    import leaderboard
+    import locks
+    import utils
+    from storage import JsonStorage
+    backend = JsonStorage(str(tmp_path / "user"))
+    cache = utils.UserCache()
+    monkeypatch.setattr(utils, "_storage", backend)
+    monkeypatch.setattr(utils, "_flush_lock", None)
+    for module in (utils, locks, leaderboard):
+        monkeypatch.setattr(module, "user_cache", cache)
+    return backend
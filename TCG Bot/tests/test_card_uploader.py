@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import pytest
+from PIL import Image
+import CardUploader
+
+def png(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+class FakeImgbb(ThreadingHTTPServer):
+    """Stand-in for the ImgBB upload API: answers with a link derived from the image's sha256."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeImgbbHandler)
+        self.uploads = []  # sha256 of every image received
+        self.rejected = set()  # sha256s answered with HTTP 400
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/1/upload"
+
+    @staticmethod
+    def link(body):
+        return f"https://i.example/{hashlib.sha256(body).hexdigest()[:12]}.png"
+
+class FakeImgbbHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        body = base64.b64decode(form["image"][0])
+        digest = hashlib.sha256(body).hexdigest()
+        if digest in self.server.rejected:
+            self.send_response(400)
+            self.end_headers()
+            self.wfile.write(b'{"error": "rejected"}')
+            return
+        with self.server.lock:
+            self.server.uploads.append(digest)
+        payload = json.dumps({"data": {"url": self.server.link(body)}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+ART = {"alpha": png("red"), "beta": png("blue"), "gamma": png("red")}  # gamma reuses alpha's picture
+
+@pytest.fixture
+def imgbb(tmp_path, monkeypatch):
+    server = FakeImgbb()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    cards_dir = tmp_path / "data" / "cardpacks"
+    cards_dir.mkdir(parents=True)
+    (cards_dir / "test.json").write_text(json.dumps({"cards": [
+        {"number": str(number), "name": name.title(), "rarity": "common", "image_url": "old"}
+        for number, name in enumerate(ART, 1)
+    ]}))
+    images = tmp_path / "test_images"
+    images.mkdir()
+    for number, (name, body) in enumerate(ART.items(), 1):
+        (images / f"t.{number:03d}.{name}.png").write_bytes(body)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(CardUploader, "UPLOAD_URL", server.url)
+    monkeypatch.setattr(CardUploader, "CARDS_DIR", str(cards_dir))
+    monkeypatch.setattr(CardUploader, "PACKS", {"test": ("test_images", "links_test.txt", "test.json")})
+    monkeypatch.setattr("sys.argv", ["CardUploader.py", "test"])
+    monkeypatch.setattr(CardUploader.time, "sleep", lambda seconds: None)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def manifest(tmp_path):
+    return json.loads((tmp_path / CardUploader.MANIFEST_PATH).read_text())
+
+def test_uploads_each_picture_once_and_writes_links(imgbb, tmp_path):
+    CardUploader.main()
+
+    assert sorted(imgbb.uploads) == sorted({hashlib.sha256(body).hexdigest() for body in ART.values()})
+    assert (tmp_path / "links_test.txt").read_text().splitlines() == [
+        f"{number} {FakeImgbb.link(body)}" for number, body in enumerate(ART.values(), 1)
+    ]
+    cards = json.loads((tmp_path / "data" / "cardpacks" / "test.json").read_text())["cards"]
+    assert [card["image_url"] for card in cards] == [FakeImgbb.link(body) for body in ART.values()]
+
+def test_pictures_in_manifest_are_not_uploaded_again(imgbb, tmp_path):
+    CardUploader.main()
+    imgbb.uploads.clear()
+
+    CardUploader.main()
+
+    assert imgbb.uploads == []
+    assert len((tmp_path / "links_test.txt").read_text().splitlines()) == len(ART)
+
+def test_failed_upload_is_resumed_next_run(imgbb, tmp_path):
+    beta = hashlib.sha256(ART["beta"]).hexdigest()
+    imgbb.rejected.add(beta)
+    CardUploader.main()
+
+    assert beta not in manifest(tmp_path)
+    # The failed card keeps its old link; the others are updated
+    cards = json.loads((tmp_path / "data" / "cardpacks" / "test.json").read_text())["cards"]
+    assert [card["image_url"] for card in cards] == [FakeImgbb.link(ART["alpha"]), "old", FakeImgbb.link(ART["gamma"])]
+
+    imgbb.rejected.clear()
+    imgbb.uploads.clear()
+    CardUploader.main()
+
+    assert imgbb.uploads == [beta]
+    assert (tmp_path / "links_test.txt").read_text().splitlines()[1] == f"2 {FakeImgbb.link(ART['beta'])}"
+
+def test_run_killed_mid_pack_resumes_from_manifest(imgbb, tmp_path, monkeypatch):
+    upload = CardUploader.upload_image_to_imgbb
+
+    def upload_until_beta(path):
+        if "beta" in path:
+            raise KeyboardInterrupt
+        return upload(path)
+
+    # One worker uploads in card order, so alpha's link is recorded before the run dies
+    monkeypatch.setattr(CardUploader, "UPLOAD_WORKERS", 1)
+    monkeypatch.setattr(CardUploader, "upload_image_to_imgbb", upload_until_beta)
+    with pytest.raises(KeyboardInterrupt):
+        CardUploader.main()
+    assert list(manifest(tmp_path)) == [hashlib.sha256(ART["alpha"]).hexdigest()]
+    assert not (tmp_path / "links_test.txt").exists()
+
+    monkeypatch.setattr(CardUploader, "upload_image_to_imgbb", upload)
+    imgbb.uploads.clear()
+    CardUploader.main()
+
+    assert imgbb.uploads == [hashlib.sha256(ART["beta"]).hexdigest()]
+    assert len((tmp_path / "links_test.txt").read_text().splitlines()) == len(ART)
@@ -0,0 +1,42 @@
+import json
+import shutil
+from catalog import CardCatalog, CARDPACKS_FOLDER, LINKS_FILE
+from compile_catalog import compile_catalog, write_artifact
+
+def build(tmp_path):
+    folder = tmp_path / "cardpacks"
+    shutil.copytree(CARDPACKS_FOLDER, folder)
+    shutil.copy(LINKS_FILE.format(pack="base"), tmp_path)
+    payload, errors, _ = compile_catalog(str(folder), str(tmp_path))
+    assert not errors
+    artifact = tmp_path / "catalog.json"
+    write_artifact(payload, str(artifact))
+    return folder, artifact
+
+def load(folder, artifact, tmp_path):
+    return CardCatalog.load(str(folder), str(artifact), str(tmp_path))
+
+def test_artifact_is_plain_json_matching_the_packs(tmp_path):
+    folder, artifact = build(tmp_path)
+    payload = json.loads(artifact.read_text(encoding="utf-8"))
+    assert set(payload["sources"]) == {"base.json", "fossil.json", "jungle.json", "rocket.json", LINKS_FILE.format(pack="base")}
+    compiled, source = CardCatalog.from_artifact(str(artifact)), CardCatalog.from_json(str(folder))
+    assert [card.id for card in compiled.cards("base")] == [card.id for card in source.cards("base")]
+    assert compiled.stats == source.stats
+
+def test_any_changed_source_makes_the_artifact_stale(tmp_path, capsys):
+    folder, artifact = build(tmp_path)
+    load(folder, artifact, tmp_path)
+    assert capsys.readouterr().out == ""
+    # Same pack JSON, only the links file changed
+    links = tmp_path / LINKS_FILE.format(pack="base")
+    links.write_text(links.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+    catalog = load(folder, artifact, tmp_path)
+    assert "out of date" in capsys.readouterr().out
+    assert len(catalog.cards("base")) == len(CardCatalog.from_json(str(folder)).cards("base"))
+
+def test_a_new_links_file_makes_the_artifact_stale(tmp_path, capsys):
+    folder, artifact = build(tmp_path)
+    shutil.copy(LINKS_FILE.format(pack="fossil"), tmp_path)
+    load(folder, artifact, tmp_path)
+    assert "out of date" in capsys.readouterr().out
@@ -0,0 +1,46 @@
+import bisect
+import random
+from leaderboard import Leaderboard, Leaderboards, RankedList
+
+def test_ranked_list_matches_a_sorted_list():
+    rng = random.Random(7)
+    ranked, expected = RankedList(), []
+    for _ in range(3000):
+        key = rng.randrange(500)
+        if key in expected:
+            ranked.remove(key)
+            expected.remove(key)
+        else:
+            ranked.add(key)
+            bisect.insort(expected, key)
+        probe = rng.randrange(500)
+        assert ranked.index(probe) == bisect.bisect_left(expected, probe)
+    assert len(ranked) == len(expected)
+    assert list(ranked) == expected
+    assert ranked.first(10) == expected[:10]
+
+def test_board_ranks_best_first_and_drops_zero_scores():
+    board = Leaderboard("coins")
+    board.load({"a": 50, "b": 200, "c": 0})
+    board.update("d", 120)
+    board.update("a", 300)
+    board.update("b", 0)
+    assert board.top(2) == [("a", 300), ("d", 120)]
+    assert board.rank("d") == (2, 120)
+    assert board.rank("b") == (None, 0)
+    assert len(board) == 2
+
+def test_rebuild_and_follow_collections(storage):
+    storage.save_many([
+        ("1", "balances.json", {"balance": 10}),
+        ("1", "collection.json", {"base": {"1": 2, "2": 0}}),
+        ("2", "collection.json", {"base": {"1": 1, "2": 1}}),
+    ])
+    boards = Leaderboards()
+    assert boards.rebuild(storage) == 2
+    assert boards.standings("base", 1) == ([("2", 2), ("1", 1)], (2, 1))
+    boards.update_collection(1, {"base": {"1": 1, "2": 1, "3": 1}})
+    boards.update_coins("2", 40)
+    assert boards.standings("base", 1) == ([("1", 3), ("2", 2)], (1, 3))
+    assert boards.standings("coins", 2) == ([("2", 40), ("1", 10)], (1, 40))
+    assert boards.standings("fossil", 1) is None
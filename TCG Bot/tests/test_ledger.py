@@ -0,0 +1,126 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+import ledger as ledger_module
+from ledger import CoinLedger
+
+def log_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_mutations_return_once_their_record_is_on_disk(storage, tmp_path):
+    path = str(tmp_path / "coins.ledger")
+
+    async def main():
+        ledger = CoinLedger(path)
+        await ledger.start()
+        assert await ledger.credit("1", 500, "test") == 500
+        # Nothing else ran after the credit returned: the record must already be in the file
+        assert [record["accounts"] for record in log_records(path)] == [{"1": {"balance": 500, "last_daily": None}}]
+        await ledger.close()
+
+    asyncio.run(main())
+
+def test_concurrent_mutations_share_one_commit(storage, tmp_path):
+    async def main():
+        ledger = CoinLedger(str(tmp_path / "coins.ledger"))
+        await ledger.start()
+        balances = await asyncio.gather(*(ledger.credit(str(user), 10) for user in range(20)))
+        assert balances == [10] * 20
+        assert ledger.commits == 1
+        assert ledger.records == 20
+        await ledger.close()
+
+    asyncio.run(main())
+
+def test_transfer_and_debit_check_funds(storage, tmp_path):
+    async def main():
+        ledger = CoinLedger(str(tmp_path / "coins.ledger"))
+        await ledger.start()
+        await ledger.credit("a", 100)
+        assert not await ledger.transfer("a", "b", 150)
+        assert await ledger.debit("a", 150) is None
+        assert await ledger.transfer("a", "b", 60)
+        assert (await ledger.balance("a"), await ledger.balance("b")) == (40, 60)
+        assert await ledger.debit("a", 100, require_funds=False) == 0
+        assert ledger.records == 3
+        await ledger.close()
+
+    asyncio.run(main())
+
+def test_crash_replays_log_and_compacts(storage, tmp_path):
+    path = str(tmp_path / "coins.ledger")
+
+    async def crashed_run():
+        ledger = CoinLedger(path)
+        await ledger.start()
+        await ledger.credit("a", 100)
+        await ledger.transfer("a", "b", 30)
+        # No close(): the process dies here, balances.json was never written
+        ledger._writer.cancel()
+
+    async def next_run():
+        ledger = CoinLedger(path)
+        assert await ledger.start() == 2
+        assert (await ledger.balance("a"), await ledger.balance("b")) == (70, 30)
+        await ledger.close()
+
+    asyncio.run(crashed_run())
+    assert storage.load("a", "balances.json") is None
+    asyncio.run(next_run())
+    # Compaction wrote the accounts to storage and emptied the log
+    assert storage.load("a", "balances.json")["balance"] == 70
+    assert storage.load("b", "balances.json")["balance"] == 30
+    assert log_records(path) == []
+
+def test_compaction_keeps_records_written_after_it_started(storage, tmp_path, monkeypatch):
+    monkeypatch.setattr(ledger_module, "LEDGER_COMPACT_BYTES", 1)
+    path = str(tmp_path / "coins.ledger")
+
+    async def main():
+        ledger = CoinLedger(path)
+        await ledger.start()
+        await ledger.credit("a", 1)
+        await ledger.credit("a", 1)
+        # The writer compacts after every commit at this size
+        await asyncio.sleep(ledger_module.LEDGER_COMMIT_SECONDS + 0.1)
+        assert ledger.compactions >= 1
+        assert storage.load("a", "balances.json")["balance"] == 2
+        await ledger.close()
+
+    asyncio.run(main())
+
+def test_daily_cooldown_accepts_old_naive_timestamps(storage, tmp_path):
+    async def main():
+        ledger = CoinLedger(str(tmp_path / "coins.ledger"))
+        await ledger.start()
+        now = datetime.now(timezone.utc)
+        # Accounts written before timestamps carried an offset
+        await ledger.set_last_daily("a", (now - timedelta(hours=3)).replace(tzinfo=None).isoformat())
+        claimed, remaining = await ledger.claim_daily("a", 1000, timedelta(hours=24), now=now)
+        assert not claimed and timedelta(hours=20) < remaining <= timedelta(hours=21)
+        claimed, balance = await ledger.claim_daily("a", 1000, timedelta(hours=24), now=now + timedelta(hours=22))
+        assert claimed and balance == 1000
+        await ledger.close()
+
+    asyncio.run(main())
+
+def test_compaction_keeps_unsettled_trades(storage, tmp_path):
+    path = str(tmp_path / "coins.ledger")
+
+    async def main():
+        ledger = CoinLedger(path)
+        await ledger.start()
+        await ledger.credit("a", 100)
+        seq = await ledger.trade("a", "b", 40, [("b", "collection.json", {"base": {"58": 1}})])
+        await ledger.compact()
+        # The trade's files are not in storage yet, so its record stays
+        assert [record["seq"] for record in log_records(path)] == [seq]
+        await ledger.settle(seq)
+        await ledger.credit("a", 1)
+        await ledger.compact()
+        assert log_records(path) == []
+        await ledger.close()
+
+    asyncio.run(main())
+    assert storage.load("a", "balances.json")["balance"] == 61
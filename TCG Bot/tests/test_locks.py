@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from locks import UserLocks, transaction, user_locks
+from utils import load_user_file_async
+
+def test_locks_are_taken_in_user_id_order():
+    locks = UserLocks()
+    order = []
+
+    async def trade(a, b, name):
+        async with locks.hold(a, b):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        # Opposite argument orders would deadlock if each took its first user first
+        await asyncio.wait_for(asyncio.gather(*(trade(1, 2, f"ab{i}") if i % 2 else trade(2, 1, f"ba{i}") for i in range(6))), 2)
+        assert len(order) == 6
+        # Nobody holds or waits for a lock anymore, so none are kept
+        assert len(locks) == 0
+
+    asyncio.run(main())
+
+def test_transaction_commits_on_exit_and_not_on_error(storage):
+    async def main():
+        async with transaction(1) as tx:
+            packs = await tx.packs(1)
+            packs.append({"pack": "base"})
+            tx.save_packs(1, packs)
+            # Private copy: nobody else sees it before the block exits
+            assert not await load_user_file_async("1", "user_packs.json")
+        assert await load_user_file_async("1", "user_packs.json") == [{"pack": "base"}]
+        with pytest.raises(RuntimeError):
+            async with transaction(1) as tx:
+                tx.save_packs(1, [])
+                raise RuntimeError("boom")
+        assert await load_user_file_async("1", "user_packs.json") == [{"pack": "base"}]
+        with pytest.raises(KeyError):
+            async with transaction(1) as tx:
+                await tx.packs(2)
+        assert len(user_locks) == 0
+
+    asyncio.run(main())
+
+def test_commit_durable_writes_storage_and_rollback_drops_saves(storage):
+    async def main():
+        async with transaction(1, 2) as tx:
+            tx.save(1, "notes.json", {"a": 1})
+            tx.save(2, "notes.json", {"b": 2})
+            assert sorted(user_id for user_id, _, _ in tx.changes()) == ["1", "2"]
+            assert await tx.commit_durable() == 2
+            assert storage.load("1", "notes.json") == {"a": 1}
+            assert storage.load("2", "notes.json") == {"b": 2}
+            tx.save(1, "notes.json", {"a": 3})
+            tx.rollback()
+            assert tx.changes() == []
+            # The next load reads the committed file again, not the dropped change
+            assert await tx.load(1, "notes.json") == {"a": 1}
+        assert await load_user_file_async("1", "notes.json") == {"a": 1}
+
+    asyncio.run(main())
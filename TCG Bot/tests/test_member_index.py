@@ -0,0 +1,52 @@
+import asyncio
+import types
+from member_index import GuildMemberIndex, MemberIndex
+
+def member(member_id, name, nick=None, global_name=None, discriminator="0"):
+    return types.SimpleNamespace(id=member_id, name=name, display_name=nick or global_name or name,
+                                 global_name=global_name, nick=nick, discriminator=discriminator)
+
+class Guild:
+    def __init__(self, members):
+        self.id = 1
+        self.name = "guild"
+        self.chunked = True
+        self.members = members
+
+    def get_member(self, member_id):
+        return next((m for m in self.members if m.id == member_id), None)
+
+def test_exact_and_prefix_matches():
+    index = GuildMemberIndex([member(1, "ash", nick="Champion"), member(2, "ashley"), member(3, "misty", discriminator="1234")])
+    assert index.exact("ASH") == {1}
+    assert index.exact("champion") == {1}
+    assert index.exact("misty#1234") == {3}
+    assert index.prefix("ash") == {1, 2}
+    assert index.prefix("mis") == {3}
+
+def test_add_and_remove_keep_sorted_names_in_step():
+    index = GuildMemberIndex([member(1, "brock")])
+    index.add(member(1, "brock", nick="Pewter"))
+    index.add(member(2, "bruno"))
+    assert index.sorted_names == sorted(index.names) == ["brock", "bruno", "pewter"]
+    index.remove(1)
+    assert index.sorted_names == ["bruno"]
+    assert index.exact("pewter") == set()
+    assert len(index) == 1
+
+def test_resolve_mentions_names_and_ambiguous_prefixes():
+    bot = types.SimpleNamespace(add_listener=lambda *args: None, intents=types.SimpleNamespace(members=True))
+    guild = Guild([member(111111111111111111, "ash"), member(222222222222222222, "ashley"), member(333333333333333333, "misty")])
+    members = MemberIndex(bot)
+
+    async def main():
+        assert (await members.resolve(guild, "<@!333333333333333333>")).name == "misty"
+        assert (await members.resolve(guild, "@ash")).name == "ash"
+        assert (await members.resolve(guild, "mi")).name == "misty"
+        assert await members.resolve(guild, "as") is None  # ash or ashley
+        # Events keep an indexed guild current
+        guild.members.append(member(444444444444444444, "brock"))
+        await members.on_member_join(types.SimpleNamespace(guild=guild, **vars(guild.members[-1])))
+        assert (await members.resolve(guild, "bro")).name == "brock"
+
+    asyncio.run(main())
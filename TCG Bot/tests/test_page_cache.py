@@ -0,0 +1,17 @@
+from page_cache import PageCache, page_key
+
+def test_key_follows_counts_art_and_atlas():
+    cards = [("1", "https://i.ibb.co/a.png", 1), ("2", "https://i.ibb.co/b.png", 0)]
+    key = page_key("base", 1, cards, 100)
+    assert key == page_key("base", 1, list(cards), 100)
+    assert key != page_key("base", 1, [cards[0], ("2", "https://i.ibb.co/b.png", 1)], 100)
+    assert key != page_key("base", 1, [cards[0], ("2", "https://i.ibb.co/new.png", 0)], 100)
+    assert key != page_key("base", 1, cards, 101)
+    assert key != page_key("base", 1, cards, None)
+
+def test_pages_survive_on_disk(tmp_path):
+    key = page_key("base", 1, [("1", None, 0)])
+    PageCache(folder=str(tmp_path)).put(key, b"png")
+    pages = PageCache(folder=str(tmp_path))
+    assert pages.get_memory(key) is None
+    assert pages.get_disk(key) == b"png"
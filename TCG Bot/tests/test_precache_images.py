@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import io
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from PIL import Image
+from http_client import HttpClient
+from image_cache import DiskImageCache
+from precache_images import precache, load_manifest
+
+def png(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+class ImageHost:
+    """Stand-in image host: /<name>.png with an ETag per image, 304 on If-None-Match."""
+
+    def __init__(self, images):
+        self.images = images  # name -> bytes
+        self.broken = set()
+        self.requests = []  # (name, status)
+
+    async def handle(self, request):
+        name = request.match_info["name"]
+        if name in self.broken or name not in self.images:
+            self.requests.append((name, 404))
+            return web.Response(status=404)
+        body = self.images[name]
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.requests.append((name, 304))
+            return web.Response(status=304, headers={"ETag": etag})
+        self.requests.append((name, 200))
+        return web.Response(body=body, content_type="image/png", headers={"ETag": etag})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/{name}.png", self.handle)
+        return app
+
+async def run(urls, tmp_path):
+    """One precache run with a fresh client and cache object, like a new process."""
+    client = HttpClient(retries=0)
+    try:
+        return await precache(urls, client, DiskImageCache(str(tmp_path / "cache")),
+                              workers=2, manifest_path=str(tmp_path / "manifest.json"))
+    finally:
+        await client.close()
+
+def serve(host, names, test):
+    """Run test(urls) while the host is up."""
+    async def main():
+        async with TestServer(host.app()) as server:
+            await test([str(server.make_url(f"/{name}.png")) for name in names])
+    asyncio.run(main())
+
+def test_first_run_downloads_and_records_manifest(tmp_path):
+    host = ImageHost({"a": png("red"), "b": png("blue")})
+
+    async def test(urls):
+        assert await run(urls, tmp_path) == {"downloaded": 2}
+        manifest = load_manifest(str(tmp_path / "manifest.json"))
+        assert set(manifest) == set(urls)
+        for url, name in zip(urls, ["a", "b"]):
+            body = host.images[name]
+            assert manifest[url] == {
+                "sha256": hashlib.sha256(body).hexdigest(),
+                "etag": f'"{hashlib.md5(body).hexdigest()}"',
+                "size": len(body),
+            }
+            with open(DiskImageCache(str(tmp_path / "cache")).get(url), "rb") as f:
+                assert f.read() == body
+
+    serve(host, ["a", "b"], test)
+
+def test_rerun_revalidates_and_skips_unchanged(tmp_path):
+    host = ImageHost({"a": png("red"), "b": png("blue")})
+
+    async def test(urls):
+        await run(urls, tmp_path)
+        manifest_before = load_manifest(str(tmp_path / "manifest.json"))
+        host.requests.clear()
+        assert await run(urls, tmp_path) == {"unchanged": 2}
+        assert sorted(host.requests) == [("a", 304), ("b", 304)]
+        assert load_manifest(str(tmp_path / "manifest.json")) == manifest_before
+
+    serve(host, ["a", "b"], test)
+
+def test_changed_image_is_downloaded_again(tmp_path):
+    host = ImageHost({"a": png("red")})
+
+    async def test(urls):
+        await run(urls, tmp_path)
+        host.images["a"] = png("green")
+        assert await run(urls, tmp_path) == {"changed": 1}
+        entry = load_manifest(str(tmp_path / "manifest.json"))[urls[0]]
+        assert entry["sha256"] == hashlib.sha256(host.images["a"]).hexdigest()
+
+    serve(host, ["a"], test)
+
+def test_resumes_after_failed_url(tmp_path):
+    host = ImageHost({"a": png("red"), "b": png("blue"), "c": png("white")})
+    host.broken.add("b")
+
+    async def test(urls):
+        assert await run(urls, tmp_path) == {"downloaded": 2, "failed": 1}
+        assert urls[1] not in load_manifest(str(tmp_path / "manifest.json"))
+
+        host.broken.clear()
+        host.requests.clear()
+        assert await run(urls, tmp_path) == {"downloaded": 1, "unchanged": 2}
+        # Only the URL that failed is fetched in full; the others are revalidated
+        assert sorted(host.requests) == [("a", 304), ("b", 200), ("c", 304)]
+        assert set(load_manifest(str(tmp_path / "manifest.json"))) == set(urls)
+
+    serve(host, ["a", "b", "c"], test)
@@ -0,0 +1,38 @@
+import asyncio
+import io
+import os
+import signal
+from PIL import Image
+from render_service import RenderService, PageSpec, CardSlot
+
+SPEC = PageSpec("base", 1, (CardSlot("1", "Alakazam", None, 0), CardSlot("2", "Blastoise", None, 3)))
+
+def test_render_survives_a_dead_worker():
+    async def main():
+        service = RenderService(workers=1)
+        service.start()
+        try:
+            png = await service.render(SPEC)
+            assert Image.open(io.BytesIO(png)).size == (720, 720)
+            # A worker killed mid-life (the OOM killer, a crash in PIL) breaks the whole pool
+            (pid,) = service.worker_stats
+            os.kill(pid, signal.SIGKILL)
+            await asyncio.sleep(0.5)
+            assert await service.render(SPEC) == png
+            assert service.restarts == 1
+            assert len(service.worker_stats) == 2  # the replacement worker has a new pid
+        finally:
+            service.shutdown()
+
+    asyncio.run(main())
+
+def test_unowned_cards_are_shaded_with_their_badges():
+    from render_service import render_page
+    owned = Image.open(io.BytesIO(render_page(PageSpec("base", 1, (CardSlot("1", "Alakazam", None, 1),))))).convert("RGBA")
+    unowned = Image.open(io.BytesIO(render_page(PageSpec("base", 1, (CardSlot("1", "Alakazam", None, 0),))))).convert("RGBA")
+    # The red "#1" badge in the top left corner is dimmed along with the card
+    corner = (0, 0, 40, 30)
+    owned_red = owned.crop(corner).getextrema()[0][1]
+    unowned_red = unowned.crop(corner).getextrema()[0][1]
+    assert owned_red > 200
+    assert unowned_red < owned_red // 2
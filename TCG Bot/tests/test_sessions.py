@@ -0,0 +1,48 @@
+import time
+from catalog import get_catalog
+from sessions import SessionManager
+
+def first_card():
+    return next(iter(get_catalog().cards("base")))
+
+def test_sessions_expire_by_deadline():
+    sessions = SessionManager()
+    expired = []
+    sessions.register("pick", 60, on_expire=lambda key, state: expired.append(key))
+    sessions.set("pick", "a", {"n": 1}, ttl=10)
+    sessions.set("pick", "b", {"n": 2}, ttl=10)
+    now = time.time()
+    # A refresh re-arms the kind's TTL; the old heap entry is skipped
+    assert sessions.get("pick", "a", refresh=True) == {"n": 1}
+    assert sessions.expire(now + 30) == 1
+    assert expired == ["b"]
+    assert sessions.get("pick", "a") == {"n": 1}
+    assert sessions.expire(now + 200) == 1
+    assert expired == ["b", "a"]
+    assert len(sessions) == 0
+
+def test_snapshot_and_restore(tmp_path):
+    path = str(tmp_path / "sessions.json")
+    card = first_card()
+    sessions = SessionManager()
+    sessions.register("pick", 60)
+    sessions.set("pick", "a", {"cards": [card]})
+    sessions.set("pick", "old", {}, ttl=-1)
+    assert sessions.snapshot(path) == 1
+
+    restored = SessionManager()
+    assert restored.restore(path) == 1
+    # Held until the kind registers
+    assert len(restored) == 0
+    restored.register("pick", 60)
+    assert restored.get("pick", "a") == {"cards": [card]}
+
+def test_restore_drops_sessions_with_unknown_cards(tmp_path):
+    path = tmp_path / "sessions.json"
+    path.write_text('{"pick": [{"key": "a", "expires_at": %f, "state": {"card": ["base", "9999"]}},'
+                    ' {"key": "b", "expires_at": %f, "state": {"n": 1}}]}' % (time.time() + 60, time.time() + 60))
+    sessions = SessionManager()
+    sessions.register("pick", 60)
+    assert sessions.restore(str(path)) == 1
+    assert sessions.get("pick", "a") is None
+    assert sessions.get("pick", "b") == {"n": 1}
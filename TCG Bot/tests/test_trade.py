@@ -0,0 +1,110 @@
+import asyncio
+import json
+import types
+import pytest
+import locks
+from catalog import get_catalog
+from cogs.trade import Trade, parse_basket, empty_basket
+from ledger import CoinLedger
+from utils import load_collection_async, save_collection
+
+def basket(text):
+    result, problems = parse_basket(text, get_catalog())
+    assert not problems
+    return result
+
+def records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+@pytest.fixture
+def trade(storage, tmp_path):
+    """A Trade cog on a started ledger; user 1 owns three base #58, user 2 has 100 coins."""
+    ledger = CoinLedger(str(tmp_path / "coins.ledger"))
+    cog = Trade.__new__(Trade)
+    cog.bot = types.SimpleNamespace(ledger=ledger)
+
+    async def setup():
+        await ledger.start()
+        collection = await load_collection_async("1")
+        collection.add("base", "58", 3)
+        save_collection("1", collection)
+        await ledger.credit("2", 100)
+
+    cog.setup = setup
+    return cog
+
+def test_parse_basket():
+    result, problems = parse_basket("base 58 x2, 300 coins, 2 fossil packs, nonsense", get_catalog())
+    assert result == {"cards": [["base", "58", 2]], "coins": 300, "packs": {"fossil": 2}}
+    assert problems == ["don't know `nonsense`"]
+    assert parse_basket("nothing", get_catalog()) == (empty_basket(), [])
+
+def test_trade_commits_cards_and_coins_in_one_record(trade, storage, tmp_path):
+    async def main():
+        await trade.setup()
+        offer = {"from": 1, "to": 2, "give": basket("base 58 x2"), "get": basket("60 coins")}
+        assert await trade.commit_offer(offer) is None
+        ledger = trade.bot.ledger
+        assert (await ledger.balance("1"), await ledger.balance("2")) == (60, 40)
+        # Both collections are in storage before commit_offer returns
+        assert storage.load("1", "collection.json")["base"]["58"] == 1
+        assert storage.load("2", "collection.json")["base"]["58"] == 2
+        trade_record, settled = records(ledger.path)[-2:]
+        assert trade_record["op"] == "trade"
+        assert {tuple(item[:2]) for item in trade_record["files"]} == {("1", "collection.json"), ("2", "collection.json")}
+        assert settled == {**settled, "op": "settled", "settles": trade_record["seq"]}
+        await ledger.close()
+
+    asyncio.run(main())
+
+def test_trade_cancelled_when_coins_were_spent(trade, storage, monkeypatch):
+    async def main():
+        await trade.setup()
+        ledger = trade.bot.ledger
+        offer = {"from": 1, "to": 2, "give": basket("base 58"), "get": basket("100 coins")}
+        balance = ledger.balance
+
+        async def spend_first(user_id):
+            # User 2 spends the coins after the basket check but before the commit
+            result = await balance(user_id)
+            if user_id == "2" and ledger.accounts["2"]["balance"] == 100:
+                ledger.accounts["2"]["balance"] = 10
+            return result
+
+        monkeypatch.setattr(ledger, "balance", spend_first)
+        assert await trade.commit_offer(offer) == "not enough coins anymore"
+        assert (await load_collection_async("1")).count("base", "58") == 3
+        assert (await load_collection_async("2")).count("base", "58") == 0
+        assert ledger.accounts["1"]["balance"] == 0
+        await ledger.close()
+
+    asyncio.run(main())
+
+def test_trade_committed_in_ledger_survives_a_crash_before_the_file_write(trade, storage, monkeypatch):
+    async def crashed_run():
+        await trade.setup()
+        ledger = trade.bot.ledger
+
+        async def crash(self):
+            raise asyncio.CancelledError  # the process dies right after the ledger fsync
+
+        monkeypatch.setattr(locks.Transaction, "commit_durable", crash)
+        offer = {"from": 1, "to": 2, "give": basket("base 58"), "get": basket("50 coins")}
+        with pytest.raises(asyncio.CancelledError):
+            await trade.commit_offer(offer)
+        ledger._writer.cancel()
+
+    asyncio.run(crashed_run())
+    # Only the ledger got it to disk
+    assert storage.load("2", "collection.json") is None
+
+    async def next_run():
+        ledger = CoinLedger(trade.bot.ledger.path)
+        await ledger.start()
+        assert (await ledger.balance("1"), await ledger.balance("2")) == (50, 50)
+        await ledger.close()
+
+    asyncio.run(next_run())
+    assert storage.load("1", "collection.json")["base"]["58"] == 2
+    assert storage.load("2", "collection.json")["base"]["58"] == 1
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import pytest
+import utils
+from utils import UserCache, flush_user_files_async, load_user_file_async
+
+class SlowStorage:
+    """Dict-backed storage whose writes block until the test lets them through."""
+
+    def __init__(self):
+        self.rows = {}
+        self.writing = threading.Event()
+        self.release = threading.Event()
+        self.fail = False
+
+    def load(self, user_id, filename):
+        return self.rows.get((user_id, filename))
+
+    def save_many(self, items):
+        self.writing.set()
+        self.release.wait(5)
+        if self.fail:
+            raise OSError("disk full")
+        for user_id, filename, data in items:
+            self.rows[(user_id, filename)] = data
+
+@pytest.fixture
+def cache(monkeypatch):
+    storage = SlowStorage()
+    cache = UserCache(max_users=1)
+    monkeypatch.setattr(utils, "_storage", storage)
+    monkeypatch.setattr(utils, "user_cache", cache)
+    monkeypatch.setattr(utils, "_flush_lock", None)
+    cache.storage = storage
+    return cache
+
+async def wait_for(event):
+    while not event.is_set():
+        await asyncio.sleep(0.001)
+
+def test_user_being_flushed_is_not_evicted_and_reloaded_stale(cache):
+    storage = cache.storage
+    storage.rows[("a", "balances.json")] = {"balance": 1}
+
+    async def main():
+        (await load_user_file_async("a", "balances.json"))["balance"] = 2
+        cache.save("a", "balances.json", {"balance": 2})
+        flush = asyncio.create_task(flush_user_files_async())
+        await wait_for(storage.writing)
+        # The write is in flight and storage still has balance 1. Touching another
+        # user would evict "a" (max_users=1), and reading "a" again would then
+        # bring the old row back.
+        await load_user_file_async("b", "balances.json")
+        assert cache.is_resident("a")
+        assert (await load_user_file_async("a", "balances.json"))["balance"] == 2
+        storage.release.set()
+        assert await flush == 1
+        assert storage.rows[("a", "balances.json")] == {"balance": 2}
+        # Written: "a" may go now
+        await load_user_file_async("c", "balances.json")
+        assert not cache.is_resident("a")
+
+    asyncio.run(main())
+
+def test_failed_flush_requeues_and_keeps_user(cache):
+    storage = cache.storage
+    storage.fail = True
+    storage.release.set()
+
+    async def main():
+        cache.save("a", "collection.json", {"base": {"1": 1}})
+        with pytest.raises(OSError):
+            await flush_user_files_async()
+        await load_user_file_async("b", "collection.json")
+        assert cache.is_resident("a")
+        storage.fail = False
+        assert await flush_user_files_async() == 1
+        assert storage.rows[("a", "collection.json")] == {"base": {"1": 1}}
+
+    asyncio.run(main())
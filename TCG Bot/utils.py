@@ -1,5 +1,14 @@
+import copy
 import json
 import os
+import atexit
+import asyncio
+import functools
+import threading
+from collections import OrderedDict, Counter
+from storage import open_storage
+from collection import Collection
+from catalog import get_catalog
 import discord
 import urllib.parse
 
@@ -15,68 +24,271 @@ def get_user_file(user_id, filename):
     folder = get_user_folder(user_id)
     return os.path.join(folder, filename)
 
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "512"))  # users kept in memory
+USER_CACHE_FLUSH_SECONDS = 30
+
+_storage = None
+
+def get_storage():
+    """The storage backend (JSON directory tree or SQLite), opened on first use."""
+    global _storage
+    if _storage is None:
+        _storage = open_storage()
+    return _storage
+
+class UserCache:
+    """
+    Process-wide write-back cache for the per-user JSON files.
+    Files are read from disk once, kept in memory per user (LRU bounded),
+    and only written back by flush(). Users with unsaved changes aren't evicted
+    until they've been flushed, so saving never touches storage. Neither are
+    users whose files a flush is still writing: storage may hold the old version
+    until that write returns, and reloading it would bring the old data back.
+
+    The cached objects are handed out live and changed in place by the cogs, so
+    inside the bot everything here runs on the event loop. Only storage reads
+    (preload) and the writes of a flush (take_dirty + write) go to a thread, and
+    a flush writes deep copies taken on the loop.
+    """
+    def __init__(self, max_users=USER_CACHE_SIZE):
+        self.max_users = max_users
+        self._users = OrderedDict()  # user_id -> {filename: data or None if missing}
+        self._dirty = set()  # (user_id, filename)
+        self._writing = Counter()  # (user_id, filename) -> flushes taken but not written yet
+        self._lock = threading.RLock()
+        self._watchers = {}  # filename -> [callback(user_id, data)]
+
+    def _files(self, user_id):
+        files = self._users.get(user_id)
+        if files is None:
+            files = self._users[user_id] = {}
+            self._evict()
+        else:
+            self._users.move_to_end(user_id)
+        return files
+
+    def _evict(self):
+        if len(self._users) <= self.max_users:
+            return
+        pinned = {user_id for user_id, _ in self._dirty} | {user_id for user_id, _ in self._writing}
+        for user_id in list(self._users)[:-1]:  # never the user being added
+            if len(self._users) <= self.max_users:
+                break
+            # Unsaved users wait for the next flush, which writes the files of a
+            # multi-user transaction (locks.transaction) to storage in one batch;
+            # users being flushed wait until the write is done
+            if user_id not in pinned:
+                del self._users[user_id]
+
+    def load(self, user_id, filename):
+        user_id = str(user_id)
+        with self._lock:
+            files = self._files(user_id)
+            if filename not in files:
+                files[filename] = get_storage().load(user_id, filename)
+            data = files[filename]
+        # Missing files hand out a fresh dict so callers can't mutate the cache by accident
+        return {} if data is None else data
+
+    def fill(self, user_id, filename, data):
+        """Cache data read from storage, unless the file is already cached (and maybe changed since)."""
+        with self._lock:
+            self._files(str(user_id)).setdefault(filename, data)
+
+    def is_resident(self, user_id, filename=None):
+        """True if the user (or one of their files) is already in memory."""
+        with self._lock:
+            files = self._users.get(str(user_id))
+            return files is not None and (filename is None or filename in files)
+
+    def watch(self, filename, callback):
+        """Call callback(user_id, data) whenever that file is saved (data is None when it's deleted)."""
+        self._watchers.setdefault(filename, []).append(callback)
+
+    def save(self, user_id, filename, data):
+        user_id = str(user_id)
+        with self._lock:
+            self._files(user_id)[filename] = data
+            self._dirty.add((user_id, filename))
+        for callback in self._watchers.get(filename, ()):
+            callback(user_id, data)
+
+    def save_many(self, items, written=False):
+        """
+        Store a batch of (user_id, filename, data) at once; flush() sees all of them or none.
+        written=True: the batch is already in storage, so it isn't marked unsaved.
+        """
+        with self._lock:
+            for user_id, filename, data in items:
+                self.save(user_id, filename, data)
+                if written:
+                    self._dirty.discard((str(user_id), filename))
+
+    def take_dirty(self):
+        """
+        Copies of every unsaved file as [(user_id, filename, data)], now marked clean.
+        Their users stay pinned in memory until written() or requeue() gets the batch back.
+        """
+        with self._lock:
+            pending = [(user_id, filename, copy.deepcopy(self._users[user_id][filename]))
+                       for user_id, filename in self._dirty]
+            self._dirty.clear()
+            self._writing.update((user_id, filename) for user_id, filename, _ in pending)
+        return pending
+
+    def written(self, pending):
+        """A batch from take_dirty() is in storage: its users may be evicted again."""
+        with self._lock:
+            self._writing.subtract((user_id, filename) for user_id, filename, _ in pending)
+            self._writing = +self._writing  # drop the zeros
+
+    def requeue(self, pending):
+        """Mark files from a failed write unsaved again (unless they were saved anew since)."""
+        with self._lock:
+            for user_id, filename, data in pending:
+                if (user_id, filename) not in self._dirty:
+                    self._files(user_id)[filename] = data
+                    self._dirty.add((user_id, filename))
+            self.written(pending)
+
+    def flush(self):
+        """Write every dirty file back to disk. Returns the number of files written."""
+        pending = self.take_dirty()
+        try:
+            write_user_files(pending)
+        except Exception:
+            self.requeue(pending)
+            raise
+        self.written(pending)
+        return len(pending)
+
+user_cache = UserCache()
+
 def load_user_file(user_id, filename):
-    path = get_user_file(user_id, filename)
-    if not os.path.exists(path):
-        return {}
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return user_cache.load(user_id, filename)
 
 def save_user_file(user_id, filename, data):
-    path = get_user_file(user_id, filename)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    user_cache.save(user_id, filename, data)
 
-def user_packs(user_id):
-    packs = load_user_file(user_id, "user_packs.json")
-    return packs if packs else []
+def delete_user_file(user_id, filename):
+    # Storage backends treat a None payload as "remove this file"
+    save_user_file(user_id, filename, None)
+
+def flush_user_files():
+    return user_cache.flush()
+
+def write_user_files(pending):
+    """Write [(user_id, filename, data)] to storage in one batch. Touches no cached object."""
+    if pending:
+        get_storage().save_many(pending)
+    return len(pending)
 
-def save_user_packs(user_id, packs):
-    save_user_file(user_id, "user_packs.json", packs)
+# Never lose pending writes when the process exits normally
+atexit.register(flush_user_files)
 
-def load_pack(pack_name: str) -> dict:
-    pack_path = os.path.join(DATA_FOLDER, "cardpacks", f"{pack_name}.json")
-    if not os.path.exists(pack_path):
-        return {}
-    with open(pack_path, "r") as f:
-        return json.load(f)
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call (disk, database, PIL) in the default executor so the event loop keeps going."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
 
-def add_cards_to_collection(user_id, cards, pack_name):
+async def preload_user_files(user_id, *filenames):
+    """Read whichever of the files aren't cached yet from storage, on a worker thread."""
     user_id = str(user_id)
-    user_cards = load_user_file(user_id, "cards.json").get("cards", [])
-    user_dupes = load_user_file(user_id, "duplicates.json").get("duplicates", [])
-
-    # Helper: find card in a list by name/number/pack
-    def find_card(card_list, card):
-        for c in card_list:
-            if (
-                c.get("name") == card.get("name")
-                and c.get("number") == card.get("number")
-                and c.get("pack") == pack_name
-            ):
-                return c
-        return None
-
-    for card in cards:
-        card_copy = dict(card)
-        card_copy["pack"] = pack_name
-
-        # Check if already in collection
-        owned = find_card(user_cards, card_copy)
-        if owned:
-            # Already owned: add to duplicates
-            dupe = find_card(user_dupes, card_copy)
-            if dupe:
-                dupe["count"] = dupe.get("count", 1) + 1
-            else:
-                dupe_entry = dict(card_copy)
-                dupe_entry["count"] = 1
-                user_dupes.append(dupe_entry)
-        else:
-            user_cards.append(card_copy)
+    missing = [filename for filename in filenames if not user_cache.is_resident(user_id, filename)]
+    if not missing:
+        return
+    storage = get_storage()
+    loaded = await run_blocking(lambda: [storage.load(user_id, filename) for filename in missing])
+    for filename, data in zip(missing, loaded):
+        user_cache.fill(user_id, filename, data)
+
+async def load_user_file_async(user_id, filename):
+    # Cache hits are a dict lookup, only go to a worker thread when storage has to be read
+    await preload_user_files(user_id, filename)
+    return user_cache.load(user_id, filename)
+
+_flush_lock = None
 
-    save_user_file(user_id, "cards.json", {"cards": user_cards})
-    save_user_file(user_id, "duplicates.json", {"duplicates": user_dupes})
+def flush_lock():
+    # One write to storage at a time, so an older copy never lands after a newer one
+    global _flush_lock
+    if _flush_lock is None:
+        _flush_lock = asyncio.Lock()
+    return _flush_lock
+
+async def flush_user_files_async(then=None):
+    """
+    Write every dirty file: copies are taken here on the loop, storage is written on a
+    worker thread. then(), if given, runs on that thread once the write succeeded.
+    """
+    async with flush_lock():
+        pending = user_cache.take_dirty()
+        def write():
+            count = write_user_files(pending)
+            if then is not None:
+                then()
+            return count
+        try:
+            count = await run_blocking(write)
+        except Exception:
+            user_cache.requeue(pending)
+            raise
+        user_cache.written(pending)
+        return count
+
+async def save_user_files_now(items):
+    """
+    Write [(user_id, filename, data)] to storage in one batch and only then hand them
+    to the user cache. Nothing else may hold the data objects until this returns.
+    """
+    async with flush_lock():
+        await run_blocking(write_user_files, items)
+        user_cache.save_many(items, written=True)
+
+async def user_packs_async(user_id):
+    packs = await load_user_file_async(user_id, "user_packs.json")
+    return packs if packs else []
+
+def load_collection(user_id):
+    """The user's collection ({pack: {number: count}}), migrating the old card-dict files on first access."""
+    data = load_user_file(user_id, "collection.json")
+    if not data:
+        cards_data = load_user_file(user_id, "cards.json")
+        dupes_data = load_user_file(user_id, "duplicates.json")
+        if cards_data or dupes_data:
+            return migrate_legacy_collection(user_id, cards_data, dupes_data)
+    return Collection(data)
+
+def migrate_legacy_collection(user_id, cards_data, dupes_data):
+    """Replace cards.json + duplicates.json with an equivalent collection.json."""
+    collection = Collection.from_legacy_files(cards_data, dupes_data, get_catalog())
+    save_user_file(user_id, "collection.json", collection.data)
+    delete_user_file(user_id, "cards.json")
+    delete_user_file(user_id, "duplicates.json")
+    return collection
+
+def save_collection(user_id, collection):
+    save_user_file(user_id, "collection.json", collection.data)
+
+async def load_collection_async(user_id):
+    # Storage reads on a thread; the collection (and any legacy migration) is built here on the loop
+    await preload_user_files(user_id, "collection.json", "cards.json", "duplicates.json")
+    return load_collection(user_id)
+
+def apply_card_counts(collection, pulls, pack_name):
+    """
+    Apply {card: copies} to a collection.
+    Returns {"new": [...], "duplicates": [...]}: cards the user didn't own before,
+    and cards that produced at least one extra copy.
+    """
+    result = {"new": [], "duplicates": []}
+    for card, copies in pulls.items():
+        is_new = collection.add(pack_name, card.number, copies)
+        if is_new:
+            result["new"].append(card)
+        if not is_new or copies > 1:
+            result["duplicates"].append(card)
+    return result
 
 async def export_image_links(bot, channel_id):
     """